@@ -0,0 +1,150 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+"""
+from constants.constants import (
+    ASSETS,
+    ICON_DISCONNECTED,
+    ICON_LOVED,
+    ICON_PAUSED,
+    ICON_PLAYING
+)
+from PIL import Image, ImageOps
+import logging
+import os
+import threading
+
+_logger = logging.getLogger(__name__)
+
+
+class AssetCache:
+    """
+    Decodes each image asset once and hands out the cached PIL images.
+
+    Relative paths are resolved against the application directory rather
+    than the current working directory, so the app can be launched from
+    anywhere (e.g. a .desktop file).
+    """
+
+    _base_dir = None
+    _images = None
+    _lock = None
+    _tray_icons = None
+
+    def __init__(self, base_dir=None):
+        """
+        Args:
+            base_dir (str): directory holding the image files, defaults to
+            the application directory
+        """
+        if base_dir is None:
+            base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self._base_dir = base_dir
+        self._images = {}
+        self._lock = threading.Lock()
+        self._tray_icons = {}
+
+    def get_image(self, name):
+        """
+        Args:
+            name (str): file name or path of the image
+
+        Returns:
+            image (Image): the decoded image, shared between callers so
+            it must not be modified in place
+        """
+        path = self.resolve_path(name)
+        with self._lock:
+            image = self._images.get(path)
+            if image is None:
+                _logger.debug(f"{ASSETS}: decoding {path}")
+                with Image.open(path) as handle:
+                    image = handle.convert("RGBA")
+                self._images[path] = image
+            return image
+
+    def get_tray_icons(self, app_icon, heart_icon, size=None):
+        """
+        Pre-renders every tray icon variant so a state change is only a
+        dictionary lookup.
+
+        Args:
+            app_icon (str): file name or path of the tray icon
+            heart_icon (str): file name or path of the heart overlay
+            size (Tuple[int, int]): size the tray backend wants, or None
+            to keep the size of the source image
+
+        Returns:
+            icons (Dict[str, Image]): ICON_* state => rendered image
+        """
+        key = (self.resolve_path(app_icon), self.resolve_path(heart_icon), size)
+        with self._lock:
+            icons = self._tray_icons.get(key)
+        if icons is not None:
+            return icons
+
+        base = self.get_image(app_icon)
+        if size is not None and base.size != tuple(size):
+            base = base.resize(size, Image.LANCZOS)
+        gray = self._to_grayscale(base)
+
+        loved = base.copy()
+        heart_size = (max(1, base.width // 2), max(1, base.height // 2))
+        heart = self.get_image(heart_icon).resize(heart_size, Image.LANCZOS)
+        loved.alpha_composite(heart, (base.width - heart.width,
+                                      base.height - heart.height))
+
+        disconnected = gray.copy()
+        disconnected.putalpha(gray.getchannel("A").point(lambda a: a // 2))
+
+        icons = {
+            ICON_DISCONNECTED: disconnected,
+            ICON_LOVED: loved,
+            ICON_PAUSED: gray,
+            ICON_PLAYING: base,
+        }
+        with self._lock:
+            self._tray_icons[key] = icons
+        _logger.debug(f"{ASSETS}: rendered tray icons at {base.size}")
+        return icons
+
+    def resolve_path(self, name):
+        """
+        Args:
+            name (str): file name or path of an asset
+
+        Returns:
+            path (str): absolute path to the asset
+        """
+        if os.path.isabs(name):
+            return name
+        return os.path.join(self._base_dir, name)
+
+    @staticmethod
+    def _to_grayscale(image):
+        """
+        Args:
+            image (Image): an RGBA image
+
+        Returns:
+            gray (Image): a grayscale RGBA copy keeping the original alpha
+        """
+        gray = ImageOps.grayscale(image).convert("RGBA")
+        gray.putalpha(image.getchannel("A"))
+        return gray
@@ -18,26 +18,82 @@ python-pianobar-wrapper:
     You should have received a copy of the GNU General Public License
     along with this program.  If not, see <https://www.gnu.org/licenses/>
 """
+ASSETS = "ASSETS"
 CMD_NEXT = "n"
 CMD_PLAY_PAUSE = "p"
+CMD_SONG_INFO = "i"
 CMD_STATION_LIST = "s"
+CMD_UPCOMING = "u"
+CMD_VOLUME_DOWN = "("
+CMD_VOLUME_RESET = "^"
+CMD_VOLUME_UP = ")"
 CONCRETE_MEDIATOR = "CONCRETE_MEDIATOR"
+CONTROL_API = "CONTROL_API"
+DEFAULT_SESSION = "default"
+ERROR_AUTH = "ERROR_AUTH"
+ERROR_NETWORK = "ERROR_NETWORK"
+ERROR_PLAYLIST = "ERROR_PLAYLIST"
+ERROR_UNKNOWN = "ERROR_UNKNOWN"
+GET_HISTORY = "GET_HISTORY"
+GET_RESOURCE_USAGE = "GET_RESOURCE_USAGE"
+GET_SESSIONS = "GET_SESSIONS"
 GET_SONG_DATA = "GET_SONG_DATA"
+GET_SONG_INFO = "GET_SONG_INFO"
 GET_STATION = "GET_STATION"
 GET_STATIONS = "GET_STATIONS"
+GET_STATS = "GET_STATS"
+GET_UPCOMING = "GET_UPCOMING"
+GET_VOLUME = "GET_VOLUME"
+HISTORY = "HISTORY"
+ICON_DISCONNECTED = "ICON_DISCONNECTED"
+ICON_LOVED = "ICON_LOVED"
+ICON_PAUSED = "ICON_PAUSED"
+ICON_PLAYING = "ICON_PLAYING"
 KEY_LISTENER = "KEY_LISTENER"
+LISTENING_STATS = "LISTENING_STATS"
 LOVE = "LOVE"
+LOVED_SONGS = "LOVED_SONGS"
 MAIN = "MAIN"
 MAIN_WINDOW = "MAIN_WINDOW"
 MAIN_WINDOW_READY = "MAIN_WINDOW_READY"
 MEDIA_NEXT = "MEDIA_NEXT"
 MEDIA_PLAY = "MEDIA_PLAY"
+MEMORY_REPORT = "MEMORY_REPORT"
+METRICS = "METRICS"
+MPRIS = "MPRIS"
 NEW_SONG = "NEW_SONG"
 NEW_STATION = "NEW_STATION"
+NOW_PLAYING = "NOW_PLAYING"
 PIANOBAR = "PIANOBAR"
+PIANOBAR_ERROR = "PIANOBAR_ERROR"
+PLAYBACK_STALL = "PLAYBACK_STALL"
+PLAYBACK_STATUS = "PLAYBACK_STATUS"
+POLICY_ABORT = "POLICY_ABORT"
+POLICY_RETRY = "POLICY_RETRY"
+POLICY_SKIP = "POLICY_SKIP"
 QUIT = "QUIT"
+SESSIONS = "SESSIONS"
+SESSION_CHANGE_REQUESTED = "SESSION_CHANGE_REQUESTED"
 SHOW = "SHOW"
+STALL_FROZEN = "STALL_FROZEN"
+STALL_GAP = "STALL_GAP"
+STALL_JUMP = "STALL_JUMP"
 START = "START"
 STATIONS = "STATIONS"
+STATION_LIST = "STATION_LIST"
+STATION_SEARCH = "STATION_SEARCH"
 STATION_CHANGE_REQUESTED = "STATION_CHANGE_REQUESTED"
 SYSTRAY = "SYSTRAY"
+SYSTRAY_BACKOFF = "SYSTRAY_BACKOFF"
+SYSTRAY_RUNNING = "SYSTRAY_RUNNING"
+SYSTRAY_STOPPED = "SYSTRAY_STOPPED"
+SYSTRAY_STOPPING = "SYSTRAY_STOPPING"
+THEME_CACHE = "THEME_CACHE"
+TIME_UPDATE = "TIME_UPDATE"
+TRACING = "TRACING"
+TRAY_ICON = "TRAY_ICON"
+UPCOMING = "UPCOMING"
+VOLUME = "VOLUME"
+VOLUME_DOWN = "VOLUME_DOWN"
+VOLUME_RESET = "VOLUME_RESET"
+VOLUME_UP = "VOLUME_UP"
@@ -0,0 +1,509 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+"""
+from constants.constants import (
+    CONCRETE_MEDIATOR,
+    CONTROL_API,
+    GET_HISTORY,
+    GET_SESSIONS,
+    GET_SONG_INFO,
+    GET_STATS,
+    GET_VOLUME,
+    LOVE,
+    MEDIA_NEXT,
+    MEDIA_PLAY,
+    NEW_SONG,
+    NEW_STATION,
+    PLAYBACK_STALL,
+    PLAYBACK_STATUS,
+    QUIT,
+    SESSIONS,
+    SESSION_CHANGE_REQUESTED,
+    SHOW,
+    START,
+    STATIONS,
+    STATION_CHANGE_REQUESTED,
+    TIME_UPDATE,
+    VOLUME,
+    VOLUME_DOWN,
+    VOLUME_RESET,
+    VOLUME_UP
+)
+from mediator.base_component import BaseComponent
+from metrics.metrics import REGISTRY
+from station_search.station_search import StationSearchIndex
+from tracing.tracing import TRACER
+import concurrent.futures
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import threading
+
+_logger = logging.getLogger(__name__)
+
+
+def default_socket_path():
+    """
+    Returns:
+        path (str): the control socket, in the per user runtime directory
+    """
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR") or f"/tmp/pianobar-wrapper-{os.getuid()}"
+    return os.path.join(runtime_dir, "pianobar-wrapper", "control.sock")
+
+
+def send_request(request, socket_path=None, timeout=2.0):
+    """
+    Send one request to a running instance and return its reply, this is
+    what the command line forwarding uses.
+
+    Args:
+        request (dict): e.g. {"cmd": "next"}
+        socket_path (str): the control socket, defaults to the runtime dir
+        timeout (float): seconds to wait for the reply
+
+    Returns:
+        (dict): the reply
+
+    Raises:
+        OSError: if no instance is listening
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(socket_path or default_socket_path())
+        client.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with client.makefile("rb") as reply:
+            return json.loads(reply.readline())
+
+
+def song_to_dict(song):
+    """
+    Args:
+        song (Song): a Song class obj, or None
+
+    Returns:
+        (dict): the song as JSON friendly values
+    """
+    if song is None:
+        return None
+    return {
+        "album": song.album,
+        "artist": song.artist,
+        "favorite": song.favorite,
+        "title": song.title,
+    }
+
+
+class _Subscriber:
+    """
+    A bounded outbox for one streaming client. When the client falls
+    behind the oldest events are dropped, the publisher never waits.
+    """
+
+    def __init__(self, max_events):
+        self.dropped = 0
+        self.events = queue.Queue(maxsize=max_events)
+
+    def put(self, item):
+        while True:
+            try:
+                self.events.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.events.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Serves one client connection, one JSON object per line.
+    """
+
+    def handle(self):
+        api = self.server.api
+        for raw in self.rfile:
+            try:
+                request = json.loads(raw)
+                cmd = request["cmd"]
+            except (ValueError, KeyError, TypeError):
+                self._send({"ok": False, "error": "expected a JSON object with a 'cmd'"})
+                continue
+            if cmd == "subscribe":
+                # register before the snapshot so no event falls in between
+                subscriber = api.add_subscriber()
+                try:
+                    self._send({"ok": True, "state": api.get_state()})
+                    self._stream(api, subscriber)
+                except OSError:
+                    pass  # client went away
+                finally:
+                    api.remove_subscriber(subscriber)
+                return
+            self._send(api.handle_request(cmd, request))
+
+    def _send(self, obj):
+        self.wfile.write(json.dumps(obj).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+    def _stream(self, api, subscriber):
+        while not api.is_stopped:
+            try:
+                item = subscriber.events.get(timeout=1)
+            except queue.Empty:
+                continue
+            if subscriber.dropped:
+                # tell the client how many events it missed
+                item = dict(item, dropped=subscriber.dropped)
+                subscriber.dropped = 0
+            self._send(item)
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ControlApi(BaseComponent):
+    """
+    A local Unix socket API to query and control the wrapper. Clients
+    write JSON lines such as {"cmd": "next"} and get one JSON line back.
+
+    Users of this class should only:
+    - Instantiate
+    - Set mediator
+    - Call into this class using the 'notify' method.
+
+    Commands, and the fields they take:
+    - next, play_pause, love, station ("station": number or name): with
+      "wait": true the reply comes once pianobar confirmed or refused it
+    - show, quit, state, info (the details 'i' prints for the song)
+    - session ("session": id), sessions (pid, memory and CPU of each)
+    - volume ("change": steps such as 3 or -2, or "reset"): the level in dB
+    - history ("query", "limit", "before", "until"): plays, newest first
+    - stats ("limit", "run": true for this run only): listening rollups
+    - metrics (Prometheus text), export_trace ("path"): Chrome trace JSON
+    - subscribe: the state, then LOVE, NEW_SONG, NEW_STATION,
+      PLAYBACK_STALL, PLAYBACK_STATUS, SESSIONS, TIME_UPDATE and VOLUME
+      events, through a bounded buffer per subscriber
+    """
+
+    _commands = {
+        "love": LOVE,
+        "next": MEDIA_NEXT,
+        "play_pause": MEDIA_PLAY,
+        "quit": QUIT,
+        "show": SHOW,
+    }
+    _lock = None
+    _max_events = 256
+    _server = None
+    _socket_path = None
+    _state = None
+    _stations = None
+    _stopped = False
+    _subscribers = None
+    _wait_timeout = 20.0  # pianobar gives up on a command after 15 seconds
+    mediator = None
+
+    def __init__(self, socket_path=None):
+        """
+        Args:
+            socket_path (str): where to listen, defaults to the runtime dir
+        """
+        super().__init__()
+        self._lock = threading.Lock()
+        self._socket_path = socket_path or default_socket_path()
+        self._state = {
+            "duration": None,
+            "paused": False,
+            "position": None,
+            "session": None,
+            "song": None,
+            "station": None,
+            "volume": None,
+        }
+        self._stations = []
+        self._subscribers = set()
+
+    @property
+    def is_stopped(self):
+        return self._stopped
+
+    def notify(self, sender, event, event2):
+        """
+        Consumers of this class should only communicate through here
+        using the mediator design pattern.
+        """
+        if sender != CONCRETE_MEDIATOR:
+            return
+        if event == START:
+            self._start()
+            return
+        if event == QUIT:
+            self._stop()
+            return
+        if event == STATIONS:
+            with self._lock:
+                self._stations = list(event2 or [])
+            return
+
+        with self._lock:
+            if event == LOVE:
+                # pianobar confirmed a love of the song playing
+                if self._state["song"] is None:
+                    return
+                data = dict(self._state["song"], favorite=True)
+                self._state["song"] = data
+            elif event == NEW_SONG:
+                data = song_to_dict(event2)
+                self._state.update(song=data, paused=False, position=None, duration=None)
+            elif event == NEW_STATION:
+                data = event2
+                self._state["station"] = data
+            elif event == PLAYBACK_STALL:
+                data = event2.to_dict()
+            elif event == PLAYBACK_STATUS:
+                data = bool(event2)
+                self._state["paused"] = data
+            elif event == SESSIONS:
+                data = event2
+                self._state["session"] = data
+            elif event == TIME_UPDATE:
+                data = {"position": event2[0], "duration": event2[1]}
+                self._state.update(data)
+            elif event == VOLUME:
+                data = event2
+                self._state["volume"] = data
+            else:
+                return
+            subscribers = list(self._subscribers)
+        item = {"event": event, "data": data}
+        for subscriber in subscribers:
+            subscriber.put(item)
+
+    def add_subscriber(self):
+        subscriber = _Subscriber(self._max_events)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def get_state(self):
+        """
+        Returns: (dict) a snapshot of what is playing
+        """
+        with self._lock:
+            return dict(self._state)
+
+    def handle_request(self, cmd, request):
+        """
+        Args:
+            cmd (str): the command name
+            request (dict): the full request
+
+        Returns:
+            (dict): the reply for the client
+        """
+        if cmd == "state":
+            return {"ok": True, "state": self.get_state()}
+        if cmd == "export_trace":
+            try:
+                path = TRACER.export_chrome_trace(request.get("path"))
+            except (OSError, TypeError) as e:
+                return {"ok": False, "error": f"could not write the trace: {e}"}
+            return {"ok": True, "path": path}
+        if cmd == "history":
+            params, error = self._history_params(request)
+            if error:
+                return {"ok": False, "error": error}
+            return {"ok": True, "plays": self.mediator.notify(CONTROL_API, event=GET_HISTORY, event2=params)}
+        if cmd == "stats":
+            limit, run = request.get("limit"), request.get("run", False)
+            if limit is not None and (not isinstance(limit, int) or limit < 1):
+                return {"ok": False, "error": "'limit' must be a positive number"}
+            if not isinstance(run, bool):
+                return {"ok": False, "error": "'run' must be true or false"}
+            stats = self.mediator.notify(CONTROL_API, event=GET_STATS, event2={"limit": limit, "run": run})
+            return {"ok": True, "stats": stats}
+        if cmd == "info":
+            future = self.mediator.notify(CONTROL_API, event=GET_SONG_INFO, event2=None)
+            try:
+                error = future.exception(timeout=self._wait_timeout)
+            except concurrent.futures.TimeoutError:
+                return {"ok": False, "error": "no answer from pianobar"}
+            if error is not None:
+                return {"ok": False, "error": str(error)}
+            return {"ok": True, "info": future.result().to_dict()}
+        if cmd == "volume":
+            change = request.get("change")
+            if change == "reset":
+                level = self.mediator.notify(CONTROL_API, event=VOLUME_RESET, event2=None)
+            elif isinstance(change, int) and not isinstance(change, bool) and change:
+                event = VOLUME_UP if change > 0 else VOLUME_DOWN
+                level = self.mediator.notify(CONTROL_API, event=event, event2=abs(change))
+            elif change is None:
+                level = self.mediator.notify(CONTROL_API, event=GET_VOLUME, event2=None)
+            else:
+                return {"ok": False, "error": "'change' must be a number of steps or 'reset'"}
+            return {"ok": True, "volume": level}
+        if cmd == "metrics":
+            return {"ok": True, "metrics": REGISTRY.render()}
+        if cmd == "sessions":
+            sessions = self.mediator.notify(CONTROL_API, event=GET_SESSIONS, event2=None)
+            return {"ok": True, "sessions": sessions}
+        if cmd == "session":
+            session_id = request.get("session")
+            if not isinstance(session_id, str) or not session_id:
+                return {"ok": False, "error": "'session' must be a session id"}
+            if not self.mediator.notify(CONTROL_API, event=SESSION_CHANGE_REQUESTED, event2=session_id):
+                return {"ok": False, "error": f"no session named '{session_id}'"}
+            return {"ok": True}
+        if cmd == "station":
+            station, error = self._resolve_station(request.get("station"))
+            if error:
+                return {"ok": False, "error": error}
+            with TRACER.action(STATION_CHANGE_REQUESTED, CONTROL_API):
+                future = self.mediator.notify(CONTROL_API, event=STATION_CHANGE_REQUESTED, event2=station)
+            return self._reply(future, request)
+        event = self._commands.get(cmd)
+        if event is None:
+            return {"ok": False, "error": f"unknown cmd: {cmd}"}
+        _logger.debug(f"{CONTROL_API}: {cmd} => {event}")
+        with TRACER.action(event, CONTROL_API):
+            future = self.mediator.notify(CONTROL_API, event=event, event2=None)
+        return self._reply(future, request)
+
+    def remove_subscriber(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _history_params(self, request):
+        """
+        Returns:
+            (Tuple[dict, str]): the query arguments, or an error message
+        """
+        params = {"text": request.get("query"), "limit": request.get("limit", 50),
+                  "before": request.get("before"), "until": request.get("until")}
+        if params["text"] is not None and not isinstance(params["text"], str):
+            return None, "'query' must be a string"
+        if not isinstance(params["limit"], int) or not 1 <= params["limit"] <= 500:
+            return None, "'limit' must be a number from 1 to 500"
+        if params["before"] is not None and not isinstance(params["before"], int):
+            return None, "'before' must be the id of a play"
+        if params["until"] is not None and not isinstance(params["until"], (int, float)):
+            return None, "'until' must be seconds since the epoch"
+        return params, None
+
+    def _remove_stale_socket(self):
+        """
+        Remove a socket file left behind by an instance which died.
+        """
+        if not os.path.exists(self._socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self._socket_path)
+        except OSError:
+            os.unlink(self._socket_path)
+        else:
+            raise OSError(f"{self._socket_path} is in use by another instance")
+        finally:
+            probe.close()
+
+    def _reply(self, future, request):
+        """
+        Args:
+            future (Future): pianobar's acknowledgement, None for commands
+            pianobar does not answer such as show
+            request (dict): the full request
+
+        Returns:
+            (dict): the reply, after the acknowledgement if it asked to wait
+        """
+        if future is None or not request.get("wait"):
+            return {"ok": True}
+        try:
+            error = future.exception(timeout=self._wait_timeout)
+        except concurrent.futures.TimeoutError:
+            return {"ok": False, "error": "no answer from pianobar"}
+        if error is not None:
+            return {"ok": False, "error": str(error)}
+        return {"ok": True, "seconds": round(future.result(), 3)}
+
+    def _resolve_station(self, station):
+        """
+        Args:
+            station (Union[int, str]): a station number or name
+
+        Returns:
+            (number, error): the station number, or an error message
+        """
+        if isinstance(station, int) and not isinstance(station, bool):
+            return station, None
+        if not isinstance(station, str) or not station.strip():
+            return None, "'station' must be a station number or name"
+        if station.strip().isdigit():
+            return int(station), None
+
+        wanted = StationSearchIndex.normalize(station.strip())
+        with self._lock:
+            stations = list(self._stations)
+        names = [(number, StationSearchIndex.normalize(name)) for number, name in stations]
+        exact = [number for number, name in names if name == wanted]
+        if exact:
+            return exact[0], None
+        partial = [number for number, name in names if wanted in name]
+        if len(partial) == 1:
+            return partial[0], None
+        if partial:
+            return None, f"'{station}' matches {len(partial)} stations"
+        return None, f"no station named '{station}'"
+
+    def _start(self):
+        """
+        Listen on the control socket from a thread.
+        """
+        try:
+            os.makedirs(os.path.dirname(self._socket_path), mode=0o700, exist_ok=True)
+            self._remove_stale_socket()
+            self._server = _Server(self._socket_path, _RequestHandler)
+            os.chmod(self._socket_path, 0o600)
+        except OSError as e:
+            _logger.error(f"{CONTROL_API}: control socket disabled: {e}")
+            self._server = None
+            return
+        self._server.api = self
+        thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        thread.start()
+        _logger.info(f"{CONTROL_API}: listening on {self._socket_path}")
+
+    def _stop(self):
+        self._stopped = True
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            try:
+                os.unlink(self._socket_path)
+            except OSError:
+                pass
@@ -0,0 +1,74 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+Feed the control API a love before any song, a song, pianobar's
+confirmation of a love and the next song, and check the favorite flag in
+its state and in what it streams to subscribers:
+
+    python3 -m control_api.verify
+"""
+from constants.constants import CONCRETE_MEDIATOR, LOVE, NEW_SONG
+from control_api.control_api import ControlApi
+from song.song import Song
+import queue
+import sys
+
+# (event, event2, the favorite flag expected after it, None for no song)
+STEPS = (
+    (LOVE, None, None),
+    (NEW_SONG, Song(album="Album", artist="Artist", favorite=False, title="First"), False),
+    (LOVE, None, True),
+    (NEW_SONG, Song(album="Album", artist="Artist", favorite=False, title="Second"), False),
+)
+
+
+def verify():
+    """
+    Returns:
+        (int) the exit code, 1 if the state or a streamed event is wrong
+    """
+    failures = 0
+    control_api = ControlApi()
+    subscriber = control_api.add_subscriber()
+    for event, event2, expected in STEPS:
+        control_api.notify(CONCRETE_MEDIATOR, event, event2)
+        song = control_api.get_state()["song"]
+        favorite = None if song is None else song["favorite"]
+        try:
+            item = subscriber.events.get_nowait()
+        except queue.Empty:
+            item = None
+        if expected is None:
+            # nothing to love, nothing to stream
+            streamed_ok = item is None
+        else:
+            streamed_ok = item is not None and item["event"] == event and item["data"]["favorite"] == expected
+        if favorite != expected or not streamed_ok:
+            print(f"after {event}: state favorite {favorite}, streamed {item}, expected {expected}")
+            failures += 1
+    if failures:
+        print("verify: FAIL, the favorite flag is wrong", file=sys.stderr)
+        return 1
+    print(f"verify: ok, {len(STEPS)} events")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(verify())
@@ -0,0 +1,120 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+Benchmark of the play history at a given size: fills a scratch database
+through the same batched writer the app uses, then times the queries the
+GUI and remote clients run:
+
+    python3 -m history.bench --rows 1000000
+"""
+from history.history import PlayHistory
+from constants.constants import CONCRETE_MEDIATOR, QUIT, START
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+_WORDS = ("blue", "night", "river", "fire", "love", "train", "moon", "heart", "road", "rain",
+          "gold", "city", "dream", "stone", "summer", "ghost", "wild", "sweet", "dance", "home")
+
+
+def _timed(label, function, repeat):
+    """
+    Returns:
+        result: what the last call returned
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print(f"  {label:<40} median {timings[len(timings) // 2] * 1000:8.2f} ms  "
+          f"max {timings[-1] * 1000:8.2f} ms  ({len(result)} plays)")
+    return result
+
+
+def run(args):
+    """
+    Returns:
+        (int) the exit code
+    """
+    rng = random.Random(args.seed)
+    path = os.path.join(tempfile.mkdtemp(prefix="pianobar-history-"), "history.sqlite3")
+    history = PlayHistory(path)
+    history.notify(CONCRETE_MEDIATOR, START, None)
+
+    # a song every three and a half minutes, ending now
+    started = time.time() - args.rows * 210
+    print(f"inserting {args.rows} plays into {path}")
+    clock = time.perf_counter()
+    for number in range(args.rows):
+        title = " ".join(rng.sample(_WORDS, 3))
+        history.append(f"{title} {number}", f"Artist {number % 5000}", f"Album {number % 20000}",
+                       f"Station {number % 40}", number % 9 == 0, started, started + 200)
+        started += 210
+    queued = time.perf_counter() - clock
+    history.notify(CONCRETE_MEDIATOR, QUIT, None)  # waits for the writer
+    written = time.perf_counter() - clock
+    print(f"  queued in {queued:.2f}s, written in {written:.2f}s, "
+          f"{args.rows / written:,.0f} plays/s, {os.path.getsize(path) / 2 ** 20:.1f} MB")
+
+    history = PlayHistory(path)
+    history.notify(CONCRETE_MEDIATOR, START, None)
+    print("queries:")
+    page = _timed("newest page", lambda: history.query(limit=args.limit), args.repeat)
+    _timed("next page", lambda: history.query(limit=args.limit, before=page[-1]["id"]), args.repeat)
+    _timed("page in the middle", lambda: history.query(limit=args.limit, before=args.rows // 2),
+           args.repeat)
+    _timed("an hour ago", lambda: history.query(limit=5, until=time.time() - 3600), args.repeat)
+    _timed("a month ago", lambda: history.query(limit=5, until=time.time() - 30 * 86400),
+           args.repeat)
+    _timed("search a common word", lambda: history.query("river", limit=args.limit), args.repeat)
+    _timed("search two words", lambda: history.query("river moon", limit=args.limit), args.repeat)
+    _timed("search a prefix", lambda: history.query("summ", limit=args.limit), args.repeat)
+    _timed("search an artist", lambda: history.query("Artist 4242", limit=args.limit), args.repeat)
+    _timed("search a rare title", lambda: history.query(f"{args.rows // 3}", limit=args.limit),
+           args.repeat)
+    _timed("search with no match", lambda: history.query("zzzz", limit=args.limit), args.repeat)
+    history.notify(CONCRETE_MEDIATOR, QUIT, None)
+    if not args.keep:
+        os.remove(path)
+    return 0
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the play history database.")
+    parser.add_argument("--rows", type=int, default=1000000,
+                        help="plays to insert (default: %(default)s)")
+    parser.add_argument("--limit", type=int, default=50,
+                        help="plays per page (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="runs of each query (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=1,
+                        help="seed of the generated titles (default: %(default)s)")
+    parser.add_argument("--keep", action="store_true",
+                        help="keep the database")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(run(_parse_args(sys.argv[1:])))
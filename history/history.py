@@ -0,0 +1,293 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+Every song the active session played, kept in an append-only SQLite
+database in the per user data directory. A row is written when its song
+ends; rows are queued by the reader thread and written in batches by a
+thread of their own, so a slow disk never holds up pianobar's output.
+Title, artist and album are indexed with FTS5 for search.
+"""
+from constants.constants import (
+    CONCRETE_MEDIATOR,
+    HISTORY,
+    LOVE,
+    NEW_SONG,
+    NEW_STATION,
+    QUIT,
+    START
+)
+from mediator.base_component import BaseComponent
+from metrics.metrics import REGISTRY
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+_WRITE_SECONDS = REGISTRY.histogram(
+    "pianobar_wrapper_history_write_seconds",
+    "Time to write a batch of plays to the history database")
+
+_COLUMNS = ("id", "title", "artist", "album", "station", "favorite", "started", "ended")
+_INSERT = ("INSERT INTO plays (title, artist, album, station, favorite, started, ended) "
+           "VALUES (?, ?, ?, ?, ?, ?, ?)")
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS plays (
+        id INTEGER PRIMARY KEY,
+        title TEXT NOT NULL,
+        artist TEXT NOT NULL,
+        album TEXT NOT NULL,
+        station TEXT,
+        favorite INTEGER NOT NULL,
+        started REAL NOT NULL,
+        ended REAL NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS plays_started ON plays (started)",
+)
+# external content, the text is stored once in plays
+_FTS_SCHEMA = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS plays_fts USING fts5(
+        title, artist, album, content='plays', content_rowid='id')""",
+    """CREATE TRIGGER IF NOT EXISTS plays_fts_insert AFTER INSERT ON plays BEGIN
+        INSERT INTO plays_fts (rowid, title, artist, album)
+        VALUES (new.id, new.title, new.artist, new.album);
+    END""",
+)
+_SELECT = f"SELECT {', '.join('p.' + column for column in _COLUMNS)} FROM plays p"
+_SELECT_FTS = (f"SELECT {', '.join('p.' + column for column in _COLUMNS)} "
+               "FROM plays_fts f JOIN plays p ON p.id = f.rowid")
+_WORD = re.compile(r"\w+")
+
+
+def default_history_path():
+    """
+    Returns:
+        path (str): the history database, in the per user data directory
+    """
+    data_home = os.getenv("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(data_home, "pianobar-wrapper", "history.sqlite3")
+
+
+class PlayHistory(BaseComponent):
+    """
+    Records each song with its station, favorite flag and when it started
+    and ended, and answers paged queries for the GUI and remote clients.
+
+    Users of this class should only:
+    - Instantiate
+    - Set mediator
+    - Call into this class using the 'notify' method, and query it with
+      'query'.
+
+    Pages are newest first; pass the id of the last play of a page as
+    'before' to get the next one.
+    """
+
+    _batch_size = 500
+    _current = None
+    _fts = False
+    _path = None
+    _queue = None
+    _read_connection = None
+    _read_lock = None
+    _station = None
+    _writer = None
+    mediator = None
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str): the database file, defaults to the data dir
+        """
+        super().__init__()
+        self._path = path or default_history_path()
+        self._queue = queue.SimpleQueue()
+        self._read_lock = threading.Lock()
+
+    def notify(self, sender, event, event2):
+        """
+        Consumers of this class should only communicate through here
+        using the mediator design pattern.
+        """
+        if sender != CONCRETE_MEDIATOR:
+            return
+        if event == NEW_SONG:
+            now = time.time()
+            self._end_current(now)
+            self._current = (event2.title or "", event2.artist or "", event2.album or "",
+                             self._station, int(bool(event2.favorite)), now)
+        elif event == LOVE:
+            # pianobar confirmed a love of the song playing
+            if self._current is not None:
+                title, artist, album, station, _, started = self._current
+                self._current = (title, artist, album, station, 1, started)
+        elif event == NEW_STATION:
+            self._station = event2
+        elif event == START:
+            self._start()
+        elif event == QUIT:
+            self._end_current(time.time())
+            self._stop()
+
+    def append(self, title, artist, album, station, favorite, started, ended):
+        """
+        Queue a play for the writer thread.
+
+        Args:
+            title (str): the song title
+            artist (str): the artist
+            album (str): the album
+            station (str): the station it played on, or None
+            favorite (bool): True if the song was loved
+            started (float): when it started, seconds since the epoch
+            ended (float): when it ended, seconds since the epoch
+        """
+        self._queue.put((title, artist, album, station, int(bool(favorite)), started, ended))
+
+    def query(self, text=None, limit=50, before=None, until=None):
+        """
+        Args:
+            text (str): words to search title, artist and album for, the
+            last one may be a prefix. None lists every play.
+            limit (int): plays per page
+            before (int): the id of the last play of the previous page
+            until (float): only plays started by then, seconds since the
+            epoch, e.g. an hour ago
+
+        Returns:
+            plays (List[dict]): newest first, with the keys id, title,
+            artist, album, station, favorite, started and ended
+        """
+        if self._read_connection is None:
+            return []
+        sql, order, where, params = _SELECT, "p.id", [], []
+        if text:
+            words = _WORD.findall(text)
+            if not words:
+                return []
+            if self._fts:
+                # driven by the index in rowid order, so LIMIT stops it early
+                sql, order = _SELECT_FTS, "f.rowid"
+                where.append("plays_fts MATCH ?")
+                params.append(" ".join(f'"{word}"' for word in words) + "*")
+            else:
+                for word in words:
+                    where.append("(p.title LIKE ? OR p.artist LIKE ? OR p.album LIKE ?)")
+                    params += [f"%{word}%"] * 3
+        if before is not None:
+            where.append(f"{order} < ?")
+            params.append(before)
+        if until is not None:
+            where.append("p.started <= ?")
+            params.append(until)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} DESC LIMIT ?"
+        params.append(limit)
+        with self._read_lock:
+            try:
+                rows = self._read_connection.execute(sql, params).fetchall()
+            except sqlite3.Error as e:
+                _logger.error(f"{HISTORY}: query failed: {e}")
+                return []
+        return [dict(zip(_COLUMNS, row), favorite=bool(row[5])) for row in rows]
+
+    def _connect(self):
+        connection = sqlite3.connect(self._path, check_same_thread=False)
+        # readers do not wait for the writer, nor it for them
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _create_schema(self, connection):
+        """
+        Returns:
+            (bool) True if FTS5 is available, else search falls back to LIKE
+        """
+        with connection:
+            for statement in _SCHEMA:
+                connection.execute(statement)
+            try:
+                for statement in _FTS_SCHEMA:
+                    connection.execute(statement)
+            except sqlite3.OperationalError as e:
+                _logger.warning(f"{HISTORY}: no full-text search, sqlite lacks FTS5: {e}")
+                return False
+        return True
+
+    def _end_current(self, ended):
+        if self._current is not None:
+            self.append(*self._current, ended)
+            self._current = None
+
+    def _start(self):
+        try:
+            os.makedirs(os.path.dirname(self._path), mode=0o700, exist_ok=True)
+            connection = self._connect()
+            self._fts = self._create_schema(connection)
+        except (OSError, sqlite3.Error) as e:
+            _logger.error(f"{HISTORY}: play history disabled: {e}")
+            return
+        self._read_connection = connection
+        self._writer = threading.Thread(target=self._write_batches, name="history-writer", daemon=True)
+        self._writer.start()
+        _logger.debug(f"{HISTORY}: recording to {self._path}")
+
+    def _stop(self):
+        """
+        Write what is still queued and close the database.
+        """
+        if self._writer is None:
+            return
+        self._queue.put(None)
+        self._writer.join()
+        self._writer = None
+        with self._read_lock:
+            self._read_connection.close()
+            self._read_connection = None
+
+    def _write_batches(self):
+        """
+        Write whatever is queued in one transaction, until None is queued.
+        """
+        connection = self._connect()
+        stopping = False
+        while not stopping:
+            rows = [self._queue.get()]
+            while len(rows) < self._batch_size:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in rows
+            rows = [row for row in rows if row is not None]
+            if not rows:
+                continue
+            started = time.perf_counter()
+            try:
+                with connection:
+                    connection.executemany(_INSERT, rows)
+            except sqlite3.Error as e:
+                _logger.error(f"{HISTORY}: lost {len(rows)} plays: {e}")
+            _WRITE_SECONDS.observe(time.perf_counter() - started)
+        connection.close()
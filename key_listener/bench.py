@@ -0,0 +1,237 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+Benchmark of the key backends under a keystroke storm: types a stream of
+ordinary keys with a media Next every so often and reports, for each
+backend, the CPU this process spends per key and the latency from the
+Next key press to the backend handing MEDIA_NEXT to the KeyListener.
+
+The keys are injected with XTest for the X11 backends and through a
+uinput device for evdev, the ordinary key is Shift. The Next presses
+reach every media player on the desktop, so run it on a headless X
+server, evdev needs write access to /dev/uinput:
+
+    xvfb-run python3 -m key_listener.bench --keys 20000
+"""
+from constants.constants import MEDIA_NEXT
+from key_listener.key_backends import (
+    _KEY_NEXTSONG,
+    _XF86_AUDIO_NEXT,
+    KEY_BACKENDS,
+    KeyBackendError
+)
+import argparse
+import sys
+import threading
+import time
+
+_KEY_LEFTSHIFT = 42  # linux/input-event-codes.h
+_XK_SHIFT_L = 0xFFE1
+
+
+class _XTestInjector:
+    """
+    Types keys on the X display with the XTEST extension.
+    """
+
+    def __init__(self):
+        from Xlib import X
+        from Xlib.display import Display
+        from Xlib.ext import xtest
+        self._display = Display()
+        if not self._display.has_extension("XTEST"):
+            self._display.close()
+            raise KeyBackendError("the X server has no XTEST extension")
+        self._key_press = X.KeyPress
+        self._key_release = X.KeyRelease
+        self._fake_input = xtest.fake_input
+        self._next = self._display.keysym_to_keycode(_XF86_AUDIO_NEXT)
+        self._other = self._display.keysym_to_keycode(_XK_SHIFT_L)
+        if not self._next or not self._other:
+            self._display.close()
+            raise KeyBackendError("XF86AudioNext or Shift_L has no keycode")
+
+    def close(self):
+        self._display.close()
+
+    def tap(self, media):
+        """
+        Args:
+            media (bool): press Next, else Shift
+        """
+        keycode = self._next if media else self._other
+        self._fake_input(self._display, self._key_press, keycode)
+        self._fake_input(self._display, self._key_release, keycode)
+        if media:
+            self._display.sync()
+        else:
+            self._display.flush()
+
+
+class _UInputInjector:
+    """
+    Types keys on a virtual uinput keyboard, which evdev backends find
+    like any other input device.
+    """
+
+    def __init__(self):
+        try:
+            import evdev
+        except ImportError as e:
+            raise KeyBackendError(f"python-evdev is not installed: {e}")
+        self._ecodes = evdev.ecodes
+        try:
+            self._device = evdev.UInput({evdev.ecodes.EV_KEY: [_KEY_LEFTSHIFT, _KEY_NEXTSONG]},
+                                        name="pianobar-wrapper key bench")
+        except (OSError, evdev.UInputError) as e:
+            raise KeyBackendError(f"can not create a uinput device: {e}")
+
+    def close(self):
+        self._device.close()
+
+    def tap(self, media):
+        """
+        Args:
+            media (bool): press Next, else Shift
+        """
+        code = _KEY_NEXTSONG if media else _KEY_LEFTSHIFT
+        self._device.write(self._ecodes.EV_KEY, code, 1)
+        self._device.write(self._ecodes.EV_KEY, code, 0)
+        self._device.syn()
+
+
+_INJECTORS = {
+    "evdev": _UInputInjector,
+    "pynput": _XTestInjector,
+    "xlib": _XTestInjector,
+}
+
+
+def _storm(backend_class, injector, args):
+    """
+    Type the storm, with backend_class capturing keys if it is not None.
+
+    Returns:
+        (Tuple[float, List[float]]) the CPU seconds this process used and
+        the latency of each Next the backend delivered
+    """
+    arrivals = []
+    delivered = threading.Event()
+
+    def on_key(event):
+        if event == MEDIA_NEXT:
+            arrivals.append(time.perf_counter())
+            if len(arrivals) == args.keys // args.media_every:
+                delivered.set()
+
+    backend = thread = None
+    failures = []
+    if backend_class is not None:
+        backend = backend_class(on_key)
+
+        def run():
+            try:
+                backend.run()
+            except Exception as e:
+                failures.append(e)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        # let the backend grab the keys or open the devices
+        time.sleep(args.settle)
+        if failures:
+            raise failures[0]
+
+    sent = []
+    cpu = time.process_time()
+    for number in range(1, args.keys + 1):
+        if number % args.media_every == 0:
+            sent.append(time.perf_counter())
+            injector.tap(True)
+        else:
+            injector.tap(False)
+    if backend is not None:
+        delivered.wait(args.settle + 1)
+    cpu = time.process_time() - cpu
+
+    if backend is not None:
+        backend.stop()
+        thread.join(2)
+        if failures:
+            raise failures[0]
+    return cpu, [arrived - pressed for pressed, arrived in zip(sent, arrivals)]
+
+
+def run(args):
+    """
+    Returns:
+        (int) the exit code
+    """
+    media_keys = args.keys // args.media_every
+    print(f"{args.keys} keys, a Next every {args.media_every}:")
+    baselines = {}
+    for name in args.backends:
+        backend_class = KEY_BACKENDS.get(name)
+        if backend_class is None:
+            print(f"  {name:<8} unknown backend")
+            continue
+        injector_class = _INJECTORS[name]
+        try:
+            injector = injector_class()
+        except Exception as e:
+            print(f"  {name:<8} skipped, can not inject keys: {e}")
+            continue
+        try:
+            # the same storm with nothing listening, so only the backend's share is counted
+            if injector_class not in baselines:
+                baselines[injector_class], _ = _storm(None, injector, args)
+            cpu, latencies = _storm(backend_class, injector, args)
+        except KeyBackendError as e:
+            print(f"  {name:<8} skipped, {e}")
+            continue
+        finally:
+            injector.close()
+
+        overhead = max(0.0, cpu - baselines[injector_class]) / args.keys
+        line = f"  {name:<8} {overhead * 1e6:8.2f} us CPU per key"
+        if latencies:
+            latencies.sort()
+            line += (f"  Next latency median {latencies[len(latencies) // 2] * 1000:.2f} ms  "
+                     f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms  "
+                     f"max {latencies[-1] * 1000:.2f} ms")
+        print(f"{line}  ({len(latencies)} of {media_keys} Next delivered)")
+    return 0
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the media key backends.")
+    parser.add_argument("--backends", nargs="+", default=list(KEY_BACKENDS),
+                        help="backends to try (default: %(default)s)")
+    parser.add_argument("--keys", type=int, default=20000,
+                        help="keys to type per backend (default: %(default)s)")
+    parser.add_argument("--media-every", type=int, default=100,
+                        help="make every Nth key a Next (default: %(default)s)")
+    parser.add_argument("--settle", type=float, default=0.5,
+                        help="seconds a backend gets to start (default: %(default)s)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(run(_parse_args(sys.argv[1:])))
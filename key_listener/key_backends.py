@@ -0,0 +1,296 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+"""
+from constants.constants import (
+    KEY_LISTENER,
+    MEDIA_NEXT,
+    MEDIA_PLAY,
+    VOLUME_DOWN,
+    VOLUME_UP
+)
+from abc import ABC, abstractmethod
+import ctypes
+import fcntl
+import logging
+import os
+import select
+import struct
+import threading
+
+_logger = logging.getLogger(__name__)
+
+# X11 keysyms of the media keys we care about
+_XF86_AUDIO_LOWER_VOLUME = 0x1008FF11
+_XF86_AUDIO_NEXT = 0x1008FF17
+_XF86_AUDIO_PAUSE = 0x1008FF31
+_XF86_AUDIO_PLAY = 0x1008FF14
+_XF86_AUDIO_RAISE_VOLUME = 0x1008FF13
+
+# linux/input-event-codes.h
+_EV_KEY = 0x01
+_EV_MSC = 0x04
+_KEY_CNT = 0x300
+_KEY_NEXTSONG = 163
+_KEY_PAUSECD = 201
+_KEY_PLAYCD = 200
+_KEY_PLAYPAUSE = 164
+_KEY_VOLUMEDOWN = 114
+_KEY_VOLUMEUP = 115
+# _IOW('E', 0x93, struct input_mask)
+_EVIOCSMASK = 0x40104593
+
+
+class KeyBackendError(Exception):
+    """
+    Raised when a key backend can not be used on this desktop.
+    """
+
+
+class KeyBackend(ABC):
+    """
+    Base class for the ways of capturing media keys.
+
+    A backend calls 'on_key' with an event such as MEDIA_PLAY from its own
+    thread, 'run' blocks until 'stop' is called.
+    """
+
+    name = None
+
+    def __init__(self, on_key, volume_keys=False):
+        """
+        Args:
+            on_key (Callable[[str], None]): called with the media key event
+            volume_keys (bool): capture the volume keys too, which takes
+            them away from the desktop's own volume control
+        """
+        self._on_key = on_key
+        self._stop_event = threading.Event()
+        self._volume_keys = volume_keys
+
+    @abstractmethod
+    def run(self):
+        """
+        Capture media keys until 'stop' is called.
+
+        Raises:
+            KeyBackendError: when the backend can not be used here
+        """
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class XlibKeyBackend(KeyBackend):
+    """
+    Passive key grabs on the X11 root window, the X server only wakes us
+    up for the media keys.
+    """
+
+    name = "xlib"
+    _keysyms = {
+        _XF86_AUDIO_NEXT: MEDIA_NEXT,
+        _XF86_AUDIO_PAUSE: MEDIA_PLAY,
+        _XF86_AUDIO_PLAY: MEDIA_PLAY,
+    }
+    _volume_keysyms = {
+        _XF86_AUDIO_LOWER_VOLUME: VOLUME_DOWN,
+        _XF86_AUDIO_RAISE_VOLUME: VOLUME_UP,
+    }
+
+    def run(self):
+        try:
+            from Xlib import X, error
+            from Xlib.display import Display
+        except ImportError as e:
+            raise KeyBackendError(f"python-xlib is not installed: {e}")
+        try:
+            display = Display()
+        except Exception as e:
+            raise KeyBackendError(f"can not open the X display: {e}")
+
+        try:
+            root = display.screen().root
+            keycodes = {}
+            catcher = error.CatchError(error.BadAccess)
+            keysyms = self._keysyms
+            if self._volume_keys:
+                keysyms = {**keysyms, **self._volume_keysyms}
+            for keysym, event in keysyms.items():
+                keycode = display.keysym_to_keycode(keysym)
+                if not keycode:
+                    continue
+                # grab with and without NumLock / CapsLock held
+                for modifiers in (0, X.Mod2Mask, X.LockMask, X.Mod2Mask | X.LockMask):
+                    root.grab_key(keycode, modifiers, True,
+                                  X.GrabModeAsync, X.GrabModeAsync,
+                                  onerror=catcher)
+                keycodes[keycode] = event
+            display.sync()
+            if catcher.get_error() or not keycodes:
+                raise KeyBackendError("media keys are already grabbed by another client")
+            _logger.debug(f"{KEY_LISTENER}: xlib grabbed keycodes {sorted(keycodes)}")
+
+            while not self._stop_event.is_set():
+                readable, _, _ = select.select([display], [], [], 0.5)
+                if not readable and not display.pending_events():
+                    continue
+                while display.pending_events():
+                    xevent = display.next_event()
+                    if xevent.type == X.KeyPress and xevent.detail in keycodes:
+                        self._on_key(keycodes[xevent.detail])
+        finally:
+            display.close()
+
+
+class EvdevKeyBackend(KeyBackend):
+    """
+    Reads the input devices that report media keys, asking the kernel to
+    only deliver those key codes to us where it supports EVIOCSMASK.
+    """
+
+    name = "evdev"
+    _codes = {
+        _KEY_NEXTSONG: MEDIA_NEXT,
+        _KEY_PAUSECD: MEDIA_PLAY,
+        _KEY_PLAYCD: MEDIA_PLAY,
+        _KEY_PLAYPAUSE: MEDIA_PLAY,
+    }
+    _volume_codes = {
+        _KEY_VOLUMEDOWN: VOLUME_DOWN,
+        _KEY_VOLUMEUP: VOLUME_UP,
+    }
+
+    def run(self):
+        try:
+            import evdev
+        except ImportError as e:
+            raise KeyBackendError(f"python-evdev is not installed: {e}")
+
+        codes = self._codes
+        if self._volume_keys:
+            codes = {**codes, **self._volume_codes}
+        devices = []
+        for path in evdev.list_devices():
+            try:
+                device = evdev.InputDevice(path)
+            except OSError:
+                continue
+            keys = device.capabilities().get(_EV_KEY, [])
+            if any(code in keys for code in codes):
+                self._set_event_mask(device, codes)
+                devices.append(device)
+            else:
+                device.close()
+        if not devices:
+            raise KeyBackendError("no readable input device reports media keys")
+        _logger.debug(f"{KEY_LISTENER}: evdev reading {[d.path for d in devices]}")
+
+        try:
+            fds = {device.fd: device for device in devices}
+            while not self._stop_event.is_set():
+                readable, _, _ = select.select(list(fds), [], [], 0.5)
+                for fd in readable:
+                    try:
+                        events = list(fds[fd].read())
+                    except OSError:
+                        # device unplugged, keep reading the others
+                        fds.pop(fd).close()
+                        continue
+                    for event in events:
+                        # value 1 is key down, 2 is autorepeat, which only
+                        # the volume keys follow
+                        if event.type != _EV_KEY or event.code not in codes:
+                            continue
+                        if event.value == 1 or (event.value == 2 and event.code in self._volume_codes):
+                            self._on_key(codes[event.code])
+                if not fds:
+                    raise KeyBackendError("all media key devices went away")
+        finally:
+            for device in devices:
+                try:
+                    device.close()
+                except OSError:
+                    pass
+
+    def _set_event_mask(self, device, codes):
+        """
+        Ask the kernel to drop every event from this device but the media
+        key codes, so ordinary typing never reaches Python.
+        """
+        key_bits = (ctypes.c_uint8 * (_KEY_CNT // 8))()
+        for code in codes:
+            key_bits[code // 8] |= 1 << (code % 8)
+        no_bits = (ctypes.c_uint8 * 1)()
+        try:
+            for event_type, bits in ((_EV_KEY, key_bits), (_EV_MSC, no_bits)):
+                mask = struct.pack("=IIQ", event_type, len(bits), ctypes.addressof(bits))
+                fcntl.ioctl(device.fd, _EVIOCSMASK, mask)
+        except OSError as e:
+            _logger.debug(f"{KEY_LISTENER}: EVIOCSMASK unsupported on {device.path}: {e}")
+
+
+class PynputKeyBackend(KeyBackend):
+    """
+    The global pynput listener, it sees every key press so it is the last
+    resort.
+    """
+
+    name = "pynput"
+
+    def run(self):
+        try:
+            from pynput import keyboard
+        except ImportError as e:
+            raise KeyBackendError(f"pynput is not installed: {e}")
+        keys = {
+            keyboard.Key.media_next: MEDIA_NEXT,
+            keyboard.Key.media_play_pause: MEDIA_PLAY,
+        }
+        if self._volume_keys:
+            keys[keyboard.Key.media_volume_down] = VOLUME_DOWN
+            keys[keyboard.Key.media_volume_up] = VOLUME_UP
+
+        def on_press(key):
+            event = keys.get(key)
+            if event is not None:
+                self._on_key(event)
+
+        with keyboard.Listener(on_press=on_press) as listener:
+            while not self._stop_event.wait(0.5):
+                if not listener.running:
+                    raise KeyBackendError("pynput listener stopped")
+            listener.stop()
+
+
+KEY_BACKENDS = {
+    backend.name: backend
+    for backend in (XlibKeyBackend, EvdevKeyBackend, PynputKeyBackend)
+}
+
+
+def default_backend_names():
+    """
+    Returns:
+        names (Tuple[str, ...]): backends to try in order, Wayland sessions
+        skip the X11 grab as it only sees XWayland clients
+    """
+    if os.getenv("WAYLAND_DISPLAY"):
+        return "evdev", "pynput"
+    return "xlib", "evdev", "pynput"
@@ -25,12 +25,30 @@ from constants.constants import (
     KEY_LISTENER,
     MEDIA_NEXT,
     MEDIA_PLAY,
-    START
+    QUIT,
+    START,
+    VOLUME_DOWN,
+    VOLUME_UP
+)
+from key_listener.key_backends import (
+    KEY_BACKENDS,
+    KeyBackendError,
+    default_backend_names
 )
 from mediator.base_component import BaseComponent
-from pynput import keyboard
+from metrics.metrics import REGISTRY
+from tracing.tracing import TRACER
 import logging
 
+_logger = logging.getLogger(__name__)
+
+_BACKEND_FAILURES = REGISTRY.counter(
+    "pianobar_wrapper_key_backend_failures_total",
+    "Key backends which could not be used", ("backend",))
+_MEDIA_KEYS = REGISTRY.counter(
+    "pianobar_wrapper_media_keys_total",
+    "Media key presses passed on to the mediator", ("event",))
+
 
 class KeyListener(BaseComponent):
     """
@@ -40,16 +58,42 @@ class KeyListener(BaseComponent):
     - Instantiate
     - Set mediator
     - Call into this class using the 'notify' method.
+
+    Media keys are captured by the first key backend that works on this
+    desktop, see key_backends.py. The backends which only grab the media
+    keys are preferred over the global pynput hook. The volume keys are
+    only captured when asked for, the desktop usually handles them.
     """
-    _hotkeys = None
-    _kb_next = keyboard.Key.media_next
-    _kb_pp = keyboard.Key.media_play_pause
+    _backend = None
+    _backend_names = None
     _listener_thread = None
-    _media_keys = (keyboard.Key.media_play_pause, keyboard.Key.media_next, keyboard.Key.media_previous)
+    _media_events = (MEDIA_NEXT, MEDIA_PLAY)
+    _stopped = False
+    _volume_keys = False
     mediator = None
 
-    def __init__(self):
+    def __init__(self, backend_names=None, volume_keys=False):
+        """
+        Args:
+            backend_names (Tuple[str, ...]): key backends to try in order,
+            defaults to the best ones for this session
+            volume_keys (bool): pass the volume keys on as VOLUME_UP and
+            VOLUME_DOWN, taking them from the desktop
+        """
         super().__init__()
+        if backend_names is None:
+            backend_names = default_backend_names()
+        self._backend_names = tuple(backend_names)
+        self._volume_keys = volume_keys
+        if volume_keys:
+            self._media_events = self._media_events + (VOLUME_DOWN, VOLUME_UP)
+
+    @property
+    def backend_name(self):
+        """
+        Returns: (str) the name of the key backend in use, or None
+        """
+        return self._backend.name if self._backend else None
 
     def notify(self, sender, event, event2):
         """
@@ -57,39 +101,57 @@ class KeyListener(BaseComponent):
         using the mediator design pattern.
         """
         if sender == CONCRETE_MEDIATOR and event == START:
-            logging.debug(f"{KEY_LISTENER}: Startup has been requested")
+            _logger.debug(f"{KEY_LISTENER}: Startup has been requested")
             self._start()
+        elif sender == CONCRETE_MEDIATOR and event == QUIT:
+            self._stop()
 
-    def _handle_media_key(self, key):
+    def _handle_media_key(self, event):
         """
-        Test and notify mediator if key is play/pause or next
+        Notify mediator of a media key press
         Args:
-            key (keyboard.Key): the key to eval.
-        """
-        try:
-            if key == self._kb_pp:
-                logging.debug(f"{KEY_LISTENER}: Media Play/Pause pressed")
-                self.mediator.notify(KEY_LISTENER, MEDIA_PLAY, event2=None)
-            elif key == self._kb_next:
-                logging.debug(f"{KEY_LISTENER}: Media Next pressed")
-                self.mediator.notify(KEY_LISTENER, MEDIA_NEXT, event2=None)
-        except AttributeError:
-            logging.error(f"{KEY_LISTENER}: AttributeError with key {key}")
-
-    def _on_press(self, key):
-        """
-        Test if the key pressed is of concern to us.
+            event (str): the media key event from the backend
         """
-        if key in self._media_keys:
-            self._handle_media_key(key)
+        if event not in self._media_events:
+            return
+        _logger.debug("%s: Media key pressed: %s", KEY_LISTENER, event)
+        _MEDIA_KEYS.labels(event).inc()
+        with TRACER.action(event, KEY_LISTENER):
+            self.mediator.notify(KEY_LISTENER, event, event2=None)
 
     def _run_listener(self):
-        with keyboard.Listener(on_press=self._on_press) as listener:
-            listener.join()
+        """
+        Run the first key backend that works, falling back to the next on
+        failure.
+        """
+        for name in self._backend_names:
+            if self._stopped:
+                return
+            backend_class = KEY_BACKENDS.get(name)
+            if backend_class is None:
+                _logger.error(f"{KEY_LISTENER}: unknown key backend {name}")
+                continue
+            self._backend = backend_class(self._handle_media_key, self._volume_keys)
+            _logger.debug(f"{KEY_LISTENER}: trying key backend {name}")
+            try:
+                self._backend.run()
+                return
+            except KeyBackendError as e:
+                _logger.info(f"{KEY_LISTENER}: key backend {name} unavailable: {e}")
+            except Exception as e:
+                _logger.error(f"{KEY_LISTENER}: key backend {name} failed: {e}")
+            _BACKEND_FAILURES.labels(name).inc()
+        self._backend = None
+        _logger.error(f"{KEY_LISTENER}: no key backend available, media keys disabled")
 
     def _start(self):
-        logging.debug(f"{KEY_LISTENER}: Registering hotkeys")
+        _logger.debug(f"{KEY_LISTENER}: Registering hotkeys")
         self._listener_thread = Thread(target=self._run_listener)
         self._listener_thread.daemon = True
         self._listener_thread.start()
-        logging.debug(f"{KEY_LISTENER}: Listener thread started")
+        _logger.debug(f"{KEY_LISTENER}: Listener thread started")
+
+    def _stop(self):
+        self._stopped = True
+        if self._backend:
+            self._backend.stop()
@@ -0,0 +1,335 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+Listening statistics per station and per artist, kept up to date as the
+events arrive instead of being computed from the play history: songs
+started, seconds listened, skips (songs left before 90% of their
+duration) and loves. Time updates add the seconds that passed, every
+other event is a dictionary lookup, so a summary is always ready.
+
+The totals are checkpointed to the per user data directory. The events
+of the current run are recorded next to them, and replaying the
+recording must give the run's rollups again, which is what
+'python3 -m listening_stats.verify' checks.
+"""
+from constants.constants import (
+    CONCRETE_MEDIATOR,
+    LISTENING_STATS,
+    LOVE,
+    NEW_SONG,
+    NEW_STATION,
+    QUIT,
+    START,
+    TIME_UPDATE
+)
+from mediator.base_component import BaseComponent
+from song.song import Song
+import json
+import logging
+import os
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+CHECKPOINT_VERSION = 1
+
+
+def default_stats_dir():
+    """
+    Returns:
+        path (str): where the checkpoint and recording go, in the per user
+        data directory
+    """
+    data_home = os.getenv("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(data_home, "pianobar-wrapper", "stats")
+
+
+class Rollup:
+    """
+    The aggregates of one station or artist.
+    """
+
+    __slots__ = ("listened", "loves", "skips", "songs")
+
+    def __init__(self, songs=0, listened=0, skips=0, loves=0):
+        self.listened = listened  # seconds
+        self.loves = loves
+        self.skips = skips
+        self.songs = songs
+
+    def summary(self):
+        """
+        Returns:
+            (dict): the counts with the skip and love rates
+        """
+        return {"songs": self.songs, "listened": self.listened, "skips": self.skips,
+                "loves": self.loves,
+                "skip_rate": self.skips / self.songs if self.songs else 0.0,
+                "love_rate": self.loves / self.songs if self.songs else 0.0}
+
+    def to_list(self):
+        return [self.songs, self.listened, self.skips, self.loves]
+
+
+class Rollups:
+    """
+    Folds the player events into per station and per artist Rollups. It
+    only depends on the events, never on the clock, so replaying recorded
+    events rebuilds exactly the same rollups.
+    """
+
+    _max_step = 5  # seconds, a bigger jump is a seek or a missed update
+    _skip_ratio = 0.9
+
+    def __init__(self):
+        self.artists = {}
+        self.stations = {}
+        self._current = None  # [station rollup, artist rollup, position, duration, loved]
+        self._station = None
+
+    def apply(self, event, event2):
+        """
+        Args:
+            event (str): NEW_SONG, NEW_STATION, TIME_UPDATE, LOVE or QUIT
+            event2: the event's data, as the mediator sends it
+        """
+        if event == TIME_UPDATE:
+            current = self._current
+            if current is None:
+                return
+            position, duration = event2
+            step = position - current[2]
+            if 0 < step <= self._max_step:
+                current[0].listened += step
+                current[1].listened += step
+            current[2] = position
+            current[3] = duration
+        elif event == NEW_SONG:
+            self._end_song(counted=True)
+            station = self._rollup(self.stations, self._station or "")
+            artist = self._rollup(self.artists, event2.artist or "")
+            station.songs += 1
+            artist.songs += 1
+            self._current = [station, artist, 0, 0, bool(event2.favorite)]
+        elif event == NEW_STATION:
+            self._station = event2
+        elif event == LOVE:
+            if self._current is not None:
+                self._current[4] = True
+        elif event == QUIT:
+            # the song was not skipped, the app was closed
+            self._end_song(counted=False)
+
+    def summary(self, limit=None):
+        """
+        Args:
+            limit (int): only the stations and artists listened to longest
+
+        Returns:
+            (dict): "stations" and "artists", each name => Rollup.summary()
+        """
+        def top(rollups):
+            ranked = sorted(rollups.items(), key=lambda item: item[1].listened, reverse=True)
+            return {name: rollup.summary() for name, rollup in ranked[:limit]}
+        return {"artists": top(self.artists), "stations": top(self.stations)}
+
+    def to_dict(self):
+        return {"artists": {name: rollup.to_list() for name, rollup in self.artists.items()},
+                "stations": {name: rollup.to_list() for name, rollup in self.stations.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        rollups = cls()
+        for name, values in data.get("artists", {}).items():
+            rollups.artists[name] = Rollup(*values)
+        for name, values in data.get("stations", {}).items():
+            rollups.stations[name] = Rollup(*values)
+        return rollups
+
+    def _end_song(self, counted):
+        current, self._current = self._current, None
+        if current is None or not counted:
+            return
+        station, artist, position, duration, loved = current
+        if duration and position < duration * self._skip_ratio:
+            station.skips += 1
+            artist.skips += 1
+        if loved:
+            station.loves += 1
+            artist.loves += 1
+
+    @staticmethod
+    def _rollup(rollups, name):
+        rollup = rollups.get(name)
+        if rollup is None:
+            rollup = rollups[name] = Rollup()
+        return rollup
+
+
+def decode_event(record):
+    """
+    Args:
+        record (list): a line of the recording, [event, data]
+
+    Returns:
+        (Tuple[str, object]): the event and its data as Rollups.apply
+        takes them
+    """
+    event, data = record
+    if event == NEW_SONG:
+        title, artist, album, favorite = data
+        data = Song(album, artist, favorite, title)
+    elif event == TIME_UPDATE:
+        data = tuple(data)
+    return event, data
+
+
+def encode_event(event, event2):
+    """
+    Returns:
+        (list): a line for the recording, the inverse of decode_event
+    """
+    if event == NEW_SONG:
+        event2 = [event2.title, event2.artist, event2.album, bool(event2.favorite)]
+    return [event, event2]
+
+
+class ListeningStats(BaseComponent):
+    """
+    Keeps the listening rollups of all time and of this run, both fed
+    every event as it comes.
+
+    Users of this class should only:
+    - Instantiate
+    - Set mediator
+    - Call into this class using the 'notify' method, and read it with
+      'summary'.
+    """
+
+    _checkpoint_interval = 300.0  # seconds
+    _checkpoint_path = None
+    _events = 0
+    _last_checkpoint = 0.0
+    _lock = None
+    _recording = None
+    _recording_path = None
+    _run = None
+    _totals = None
+    mediator = None
+
+    def __init__(self, stats_dir=None):
+        """
+        Args:
+            stats_dir (str): where the checkpoint and the recording of this
+            run go, defaults to the data dir
+        """
+        super().__init__()
+        stats_dir = stats_dir or default_stats_dir()
+        self._checkpoint_path = os.path.join(stats_dir, "checkpoint.json")
+        self._lock = threading.Lock()
+        self._recording_path = os.path.join(stats_dir, "recording.jsonl")
+        self._run = Rollups()
+        self._totals = Rollups()
+
+    def notify(self, sender, event, event2):
+        """
+        Consumers of this class should only communicate through here
+        using the mediator design pattern.
+        """
+        if sender != CONCRETE_MEDIATOR:
+            return
+        if event == START:
+            self._start()
+            return
+        if event not in (LOVE, NEW_SONG, NEW_STATION, QUIT, TIME_UPDATE):
+            return
+        with self._lock:
+            self._run.apply(event, event2)
+            self._totals.apply(event, event2)
+            if self._recording is not None:
+                self._recording.write(json.dumps(encode_event(event, event2)) + "\n")
+            self._events += 1
+        if event == QUIT:
+            self._checkpoint()
+            self._stop()
+        elif time.monotonic() - self._last_checkpoint >= self._checkpoint_interval:
+            self._checkpoint()
+
+    def summary(self, limit=None, run=False):
+        """
+        Args:
+            limit (int): only the stations and artists listened to longest
+            run (bool): True for this run only, else all time
+
+        Returns:
+            (dict): "stations" and "artists", each name => songs, listened
+            seconds, skips, loves, skip_rate and love_rate
+        """
+        with self._lock:
+            return (self._run if run else self._totals).summary(limit)
+
+    def _checkpoint(self):
+        """
+        Write the totals, and this run's rollups with how many recorded
+        events they cover, so the recording can be checked against them.
+        """
+        with self._lock:
+            data = {"version": CHECKPOINT_VERSION, "totals": self._totals.to_dict(),
+                    "run": {"events": self._events, "recording": self._recording_path,
+                            "rollups": self._run.to_dict()}}
+            if self._recording is not None:
+                self._recording.flush()
+        self._last_checkpoint = time.monotonic()
+        tmp_path = self._checkpoint_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_path, self._checkpoint_path)
+        except OSError as e:
+            _logger.error(f"{LISTENING_STATS}: could not write {self._checkpoint_path}: {e}")
+
+    def _start(self):
+        """
+        Load the totals of the previous runs and start a new recording.
+        """
+        try:
+            os.makedirs(os.path.dirname(self._checkpoint_path), mode=0o700, exist_ok=True)
+            with open(self._checkpoint_path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CHECKPOINT_VERSION:
+                self._totals = Rollups.from_dict(data["totals"])
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            _logger.error(f"{LISTENING_STATS}: starting from scratch, could not read "
+                          f"{self._checkpoint_path}: {e}")
+        try:
+            self._recording = open(self._recording_path, "w", encoding="utf-8")
+        except OSError as e:
+            _logger.error(f"{LISTENING_STATS}: not recording this run: {e}")
+        # the checkpoint describes the new, empty recording from now on
+        self._checkpoint()
+
+    def _stop(self):
+        with self._lock:
+            if self._recording is not None:
+                self._recording.close()
+                self._recording = None
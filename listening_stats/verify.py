@@ -0,0 +1,66 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+Rebuild this run's listening rollups from its recording and compare them
+with the ones kept incrementally in the last checkpoint:
+
+    python3 -m listening_stats.verify [--stats-dir DIR]
+"""
+from listening_stats.listening_stats import Rollups, decode_event, default_stats_dir
+import argparse
+import json
+import os
+import sys
+
+
+def verify(stats_dir):
+    """
+    Returns:
+        (int) the exit code, 1 if the rollups differ
+    """
+    with open(os.path.join(stats_dir, "checkpoint.json"), encoding="utf-8") as f:
+        run = json.load(f)["run"]
+    rebuilt = Rollups()
+    with open(run["recording"], encoding="utf-8") as f:
+        for number, line in enumerate(f):
+            if number == run["events"]:
+                break
+            rebuilt.apply(*decode_event(json.loads(line)))
+    expected = run["rollups"]
+    actual = json.loads(json.dumps(rebuilt.to_dict()))
+    if actual != expected:
+        for kind in ("stations", "artists"):
+            for name in sorted(set(actual[kind]) | set(expected[kind])):
+                if actual[kind].get(name) != expected[kind].get(name):
+                    print(f"{kind[:-1]} {name!r}: checkpoint {expected[kind].get(name)}, "
+                          f"rebuilt {actual[kind].get(name)}")
+        print("verify: FAIL, the rollups differ", file=sys.stderr)
+        return 1
+    print(f"verify: ok, {run['events']} events, {len(actual['stations'])} stations, "
+          f"{len(actual['artists'])} artists")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check the incremental listening rollups against a replay of the recording.")
+    parser.add_argument("--stats-dir", default=default_stats_dir(),
+                        help="the stats directory (default: %(default)s)")
+    sys.exit(verify(parser.parse_args().stats_dir))
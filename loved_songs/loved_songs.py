@@ -0,0 +1,167 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+The songs the user loved, kept locally so the heart is right the moment
+a song starts, on any station, not only when pianobar prints "<3".
+
+The file is a magic followed by one little endian u64 per song, a hash of
+its normalized artist, title and album. Loading is one read and a set
+built from the array; a new love appends 8 bytes.
+"""
+from array import array
+from constants.constants import LOVED_SONGS
+import hashlib
+import logging
+import os
+import sys
+import threading
+import unicodedata
+
+_logger = logging.getLogger(__name__)
+
+MAGIC = b"PBLOVED1"
+
+
+def default_loved_songs_path():
+    """
+    Returns:
+        path (str): the loved songs file, in the per user data directory
+    """
+    data_home = os.getenv("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(data_home, "pianobar-wrapper", "loved_songs.bin")
+
+
+def song_key(artist, title, album):
+    """
+    Returns:
+        key (int): the 64 bit key of a song, the same whatever the case,
+        spacing or Unicode form pianobar printed it in
+    """
+    text = "\x1f".join(" ".join(unicodedata.normalize("NFKC", part or "").casefold().split())
+                       for part in (artist, title, album))
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class LovedSongs:
+    """
+    A persistent set of loved songs with O(1) lookups.
+    """
+
+    _file = None
+    _keys = None
+    _lock = None
+    _path = None
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str): the loved songs file, defaults to the data dir
+        """
+        self._keys = set()
+        self._lock = threading.Lock()
+        self._path = path or default_loved_songs_path()
+
+    def __contains__(self, song):
+        return song_key(song.artist, song.title, song.album) in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, song):
+        """
+        Remember a loved song, from a confirmed LOVE or a "<3".
+
+        Args:
+            song (Song): the song
+        """
+        key = song_key(song.artist, song.title, song.album)
+        with self._lock:
+            if key in self._keys:
+                return
+            self._keys.add(key)
+            if self._file is None:
+                return
+            try:
+                self._file.write(key.to_bytes(8, "little"))
+                self._file.flush()
+            except OSError as e:
+                _logger.error(f"{LOVED_SONGS}: could not save a loved song: {e}")
+
+    def check(self, song):
+        """
+        Learn from a new song's "<3", or mark it a favorite if it was loved
+        before, e.g. on another station.
+
+        Args:
+            song (Song): the song pianobar just started
+
+        Returns:
+            song (Song): the song, a loved copy if it was loved before
+        """
+        if song.favorite:
+            self.add(song)
+        elif song in self:
+            song = song.replace(favorite=True)
+        return song
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def load(self):
+        """
+        Read the file and open it for appending, a missing file starts an
+        empty set.
+        """
+        keys = array("Q")
+        try:
+            with open(self._path, "rb") as f:
+                data = f.read()
+            if not data.startswith(MAGIC):
+                raise ValueError("not a loved songs file")
+            # a torn append after a crash leaves a partial entry
+            end = len(MAGIC) + (len(data) - len(MAGIC)) // keys.itemsize * keys.itemsize
+            keys.frombytes(data[len(MAGIC):end])
+            if sys.byteorder != "little":
+                keys.byteswap()
+        except FileNotFoundError:
+            end = None
+        except (OSError, ValueError) as e:
+            _logger.error(f"{LOVED_SONGS}: starting empty, could not read {self._path}: {e}")
+            end = None
+        with self._lock:
+            self._keys.update(keys)
+            try:
+                os.makedirs(os.path.dirname(self._path), mode=0o700, exist_ok=True)
+                if end is None:
+                    self._file = open(self._path, "wb")
+                    self._file.write(MAGIC)
+                    self._file.write(b"".join(key.to_bytes(8, "little") for key in self._keys))
+                else:
+                    self._file = open(self._path, "r+b")
+                    self._file.truncate(end)
+                    self._file.seek(end)
+                self._file.flush()
+            except OSError as e:
+                _logger.error(f"{LOVED_SONGS}: loves will not be saved: {e}")
+                self._file = None
+        _logger.debug(f"{LOVED_SONGS}: {len(self._keys)} loved songs")
@@ -18,21 +18,232 @@ python-pianobar-wrapper:
     You should have received a copy of the GNU General Public License
     along with this program.  If not, see <https://www.gnu.org/licenses/>
 """
-from colorlog import ColoredFormatter
+# Keep the imports here light: a second launch only forwards its command
+# to the running instance and must not pay for Tk, PIL or pystray.
 from constants.constants import MAIN, START
-from mediator.concrete_mediator import ConcreteMediator
+import argparse
+import atexit
+import fcntl
+import gzip
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import shutil
 import sys
+import time
 
+# the open lock file, held for the life of the first instance
+_instance_lock = None
 
-def _start_logging(debug_on):
+# writes the queued log records, see _start_logging
+_log_listener = None
+
+# command line flag => control API request
+_COMMANDS = (
+    ("export_trace", "write recent action traces as Chrome trace JSON",
+     {"cmd": "export_trace"}),
+    ("info", "show the details of the current song", {"cmd": "info"}),
+    ("love", "love the current song", {"cmd": "love"}),
+    ("next", "skip to the next song", {"cmd": "next"}),
+    ("play_pause", "toggle play / pause", {"cmd": "play_pause"}),
+    ("quit", "quit the running instance", {"cmd": "quit"}),
+    ("show", "show the main window", {"cmd": "show"}),
+    ("stats", "show the stations and artists listened to most", {"cmd": "stats", "limit": 10}),
+)
+
+
+def _acquire_instance_lock():
+    """
+    Take the per user instance lock, the kernel drops it when we exit.
+
+    Returns:
+        (bool) True if this is the first instance
+    """
+    global _instance_lock
+    from control_api.control_api import default_socket_path
+    lock_dir = os.path.dirname(default_socket_path())
+    os.makedirs(lock_dir, mode=0o700, exist_ok=True)
+    lock_file = open(os.path.join(lock_dir, "instance.lock"), "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _instance_lock = lock_file
+    return True
+
+
+def _forward_command(request):
+    """
+    Send the command to the running instance.
+
+    Args:
+        request (dict): the control API request
+
+    Returns:
+        (int) the process exit code
+    """
+    from control_api.control_api import send_request
+    try:
+        # pianobar gives up on a command after 15 seconds, details are
+        # asked for when they are not cached
+        waits = request.get("wait") or request["cmd"] == "info"
+        reply = send_request(request, timeout=20.0 if waits else 2.0)
+    except OSError as e:
+        print(f"pianobar-gui: the running instance is not answering: {e}", file=sys.stderr)
+        return 1
+    if not reply.get("ok"):
+        print(f"pianobar-gui: {reply.get('error')}", file=sys.stderr)
+        return 1
+    if "path" in reply:
+        print(reply["path"])
+    for play in reply.get("plays", ()):
+        started = time.strftime("%Y-%m-%d %H:%M", time.localtime(play["started"]))
+        print(f"{started}  {play['title']} by {play['artist']} on {play['album']}"
+              f"{' <3' if play['favorite'] else ''} @ {play['station']}")
+    for kind, rollups in reply.get("stats", {}).items():
+        print(f"{kind}:")
+        for name, rollup in rollups.items():
+            print(f"  {rollup['listened'] / 3600:7.1f} h  {rollup['songs']:6} songs  "
+                  f"{rollup['skip_rate']:4.0%} skipped  {rollup['love_rate']:4.0%} loved  {name}")
+    info = reply.get("info")
+    if info is not None:
+        print(f"{info['title']} by {info['artist']} on {info['album']}{' <3' if info['loved'] else ''}")
+        if info["station"]:
+            print(f"station: {info['station']}")
+        for name, value in info["fields"].items():
+            print(f"{name}: {value}")
+        if info["detail_url"]:
+            print(info["detail_url"])
+    if "volume" in reply:
+        print(f"volume: {reply['volume']} dB")
+    if "seconds" in reply:
+        print(f"confirmed in {reply['seconds'] * 1000:.0f} ms")
+    return 0
+
+
+def _load_sessions():
+    """
+    Read the pianobar sessions to run from
+    $XDG_CONFIG_HOME/pianobar-wrapper/sessions.json, a JSON object of
+    session id => the config home holding that session's pianobar/config
+    and pianobar/ctl, e.g. {"home": null, "shop": "~/.config/pb-shop"}.
+    null uses the user's own pianobar config.
+
+    Returns:
+        sessions (Dict[str, str]): the sessions, or None for the single
+        default session
+    """
+    config_home = os.getenv("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    path = os.path.join(config_home, "pianobar-wrapper", "sessions.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            sessions = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"pianobar-gui: ignoring {path}: {e}", file=sys.stderr)
+        return None
+    if not isinstance(sessions, dict) or not sessions:
+        print(f"pianobar-gui: ignoring {path}: expected a non empty JSON object", file=sys.stderr)
+        return None
+    return {str(session_id): os.path.expanduser(config) if config else None
+            for session_id, config in sessions.items()}
+
+
+def _parse_args(argv):
+    """
+    Args:
+        argv (List[str]): the command line arguments
+
+    Returns:
+        request (dict): the control API request asked for, or None
     """
-    Configure the logging of this application
+    parser = argparse.ArgumentParser(
+        description="Python Pianobar Wrapper. With a command, controls the "
+                    "running instance and exits.")
+    group = parser.add_mutually_exclusive_group()
+    for name, help_text, request in _COMMANDS:
+        group.add_argument(f"--{name.replace('_', '-')}", dest="request",
+                           action="store_const", const=request, help=help_text)
+    group.add_argument("--station", metavar="NAME",
+                       help="change to the station with this name or number")
+    group.add_argument("--session", metavar="ID",
+                       help="control the pianobar session with this id")
+    group.add_argument("--history", metavar="WORDS", nargs="?", const="",
+                       help="list the last songs played, or search them")
+    group.add_argument("--volume", metavar="CHANGE", nargs="?", const="",
+                       help="show the volume, or change it by steps such as "
+                            "+3 or -2, or 'reset' it")
+    parser.add_argument("--wait", action="store_true",
+                        help="wait until pianobar confirms the command")
+    args = parser.parse_args(argv)
+    request = args.request
+    if args.volume is not None:
+        request = {"cmd": "volume"}
+        if args.volume == "reset":
+            request["change"] = "reset"
+        elif args.volume:
+            try:
+                request["change"] = int(args.volume)
+            except ValueError:
+                parser.error("argument --volume: expected steps such as +3 or -2, or 'reset'")
+    elif args.history is not None:
+        request = {"cmd": "history", "query": args.history or None}
+    elif args.session is not None:
+        request = {"cmd": "session", "session": args.session}
+    elif args.station is not None:
+        request = {"cmd": "station", "station": args.station}
+    if request is not None and args.wait:
+        request = dict(request, wait=True)
+    return request
+
+
+def _compress_log(source, dest):
+    """
+    Rotator of the log file, the rotated file is gzipped on the logging
+    thread so no caller waits on it.
+    """
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def _log_levels(spec):
+    """
+    Args:
+        spec (str): e.g. "pianobar=DEBUG,mediator=WARNING", the names are
+        module packages such as pianobar or key_listener
+
+    Returns:
+        levels (Dict[str, str]): logger name => level name
+    """
+    levels = {}
+    for item in (spec or "").split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _start_logging(debug_on, levels=None):
+    """
+    Configure the logging of this application.
+
+    Records are put on a queue by the thread which logs them and written
+    by a QueueListener thread, so the pianobar reader and the Tk loop never
+    wait on stdout or the disk.
 
     Args:
         debug_on (bool): True, False
+        levels (Dict[str, str]): logger name => level, e.g.
+        {"pianobar": "DEBUG"}, read from PIANOBAR_WRAPPER_LOG_LEVELS
     """
+    global _log_listener
+    from colorlog import ColoredFormatter
+
     script_dir = os.path.dirname(os.path.abspath(__file__))
     log_file_path = os.path.join(script_dir, "logfile.log")
 
@@ -50,24 +261,38 @@ def _start_logging(debug_on):
             'CRITICAL': 'light_white,bg_black',
         })
 
-    logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(color_formatter)
-    logger.addHandler(console_handler)
-    logger.info("Main: Logging to file: " + str(bool(debug_on)))
+    handlers = [console_handler]
     if debug_on:
-        logger.setLevel(logging.DEBUG)
-        file_handler = logging.FileHandler("logfile.log", encoding="utf-8")
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file_path, maxBytes=5 * 1024 * 1024, backupCount=5, encoding="utf-8")
+        file_handler.namer = lambda name: name + ".gz"
+        file_handler.rotator = _compress_log
         file_handler.setFormatter(
             logging.Formatter('%(asctime)s:%(levelname)s:%(message)s'))
-        logger.addHandler(file_handler)
-        log_file_path = os.path.join(log_file_path, "logfile.log")
-        logger.info(f"Main: Logging to file: {log_file_path}")
+        handlers.append(file_handler)
+
+    log_queue = queue.SimpleQueue()
+    _log_listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)  # flush what is still queued
+
+    logger = logging.getLogger()
+    logger.setLevel(logging.DEBUG if debug_on else logging.INFO)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    for name, level in (levels or {}).items():
+        logging.getLogger(name).setLevel(level)
+
+    logger.info("Main: Logging to file: %s", bool(debug_on))
+    if debug_on:
+        logger.info("Main: Logging to file: %s", log_file_path)
     logger.info("Main: Starting up!")
 
 
-def start(debug_on, app_icon, app_name, theme):
+def start(debug_on, app_icon, app_name, theme, sessions=None, skip_stalled=False,
+          volume_keys=False):
     """
     Starts the entire application.
 
@@ -76,20 +301,43 @@ def start(debug_on, app_icon, app_name, theme):
         app_icon (str): the icon you want to see in your desktop OS
         app_name (str): the name of the app you want to see in OS notification's
         theme (str): the ttkbootstrap theme for the application
+        sessions (Dict[str, str]): session id => pianobar config home, None
+        for the single default session
+        skip_stalled (bool): skip to the next song when playback stalled
+        for 30 seconds
+        volume_keys (bool): let the volume keys control pianobar's volume
+        instead of the desktop's
     """
-    _start_logging(debug_on)
+    from mediator.concrete_mediator import ConcreteMediator
+    from memory_report import memory_report
+
+    _start_logging(debug_on, _log_levels(os.getenv("PIANOBAR_WRAPPER_LOG_LEVELS")))
+    # kill -USR1 <pid> reports the top allocation sites
+    memory_report.install()
     _cm = ConcreteMediator(app_icon=app_icon,
                            app_name=app_name,
-                           theme=theme)
+                           theme=theme,
+                           sessions=sessions,
+                           skip_stalled=skip_stalled,
+                           volume_keys=volume_keys)
     _cm.notify(MAIN, event=START, event2=None)
 
 
 if __name__ == '__main__':
+    request = _parse_args(sys.argv[1:])
+    if not _acquire_instance_lock():
+        # already running, hand over the command (or just show it)
+        sys.exit(_forward_command(request or {"cmd": "show"}))
+    if request is not None and request["cmd"] != "show":
+        print("pianobar-gui: not running", file=sys.stderr)
+        sys.exit(1)
+
     # App will completely shut down when you use "Quit" from the system tray
     start(debug_on=False,
           app_icon="smile.png",
           app_name="Python Pianobar Wrapper",
-          theme="darkly")
+          theme="darkly",
+          sessions=_load_sessions())
 
 # themes from:
 # https://ttkbootstrap.readthedocs.io/en/version-0.5/themes.html
@@ -23,6 +23,9 @@ from constants.constants import (
     GET_STATION,
     GET_STATIONS,
     GET_SONG_DATA,
+    GET_SONG_INFO,
+    GET_UPCOMING,
+    GET_VOLUME,
     LOVE,
     MAIN_WINDOW,
     MAIN_WINDOW_READY,
@@ -31,24 +34,44 @@ from constants.constants import (
     NEW_SONG,
     NEW_STATION,
     QUIT,
+    SESSIONS,
+    SESSION_CHANGE_REQUESTED,
     SHOW,
     START,
     STATION_CHANGE_REQUESTED,
-    STATIONS
+    STATIONS,
+    UPCOMING,
+    VOLUME,
+    VOLUME_DOWN,
+    VOLUME_RESET,
+    VOLUME_UP
 )
 from listbox_with_navigation.listbox_with_navigation import ListboxWithNavigation as ListBox
 from mediator.base_component import BaseComponent
+from metrics.metrics import REGISTRY
 from PIL import Image, ImageTk
 from song.song import Song
+from station_list.station_list import StationList
+from station_search.station_search import StationSearchIndex
+from theme_cache.theme_cache import ThemeCache
+from tracing.tracing import TRACER
 from ttkbootstrap import Style
 from ttkbootstrap.constants import *
+from ttkbootstrap.dialogs import Messagebox
 from typing import List, Tuple
 import logging
 import signal
+import time
 import tkinter
 import ttkbootstrap as ttk
 import tkinter.font as tkFont
 
+_logger = logging.getLogger(__name__)
+
+_GUI_UPDATE_SECONDS = REGISTRY.histogram(
+    "pianobar_wrapper_gui_update_seconds",
+    "Time spent updating the MainWindow widgets", ("update",))
+
 
 class MainWindow(BaseComponent):
     """
@@ -58,10 +81,15 @@ class MainWindow(BaseComponent):
     - Instantiate
     - Set mediator
     - Call in to this class using 'notify' method.
+
+    The scroll wheel over the window turns the volume up and down, outside
+    of the stations list and the session picker which scroll themselves.
+    Double-clicking the volume resets it.
     """
 
     _album_label = None
     _app_name = None
+    _assets = None
     _artist_label = None
     _btn_change_station = None
     _btn_next = None
@@ -80,25 +108,41 @@ class MainWindow(BaseComponent):
     _msg_lbox = None
     _msg_lbox_lock = None
     _msg_lbox_scrollbar = None
+    _search_entry = None
+    _session_combobox = None
+    _search_text = None
+    _song = None  # the Song the labels show
     _song_label = None
     _station_label = None
+    _station_list = None
+    _station_search = None
     _style = None
     _theme = None
+    _theme_cache = None
+    _up_next_label = None
+    _volume_label = None
     _window = None
+    active_session = None
     mediator = None
+    session_list: List[str] = []
     station_list: List[Tuple[int, str]] = []
+    upcoming_list: List[Song] = []
 
-    def __init__(self, app_name, theme):
+    def __init__(self, app_name, theme, assets):
         """
         Args:
             app_name (str): the name of the app to be used by the OS
             theme (str): the ttkbootstrap theme for the application
+            assets (AssetCache): shared cache of decoded images
         """
         super().__init__()
         self._app_name = app_name
+        self._assets = assets
         self._theme = theme
+        self._station_search = StationSearchIndex()
+        self._theme_cache = ThemeCache(theme)
         signal.signal(signal.SIGINT, self._quit)
-        logging.info(f"{MAIN_WINDOW}: Starting up!")
+        _logger.info(f"{MAIN_WINDOW}: Starting up!")
 
     def notify(self, sender, event, event2):
         """
@@ -106,19 +150,33 @@ class MainWindow(BaseComponent):
         using the mediator design pattern.
         """
         if sender == CONCRETE_MEDIATOR:  # guard! but it should always be CM
-            logging.debug(f"{MAIN_WINDOW}: notify received event: {event}")
+            _logger.debug("%s: notify received event: %s", MAIN_WINDOW, event)
+            started = time.perf_counter()
             if event == NEW_SONG:
-                self._update_labels(event2)
+                with TRACER.span("update_labels"):
+                    self._update_labels(event2)
             elif event == NEW_STATION:
                 self._station_label.config(text=f"Station: {event2}")
             elif event == QUIT:
                 self._quit()
+                return
+            elif event == SESSIONS:
+                self._update_session_combobox(event2)
             elif event == SHOW:
                 self._show_window()
             elif event == START:
                 self._start()
+                return
             elif event == STATIONS:
                 self._update_station_listbox(self.station_list)
+            elif event == UPCOMING:
+                self._update_up_next(self.upcoming_list)
+            elif event == VOLUME:
+                self._volume_label.config(text=f"Vol {event2:+d} dB")
+            else:
+                return
+            # the GUI updates, START and QUIT run the whole main loop
+            _GUI_UPDATE_SECONDS.labels(event).observe(time.perf_counter() - started)
 
             # above with command pattern
             # events = {
@@ -183,12 +241,12 @@ class MainWindow(BaseComponent):
         """
         # color:
         self._heart_path_color = "heart.png"
-        self._heart_handle_color = Image.open(self._heart_path_color)
+        self._heart_handle_color = self._assets.get_image(self._heart_path_color)
         self._heart_color = ImageTk.PhotoImage(self._heart_handle_color)
 
         # gray:
         self._heart_path_gray = "heartGray.png"
-        self._heart_handle_gray = Image.open(self._heart_path_gray)
+        self._heart_handle_gray = self._assets.get_image(self._heart_path_gray)
         self._heart_gray = ImageTk.PhotoImage(self._heart_handle_gray)
 
     def _create_heart_label(self):
@@ -200,12 +258,27 @@ class MainWindow(BaseComponent):
         self._heart_img_label.pack(side=tkinter.RIGHT, padx=5)
         self._heart_img_label.bind("<Double-Button-1>", self._handle_heart_double_click)
 
+    def _create_session_combobox(self):
+        """
+        Build and add a session picker, only when there is more than one
+        pianobar session to choose from
+        """
+        if len(self.session_list) < 2:
+            return
+        self._session_combobox = ttk.Combobox(self._window,
+                                              values=self.session_list,
+                                              state="readonly")
+        self._session_combobox.pack(side=TOP, fill=X, padx=5, pady=(0, 5))
+        self._session_combobox.bind("<<ComboboxSelected>>", self._handle_session_selected)
+        self._update_session_combobox(self.active_session)
+
     def _create_song_label(self):
         """
         Create song label
         """
         self._song_label = ttk.Label(self._media_info_frame, wraplength=300)
         self._song_label.pack(side=tkinter.LEFT, padx=10, pady=10)
+        self._song_label.bind("<Double-Button-1>", self._handle_song_double_click)
 
     def _create_station_label(self):
         """
@@ -226,6 +299,7 @@ class MainWindow(BaseComponent):
 
         self._msg_lbox = ListBox(listbox_frame).get_listbox()
         self._msg_lbox.pack(side=LEFT, fill=BOTH, expand=True)
+        self._station_list = StationList(self._msg_lbox)
 
         self._msg_lbox_scrollbar.config(command=self._msg_lbox.yview)
         self._msg_lbox.config(yscrollcommand=self._msg_lbox_scrollbar.set)
@@ -237,11 +311,31 @@ class MainWindow(BaseComponent):
         # for values in range(100):
         #     self._msg_lbox.insert(END, values)
 
+    def _create_station_search_entry(self):
+        """
+        Build and add a type-ahead search box over the stations Listbox,
+        pressing Enter changes to the top match.
+        """
+        self._search_text = tkinter.StringVar(self._window)
+        self._search_text.trace_add("write", self._handle_search_changed)
+        self._search_entry = ttk.Entry(self._window, textvariable=self._search_text)
+        self._search_entry.pack(side=TOP, fill=X, padx=5, pady=(0, 5))
+        self._search_entry.bind("<Return>", self._handle_search_enter)
+
+    def _create_up_next_label(self):
+        """
+        Create the up next label
+        """
+        self._up_next_label = ttk.Label(wraplength=400)
+        self._up_next_label.pack(padx=10, pady=(0, 10))
+
     def _create_ui(self):
         """
         Build the MainWindow
         """
-        self._window = ttk.Window(themename=self._theme)
+        started = time.perf_counter()
+        # loads the generated theme from disk if a previous launch cached it
+        self._window = self._theme_cache.create_window()
         self._window.title(self._app_name)
         # TODO needed?
         #While having a handle to the current Style isn't really used in this
@@ -256,13 +350,22 @@ class MainWindow(BaseComponent):
         self._create_window_icon()
         self._set_global_font_defaults()
         self._create_frame_with_media_info_labels()
+        self._create_session_combobox()
+        self._create_station_search_entry()
         self._create_station_listbox()
         self._create_frame_with_controls()
-        self._get_data()
+        # X11 sends buttons 4 and 5 for the wheel, the others <MouseWheel>
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self._window.bind(sequence, self._handle_mouse_wheel)
 
         # override the def behavior of clicking close window button to hide it!
         self._window.protocol("WM_DELETE_WINDOW", self._hide_window)
-        logging.debug(f"{MAIN_WINDOW}: completed create UI")
+        # time the window and theme only, _get_data waits on pianobar
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._theme_cache.save()
+        _logger.info(f"{MAIN_WINDOW}: created UI in {elapsed_ms:.1f} ms "
+                     f"({'warm' if self._theme_cache.is_warm else 'cold'} theme cache)")
+        self._get_data()
 
     def _create_frame_with_media_info_labels(self):
         """
@@ -276,6 +379,7 @@ class MainWindow(BaseComponent):
         self._create_artist_label()
         self._create_album_label()
         self._create_station_label()
+        self._create_up_next_label()
 
     def _create_frame_with_controls(self):
         """
@@ -286,6 +390,16 @@ class MainWindow(BaseComponent):
         self._create_play_pause_button()
         self._create_next_button()
         self._create_change_station_button()
+        self._create_volume_label()
+
+    def _create_volume_label(self):
+        """
+        Build and add the volume level next to the buttons, double-click
+        resets it
+        """
+        self._volume_label = ttk.Label(self._window, text="Vol")
+        self._volume_label.pack(side=tkinter.LEFT, padx=5, pady=(0,10))  # 0 top, 10 bottom
+        self._volume_label.bind("<Double-Button-1>", self._handle_volume_double_click)
 
     def _create_window_icon(self):
         """
@@ -320,35 +434,28 @@ class MainWindow(BaseComponent):
         """
         Request data from mediator to show in the GUI
         """
-        logging.debug(f"{MAIN_WINDOW}: sending MAIN_WINDOW_READY signal.")
+        _logger.debug(f"{MAIN_WINDOW}: sending MAIN_WINDOW_READY signal.")
         self.mediator.notify(MAIN_WINDOW, event=MAIN_WINDOW_READY, event2=None)
         self.mediator.notify(MAIN_WINDOW, event=GET_STATION, event2=None)
         self.mediator.notify(MAIN_WINDOW, event=GET_SONG_DATA, event2=None)
         self.mediator.notify(MAIN_WINDOW, event=GET_STATIONS, event2=None)
+        self.mediator.notify(MAIN_WINDOW, event=GET_UPCOMING, event2=None)
+        self.mediator.notify(MAIN_WINDOW, event=GET_VOLUME, event2=None)
 
     def _handle_change_station_btn_pressed(self):
         """
         Change the current Pandora station
         """
-        # Get the indices of the selected items in the listbox
-        selected_indices = self._msg_lbox.curselection()
-
-        if selected_indices:
-            # Retrieve the index of the first selected item
-            index = selected_indices[0]
-
-            # Retrieve the item from the listbox based on the index
-            selected_item = self._msg_lbox.get(index)
-
-            # Extract the station number from the selected item
-            station_number = int(selected_item.split(":")[0])
+        station_number = self._station_list.get_selected_number()
 
+        if station_number is not None:
             # Notify the mediator with the station number
-            logging.debug(
+            _logger.debug(
                 f"{MAIN_WINDOW}: changing to station: {station_number}")
-            self.mediator.notify(MAIN_WINDOW, event=STATION_CHANGE_REQUESTED, event2=station_number)
+            with TRACER.action(STATION_CHANGE_REQUESTED, MAIN_WINDOW):
+                self.mediator.notify(MAIN_WINDOW, event=STATION_CHANGE_REQUESTED, event2=station_number)
         else:
-            logging.critical(
+            _logger.critical(
                 f"{MAIN_WINDOW}: could not determine which station you want to change to!")
             print("No station selected!")  # TODO
 
@@ -358,32 +465,119 @@ class MainWindow(BaseComponent):
         """
         self._is_favorite = not self._is_favorite
         if self._is_favorite:
-            logging.debug(f"{MAIN_WINDOW}: marking song as loved.")
+            _logger.debug(f"{MAIN_WINDOW}: marking song as loved.")
             self._swap_heart_image(self._is_favorite)
-            self.mediator.notify(MAIN_WINDOW, LOVE, event2=None)
+            with TRACER.action(LOVE, MAIN_WINDOW):
+                future = self.mediator.notify(MAIN_WINDOW, LOVE, event2=None)
+            if future is not None:
+                title = self._song_label.cget("text")
+                # resolved on pianobar's reader thread, Tk wants its own
+                future.add_done_callback(
+                    lambda future: self._window.after(0, self._handle_love_done, future, title))
         else:
-            logging.debug(f"{MAIN_WINDOW}: NOT marking song as loved.")
+            _logger.debug(f"{MAIN_WINDOW}: NOT marking song as loved.")
+
+    def _handle_love_done(self, future, title):
+        """
+        Gray the heart again if pianobar refused the love, unless the song
+        changed in the meantime.
+
+        Args:
+            future (Future): pianobar's acknowledgement
+            title (str): the song label when the heart was clicked
+        """
+        error = future.exception()
+        if error is None:
+            return
+        _logger.warning(f"{MAIN_WINDOW}: could not love the song: {error}")
+        if self._song_label.cget("text") == title:
+            # so the next double-click sends the love again
+            self._is_favorite = False
+            self._swap_heart_image(False)
+
+    def _handle_mouse_wheel(self, event):
+        """
+        Turn the volume up or down a step per notch of the scroll wheel,
+        the steps are batched before they reach pianobar
+        """
+        if event.widget in (self._msg_lbox, self._msg_lbox_scrollbar, self._session_combobox):
+            return
+        up = event.num == 4 or event.delta > 0
+        self.mediator.notify(MAIN_WINDOW, event=VOLUME_UP if up else VOLUME_DOWN, event2=None)
 
     def _handle_next_btn_pressed(self):
         """
         Notify the mediator that the MEDIA_NEXT button was pressed
         """
-        logging.debug(f"{MAIN_WINDOW}: btn_next clicked event trigged")
-        self.mediator.notify(MAIN_WINDOW, event=MEDIA_NEXT, event2=None)
+        _logger.debug(f"{MAIN_WINDOW}: btn_next clicked event trigged")
+        with TRACER.action(MEDIA_NEXT, MAIN_WINDOW):
+            self.mediator.notify(MAIN_WINDOW, event=MEDIA_NEXT, event2=None)
 
     def _handle_play_pause_btn_pressed(self):
         """
         Notify the mediator that the MEDIA_PLAY button was pressed
         """
-        logging.debug(f"{MAIN_WINDOW}: btn_play_pause clicked event trigged")
-        self.mediator.notify(MAIN_WINDOW, event=MEDIA_PLAY, event2=None)
+        _logger.debug(f"{MAIN_WINDOW}: btn_play_pause clicked event trigged")
+        with TRACER.action(MEDIA_PLAY, MAIN_WINDOW):
+            self.mediator.notify(MAIN_WINDOW, event=MEDIA_PLAY, event2=None)
+
+    def _handle_search_changed(self, *args):
+        """
+        Narrow the stations Listbox to the stations matching the search
+        """
+        query = self._search_text.get()
+        if not query.strip():
+            self._station_list.set_filter(None)
+            return
+        self._station_list.set_filter(self._station_search.search(query))
+        if len(self._station_list):
+            self._msg_lbox.select_clear(0, END)
+            self._msg_lbox.select_set(0)
+            self._msg_lbox.see(0)
+
+    def _handle_search_enter(self, event):
+        """
+        Change to the top match of the station search
+        """
+        station_number = self._station_list.get_number(0)
+        if station_number is None:
+            _logger.debug(f"{MAIN_WINDOW}: no station matches the search")
+            return
+        _logger.debug(f"{MAIN_WINDOW}: changing to searched station: {station_number}")
+        self._search_text.set("")
+        with TRACER.action(STATION_CHANGE_REQUESTED, MAIN_WINDOW):
+            self.mediator.notify(MAIN_WINDOW, event=STATION_CHANGE_REQUESTED, event2=station_number)
+
+    def _handle_session_selected(self, event):
+        """
+        Switch the GUI to the session picked in the combobox
+        """
+        session_id = self._session_combobox.get()
+        _logger.debug(f"{MAIN_WINDOW}: changing to session: {session_id}")
+        self.mediator.notify(MAIN_WINDOW, event=SESSION_CHANGE_REQUESTED, event2=session_id)
+
+    def _handle_song_double_click(self, event):
+        """
+        Handles double-clicking the song title, shows the song's details
+        """
+        future = self.mediator.notify(MAIN_WINDOW, GET_SONG_INFO, event2=None)
+        if future is not None:
+            # resolved on a pianobar thread, Tk wants its own
+            future.add_done_callback(
+                lambda future: self._window.after(0, self._show_song_info, future))
+
+    def _handle_volume_double_click(self, event):
+        """
+        Put the volume back to 0 dB
+        """
+        self.mediator.notify(MAIN_WINDOW, event=VOLUME_RESET, event2=None)
 
     def _hide_window(self):
         """
         Hide's the MainWindow
         """
         if self._window:
-            logging.debug(f"{MAIN_WINDOW}: hiding MainWindow")
+            _logger.debug(f"{MAIN_WINDOW}: hiding MainWindow")
             self._window.withdraw()
 
     def _quit(self, signum=None, frame=None):
@@ -393,7 +587,7 @@ class MainWindow(BaseComponent):
         self.mediator.notify(MAIN_WINDOW, event=QUIT, event2=None)
         if self._window:
             self._window.quit()
-            logging.info("Goodbye from MainWindow!")
+            _logger.info("Goodbye from MainWindow!")
 
     def _set_global_font_defaults(self):
         """
@@ -403,6 +597,24 @@ class MainWindow(BaseComponent):
         self._global_font = tkFont.nametofont("TkDefaultFont")
         self._global_font.configure(size=18)
 
+    def _show_song_info(self, future):
+        """
+        Args:
+            future (Future): the SongInfo of the song playing
+        """
+        error = future.exception()
+        if error is not None:
+            _logger.warning(f"{MAIN_WINDOW}: no details for the song: {error}")
+            return
+        info = future.result()
+        lines = [f"{info.title} by {info.artist} on {info.album}"]
+        if info.station:
+            lines.append(f"Station: {info.station}")
+        lines += [f"{name}: {value}" for name, value in info.fields.items()]
+        if info.detail_url:
+            lines.append(info.detail_url)
+        Messagebox.show_info("\n".join(lines), title="Song details", parent=self._window)
+
     def _show_window(self):
         """
         Shows the main window of our application and brings it to focus.
@@ -412,7 +624,7 @@ class MainWindow(BaseComponent):
         self._window.lift()
         self._window.attributes("-topmost", True)
         self._window.focus_force()
-        logging.debug(f"{MAIN_WINDOW}: showing MainWindow")
+        _logger.debug(f"{MAIN_WINDOW}: showing MainWindow")
 
     def _start(self):
         """
@@ -439,29 +651,55 @@ class MainWindow(BaseComponent):
             extracts the values for the labels in the GUI
             sets the color of the heart icon in the GUI
         """
+        if song_data == self._song:
+            return
+        self._song = song_data
         album, artist, favorite, title = song_data.album, song_data.artist, song_data.favorite, song_data.title
         self._song_label.config(text=f"{title}")
         self._artist_label.config(text=f"By: {artist}")
         self._album_label.config(text=f"From: {album}")
         if favorite:
-            logging.debug(f"{MAIN_WINDOW}: is favorite song")
+            _logger.debug("%s: is favorite song", MAIN_WINDOW)
             self._swap_heart_image(True)
         else:
-            logging.debug(f"{MAIN_WINDOW}: is NOT favorite song")
+            _logger.debug("%s: is NOT favorite song", MAIN_WINDOW)
             self._swap_heart_image(False)
 
+    def _update_session_combobox(self, active_session):
+        """
+        Args:
+            active_session (str): the session the GUI now controls
+        """
+        self.active_session = active_session
+        if self._session_combobox is None:
+            return
+        self._session_combobox.configure(values=self.session_list)
+        if active_session is not None:
+            self._session_combobox.set(active_session)
+
     def _update_station_listbox(self, stations: List[Tuple[int, str]]):
         """
-        Update the station listbox with the provided list of stations.
+        Update the station listbox with the provided list of stations,
+        only the rows which changed are redrawn.
         """
-        # Clear the listbox
-        self._msg_lbox.delete(0, END)
+        self._station_list.update(stations)
+        self._station_search.rebuild(self._station_list.keys)
+        if self._search_text is not None and self._search_text.get().strip():
+            self._handle_search_changed()
 
-        # Populate the listbox
-        for number, name in stations:
-            self._msg_lbox.insert(END, f"{number}: {name}")
+        _logger.debug(f"{MAIN_WINDOW}: finished populating stations listbox")
 
-        logging.debug(f"{MAIN_WINDOW}: finished populating stations listbox")
+    def _update_up_next(self, upcoming):
+        """
+        Args:
+            upcoming (List[Song]): the songs queued after the current one
+        """
+        if upcoming:
+            song = upcoming[0]
+            more = f" (+{len(upcoming) - 1} more)" if len(upcoming) > 1 else ""
+            self._up_next_label.config(text=f"Up next: {song.title} by {song.artist}{more}")
+        else:
+            self._up_next_label.config(text="")
 
 
     # if we want to user a text box in lieu of labels for wrapping text
@@ -18,11 +18,26 @@ python-pianobar-wrapper:
     You should have received a copy of the GNU General Public License
     along with this program.  If not, see <https://www.gnu.org/licenses/>
 """
+from assets.assets import AssetCache
+from control_api.control_api import ControlApi
 from constants.constants import (
     CONCRETE_MEDIATOR,
+    CONTROL_API,
+    DEFAULT_SESSION,
+    GET_HISTORY,
+    GET_RESOURCE_USAGE,
+    GET_SESSIONS,
     GET_SONG_DATA,
+    GET_SONG_INFO,
     GET_STATION,
     GET_STATIONS,
+    GET_STATS,
+    GET_UPCOMING,
+    GET_VOLUME,
+    ICON_DISCONNECTED,
+    ICON_LOVED,
+    ICON_PAUSED,
+    ICON_PLAYING,
     KEY_LISTENER,
     LOVE,
     MAIN,
@@ -30,22 +45,58 @@ from constants.constants import (
     MAIN_WINDOW_READY,
     MEDIA_NEXT,
     MEDIA_PLAY,
+    MPRIS,
     NEW_SONG,
     NEW_STATION,
     PIANOBAR,
+    PIANOBAR_ERROR,
+    PLAYBACK_STALL,
+    PLAYBACK_STATUS,
+    POLICY_ABORT,
+    POLICY_RETRY,
+    POLICY_SKIP,
     QUIT,
+    SESSIONS,
+    SESSION_CHANGE_REQUESTED,
+    SHOW,
     START,
     STATIONS,
     STATION_CHANGE_REQUESTED,
-    SYSTRAY
+    SYSTRAY,
+    TIME_UPDATE,
+    TRAY_ICON,
+    UPCOMING,
+    VOLUME,
+    VOLUME_DOWN,
+    VOLUME_RESET,
+    VOLUME_UP
 )
+from history.history import PlayHistory
 from key_listener.key_listener import KeyListener
+from listening_stats.listening_stats import ListeningStats
+from loved_songs.loved_songs import LovedSongs
 from main_window.main_window import MainWindow
 from mediator.mediator import Mediator
+from metrics.metrics import REGISTRY
+from metrics.metrics_server import MetricsServer
+from mpris.mpris import Mpris
+from now_playing.now_playing import NowPlaying
 from pianobar.pianobar import Pianobar
+from pianobar_error.pianobar_error import RetryBackoff
 from systray.systray import Systray
+from tracing.tracing import TRACER
 import logging
 import sys
+import threading
+
+_logger = logging.getLogger(__name__)
+
+_DISPATCHES = REGISTRY.counter(
+    "pianobar_wrapper_mediator_dispatches_total",
+    "Events received by the mediator", ("sender", "event"))
+_SYSTRAY_RESTARTS = REGISTRY.gauge(
+    "pianobar_wrapper_systray_restarts",
+    "Times the tray backend has been restarted")
 
 
 class ConcreteMediator(Mediator):
@@ -56,38 +107,167 @@ class ConcreteMediator(Mediator):
     - Instantiate
     - Set mediator
     - Call in to this class using 'notify' method.
+
+    One Pianobar runs per session. The GUI, tray and remote clients always
+    talk to the active session; the song, station and play state of the
+    others are kept so switching to them is instant.
+
+    A PIANOBAR_ERROR is handled by its policy whichever session sent it:
+    bad credentials quit the session, network errors ask for the next song
+    with a bounded backoff and playlist errors skip to it right away.
+
+    A PLAYBACK_STALL goes to the observers; with 'skip_stalled' a stall
+    which lasts skips to the next song.
+
+    VOLUME_UP, VOLUME_DOWN and VOLUME_RESET from the GUI, tray, media keys
+    and remote clients go to the active session, which batches them; the
+    VOLUME it sends back is shown by the GUI.
     """
 
     _app_icon = None
     _app_name = None
+    _aborted_at_start = None  # sessions pianobar refused while starting
+    _active_session = None
+    _assets = None
+    _control_api = None
+    _history = None
+    _icon_state = None
+    _is_loved = False
+    _is_paused = False
     _key_listener = None
+    _loved_songs = None
     _main_window = None
     _main_window_ready = False
+    _metrics_server = None
+    _mpris = None
+    _now_playing = None
     _pianobar = None
+    _pianobar_binary = None
+    _retry_backoffs = None
+    _session_configs = None
+    _session_states = None
+    _sessions = None
+    _skip_stalled = False
     _song_data = None
+    _starting = False
+    _starting_lock = None
     _station = None
+    _stats = None
     _systray = None
     _theme = None
+    _upcoming = None
+    _volume_events = (VOLUME_DOWN, VOLUME_RESET, VOLUME_UP)
+    _volume_keys = False
 
-    def __init__(self, app_icon, app_name, theme):
+    def __init__(self, app_icon, app_name, theme, sessions=None,
+                 pianobar_binary="/usr/bin/pianobar", skip_stalled=False,
+                 volume_keys=False):
         """
         Args:
         app_icon (str): the icon you want to see in your desktop OS
         app_name (str): the name of the app you want to see in OS notification's
         theme (str): the ttkbootstrap theme for the application
+        sessions (Dict[str, str]): session id => pianobar config home, the
+        first one is active at start up. None runs one session with the
+        user's own pianobar config.
+        pianobar_binary (str): the pianobar executable
+        skip_stalled (bool): skip to the next song when playback stalled
+        for 30 seconds
+        volume_keys (bool): let the volume keys control pianobar's volume
+        instead of the desktop's
         """
         super().__init__()
+        self._aborted_at_start = []
         self._app_icon = app_icon
         self._app_name = app_name
+        self._assets = AssetCache()
+        self._pianobar_binary = pianobar_binary
+        self._retry_backoffs = {}
+        self._session_configs = dict(sessions or {DEFAULT_SESSION: None})
+        self._session_states = {}
+        self._sessions = {}
+        self._skip_stalled = skip_stalled
+        self._starting_lock = threading.Lock()
         self._theme = theme
+        self._upcoming = []
+        self._volume_keys = volume_keys
 
     def notify(self, sender, event, event2):
         """
         Consumers of this class should only communicate through here
         using the mediator design pattern.
         """
-        logging.debug(f"{CONCRETE_MEDIATOR}: recv => sender={sender}, event={event}, event2={event2}")
+        _logger.debug("%s: recv => sender=%s, event=%s, event2=%s", CONCRETE_MEDIATOR, sender, event, event2)
+        _DISPATCHES.labels(sender, event).inc()
+        with TRACER.span(f"mediator {event}"):
+            return self._dispatch(sender, event, event2)
+
+    def _adjust_volume(self, event, steps=None):
+        """
+        Args:
+            event (str): VOLUME_UP, VOLUME_DOWN or VOLUME_RESET
+            steps (int): how many dB up or down, 1 if None
+
+        Returns:
+            level (int): the level of the active session once written
+        """
+        return self._pianobar.notify(CONCRETE_MEDIATOR,
+                                     event=event,
+                                     event2=steps)
 
+    def _change_session(self, session_id):
+        """
+        Make another session the one the GUI, tray and remote clients
+        control, and show what it is playing.
+
+        Args:
+            session_id (str): the session to switch to
+
+        Returns:
+            (bool) False if there is no such session
+        """
+        if session_id not in self._sessions:
+            _logger.error("%s: no session named %s", CONCRETE_MEDIATOR, session_id)
+            return False
+        if session_id == self._active_session:
+            return True
+        _logger.info("%s: switching to session %s", CONCRETE_MEDIATOR, session_id)
+        self._save_session_state()
+        self._active_session = session_id
+        self._pianobar = self._sessions[session_id]
+        state = self._session_states[session_id]
+        self._song_data = state["song"]
+        self._station = state["station"]
+        self._is_loved = state["loved"]
+        self._is_paused = state["paused"]
+        self._upcoming = state["upcoming"]
+        self._update_tray_icon()
+        self._notify_sessions()
+
+        self._notify_observers(NEW_STATION, self._station)
+        if self._song_data is not None:
+            self._notify_observers(NEW_SONG, self._song_data)
+        self._notify_observers(PLAYBACK_STATUS, self._is_paused)
+        self._notify_observers(VOLUME, self._pianobar.volume)
+        if self._main_window_ready:
+            self._main_window.notify(CONCRETE_MEDIATOR,
+                                     event=NEW_STATION,
+                                     event2=self._station)
+            if self._song_data is not None:
+                self._main_window.notify(CONCRETE_MEDIATOR,
+                                         event=NEW_SONG,
+                                         event2=self._song_data)
+            self._main_window.notify(CONCRETE_MEDIATOR,
+                                     event=VOLUME,
+                                     event2=self._pianobar.volume)
+            self._show_upcoming()
+            self._get_stations()
+        return True
+
+    def _dispatch(self, sender, event, event2):
+        """
+        Route an event to the handler of the component which sent it
+        """
         if sender == KEY_LISTENER:
             self._handle_events_key_listener(event, event2)
             return
@@ -97,16 +277,34 @@ class ConcreteMediator(Mediator):
             return
 
         if sender == MAIN_WINDOW:
-            self._handle_events_main_window(event, event2)
-            return
+            return self._handle_events_main_window(event, event2)
+
+        if sender in (CONTROL_API, MPRIS):
+            return self._handle_events_remote(event, event2)
 
-        if sender == PIANOBAR:
-            self._handle_events_pianobar(event, event2)
+        if sender.startswith(PIANOBAR):
+            # "PIANOBAR/<session_id>"
+            session_id = sender.partition("/")[2] or DEFAULT_SESSION
+            self._handle_events_pianobar(session_id, event, event2)
             return
 
         if sender == SYSTRAY:
             self._handle_events_systray(event, event2)
 
+    def _get_sessions(self):
+        """
+        Returns: (List[dict]) every session with its resource usage, so we
+        can tell how many sessions fit on one host
+        """
+        sessions = []
+        for session_id, pianobar in self._sessions.items():
+            usage = pianobar.notify(CONCRETE_MEDIATOR,
+                                    event=GET_RESOURCE_USAGE,
+                                    event2=None)
+            usage["active"] = session_id == self._active_session
+            sessions.append(usage)
+        return sessions
+
     def _get_stations(self):
         """
         Fetches the stations list, stores them and notifies the MainWindow
@@ -117,19 +315,20 @@ class ConcreteMediator(Mediator):
         # TODO if stations is empty
         self._main_window.station_list = stations
         self._main_window.notify(CONCRETE_MEDIATOR, event=STATIONS, event2=None)
+        self._notify_observers(STATIONS, stations)
 
     def _handle_events_key_listener(self, event, event2):
         """
         Event handler for the KeyListener events
         """
         if event == MEDIA_PLAY:
-            self._pianobar.notify(CONCRETE_MEDIATOR,
-                                  event=MEDIA_PLAY,
-                                  event2=None)
+            self._play_pause()
         elif event == MEDIA_NEXT:
             self._pianobar.notify(CONCRETE_MEDIATOR,
                                   event=MEDIA_NEXT,
                                   event2=None)
+        elif event in self._volume_events:
+            self._adjust_volume(event, event2)
 
     def _handle_events_main(self, event, event2):
         """
@@ -146,78 +345,385 @@ class ConcreteMediator(Mediator):
             self._main_window.notify(CONCRETE_MEDIATOR,
                                      event=NEW_SONG,
                                      event2=self._song_data)
+        elif event == GET_SONG_INFO:
+            return self._pianobar.notify(CONCRETE_MEDIATOR,
+                                         event=GET_SONG_INFO,
+                                         event2=None)
         elif event == GET_STATION:
             self._main_window.notify(CONCRETE_MEDIATOR,
                                      event=NEW_STATION,
                                      event2=self._station)
         elif event == GET_STATIONS:
             self._get_stations()
+        elif event == GET_UPCOMING:
+            self._show_upcoming()
+        elif event == GET_VOLUME:
+            self._main_window.notify(CONCRETE_MEDIATOR,
+                                     event=VOLUME,
+                                     event2=self._pianobar.volume)
         elif event == LOVE:
-            self._pianobar.notify(CONCRETE_MEDIATOR,
-                                  event=LOVE,
-                                  event2=None)
+            return self._love()
         elif event == MAIN_WINDOW_READY:
             self._main_window_ready = True
 
         elif event == MEDIA_PLAY:
-            self._pianobar.notify(CONCRETE_MEDIATOR,
-                                  event=MEDIA_PLAY,
-                                  event2=None)
+            return self._play_pause()
         elif event == MEDIA_NEXT:
-            self._pianobar.notify(CONCRETE_MEDIATOR,
-                                  event=MEDIA_NEXT,
-                                  event2=None)
+            return self._pianobar.notify(CONCRETE_MEDIATOR,
+                                         event=MEDIA_NEXT,
+                                         event2=None)
         elif event == QUIT:
-            self._pianobar.notify(CONCRETE_MEDIATOR,
-                                  QUIT,
-                                  event2=None)
+            self._key_listener.notify(CONCRETE_MEDIATOR,
+                                      QUIT,
+                                      event2=None)
+            self._notify_observers(QUIT, None)
+            self._stop_sessions()
+            if self._loved_songs is not None:
+                self._loved_songs.close()
+            self._update_tray_icon(ICON_DISCONNECTED)
+            self._metrics_server.notify(CONCRETE_MEDIATOR, QUIT, event2=None)
+        elif event == SESSION_CHANGE_REQUESTED:
+            self._change_session(event2)
         elif event == STATION_CHANGE_REQUESTED:
-            self._pianobar.notify(CONCRETE_MEDIATOR,
-                                  event=STATION_CHANGE_REQUESTED,
-                                  event2=event2)
+            return self._pianobar.notify(CONCRETE_MEDIATOR,
+                                         event=STATION_CHANGE_REQUESTED,
+                                         event2=event2)
+        elif event in self._volume_events:
+            return self._adjust_volume(event, event2)
+
+    def _handle_events_remote(self, event, event2):
+        """
+        Event handler for the ControlApi and Mpris events
+        """
+        if event == GET_HISTORY:
+            return self._history.query(**event2) if self._history is not None else []
+        if event == GET_SESSIONS:
+            return self._get_sessions()
+        if event == GET_SONG_INFO:
+            return self._pianobar.notify(CONCRETE_MEDIATOR, event=GET_SONG_INFO, event2=None)
+        if event == GET_STATS:
+            return self._stats.summary(**event2) if self._stats is not None else {}
+        if event == GET_VOLUME:
+            return self._pianobar.volume
+        if event in self._volume_events:
+            return self._adjust_volume(event, event2)
+        if event in (QUIT, SHOW):
+            if self._main_window is None:
+                # the window is built once pianobar has started
+                _logger.warning("%s: ignoring remote %s, still starting up", CONCRETE_MEDIATOR, event)
+                return None
+            self._main_window.notify(CONCRETE_MEDIATOR, event, event2)
+        elif event == LOVE:
+            return self._love()
+        elif event == MEDIA_PLAY:
+            return self._play_pause()
+        elif event == MEDIA_NEXT:
+            return self._pianobar.notify(CONCRETE_MEDIATOR,
+                                         event=MEDIA_NEXT,
+                                         event2=None)
+        elif event == SESSION_CHANGE_REQUESTED:
+            return self._change_session(event2)
+        elif event == STATION_CHANGE_REQUESTED:
+            return self._pianobar.notify(CONCRETE_MEDIATOR,
+                                         event=STATION_CHANGE_REQUESTED,
+                                         event2=event2)
 
-    def _handle_events_pianobar(self, event, event2):
+    def _handle_events_pianobar(self, session_id, event, event2):
         """
         Event handler for the Pianobar events
+
+        Args:
+            session_id (str): the session which sent the event
         """
+        if event == PIANOBAR_ERROR:
+            self._handle_pianobar_error(session_id, event2)
+            return
+        if event == PLAYBACK_STALL:
+            self._handle_playback_stall(session_id, event2)
+            return
+        if event == NEW_SONG:
+            if session_id in self._retry_backoffs:
+                # playing again, the next error gets the full retries
+                self._retry_backoffs[session_id].reset()
+            if self._loved_songs is not None:
+                # the heart is right before anyone shows the song
+                event2 = self._loved_songs.check(event2)
+
+        if session_id != self._active_session:
+            # a background session, only remember where it is
+            state = self._session_states.get(session_id)
+            if state is None:
+                return
+            if event == NEW_STATION:
+                state["station"] = event2
+            elif event == NEW_SONG:
+                state.update(song=event2, loved=event2.favorite, paused=False)
+            elif event == UPCOMING:
+                state["upcoming"] = event2
+            return
+
         if event == NEW_STATION:
+            self._station = event2
+            self._notify_observers(NEW_STATION, event2)
             if not self._main_window_ready:
-                logging.debug(f"CONCRETE_MEDIATOR: storing new station to var.")
-                self._station = event2
+                _logger.debug("%s: storing new station to var.", CONCRETE_MEDIATOR)
                 return
             self._main_window.notify(CONCRETE_MEDIATOR,
                                      event=NEW_STATION,
                                      event2=event2)
         elif event == NEW_SONG:
+            self._song_data = event2
+            self._is_loved = event2.favorite
+            self._is_paused = False
+            self._update_tray_icon()
+            self._notify_observers(NEW_SONG, event2)
             if not self._main_window_ready:
-                logging.debug(f"CONCRETE_MEDIATOR: storing new song to var.")
-                self._song_data = event2
+                _logger.debug("%s: storing new song to var.", CONCRETE_MEDIATOR)
                 return
             self._main_window.notify(CONCRETE_MEDIATOR,
                                      event=NEW_SONG,
                                      event2=event2)
+        elif event == TIME_UPDATE:
+            self._notify_observers(TIME_UPDATE, event2)
+        elif event == UPCOMING:
+            self._upcoming = event2
+            if self._main_window_ready:
+                self._show_upcoming()
+        elif event == VOLUME:
+            self._notify_observers(VOLUME, event2)
+            if self._main_window_ready:
+                self._main_window.notify(CONCRETE_MEDIATOR,
+                                         event=VOLUME,
+                                         event2=event2)
 
     def _handle_events_systray(self, event, event2):
         """
         Event handler for the Systray events
         """
+        if event == SESSION_CHANGE_REQUESTED:
+            self._change_session(event2)
+            return
+        if event in self._volume_events:
+            self._adjust_volume(event, event2)
+            return
         self._main_window.notify(CONCRETE_MEDIATOR, event, event2)
 
+    def _handle_pianobar_error(self, session_id, error):
+        """
+        Apply the policy of an error pianobar printed
+
+        Args:
+            session_id (str): the session which printed it
+            error (PianobarError): the classified error
+        """
+        pianobar = self._sessions.get(session_id)
+        if pianobar is None or error.policy is None:
+            return
+        if error.policy == POLICY_ABORT:
+            _logger.critical("%s: quitting session %s: %s", CONCRETE_MEDIATOR, session_id, error.message)
+            with self._starting_lock:
+                if self._starting:
+                    # _start_sessions quits it once every session started
+                    self._aborted_at_start.append(pianobar)
+                    pianobar = None
+            if pianobar is not None:
+                # not on pianobar's reader thread, quitting waits for it
+                threading.Thread(target=pianobar.notify, args=(CONCRETE_MEDIATOR, QUIT, None),
+                                 daemon=True).start()
+            if session_id == self._active_session:
+                self._update_tray_icon(ICON_DISCONNECTED)
+            return
+
+        if error.policy == POLICY_SKIP:
+            # nothing to wait for, and no retry used up
+            delay = 0
+        elif error.policy == POLICY_RETRY:
+            delay = self._retry_backoffs[session_id].next_delay()
+            if delay is None:
+                _logger.error("%s: session %s keeps failing, giving up: %s",
+                              CONCRETE_MEDIATOR, session_id, error.message)
+                return
+        else:
+            return
+        _logger.info("%s: session %s: next song in %gs after %s",
+                     CONCRETE_MEDIATOR, session_id, delay, error.kind)
+        timer = threading.Timer(delay, self._request_next_song, args=(pianobar,))
+        timer.daemon = True
+        timer.start()
+
+    def _handle_playback_stall(self, session_id, stall):
+        """
+        Tell the observers about a stall of the active session, and skip
+        a song which stalls for good if asked to
+
+        Args:
+            session_id (str): the session which stalled
+            stall (Stall): what the stall detector saw
+        """
+        if session_id == self._active_session:
+            self._notify_observers(PLAYBACK_STALL, stall)
+        pianobar = self._sessions.get(session_id)
+        if not stall.prolonged or not self._skip_stalled or pianobar is None:
+            return
+        _logger.warning("%s: session %s stalled for %.0fs, skipping to the next song",
+                        CONCRETE_MEDIATOR, session_id, stall.seconds)
+        # not on pianobar's watch thread, the FIFO write may block
+        threading.Thread(target=self._request_next_song, args=(pianobar,), daemon=True).start()
+
+    def _love(self):
+        """
+        Love the current song. The tray shows it right away and is rolled
+        back if pianobar refuses it.
+
+        Returns:
+            future (Future): pianobar's acknowledgement
+        """
+        song = self._song_data
+        future = self._pianobar.notify(CONCRETE_MEDIATOR,
+                                       event=LOVE,
+                                       event2=None)
+        self._is_loved = True
+        self._update_tray_icon()
+
+        def rollback(future):
+            if future.exception() is None:
+                if self._loved_songs is not None and song is not None:
+                    self._loved_songs.add(song)
+                if song is not None and self._song_data is song:
+                    # the window asks for it again when it is shown
+                    self._song_data = song.replace(favorite=True)
+                    # the observers mark the song they are on, not a later one
+                    self._notify_observers(LOVE, None)
+            # only if we are still on the song that was loved
+            elif self._song_data is song:
+                self._is_loved = False
+                self._update_tray_icon()
+        future.add_done_callback(rollback)
+        return future
+
+    def _notify_sessions(self):
+        """
+        Tell the MainWindow, Systray and remote clients which sessions exist
+        and which one is active
+        """
+        session_list = list(self._sessions)
+        for component in (self._main_window, self._systray):
+            if component is not None:
+                component.session_list = session_list
+                component.notify(CONCRETE_MEDIATOR,
+                                 event=SESSIONS,
+                                 event2=self._active_session)
+        self._notify_observers(SESSIONS, self._active_session)
+
+    def _notify_observers(self, event, event2):
+        """
+        Forward a player state event to the remote control components
+        which have been started
+        """
+        for observer in (self._control_api, self._history, self._mpris, self._now_playing,
+                         self._stats):
+            if observer is not None:
+                observer.notify(CONCRETE_MEDIATOR, event=event, event2=event2)
+
+    def _play_pause(self):
+        """
+        Toggle play/pause, toggled back if the command never reached
+        pianobar.
+
+        Returns:
+            future (Future): pianobar's acknowledgement
+        """
+        future = self._pianobar.notify(CONCRETE_MEDIATOR,
+                                       event=MEDIA_PLAY,
+                                       event2=None)
+        self._toggle_paused()
+
+        def rollback(future):
+            if future.exception() is not None:
+                self._toggle_paused()
+        future.add_done_callback(rollback)
+        return future
+
+    def _request_next_song(self, pianobar):
+        """
+        The retry of an error policy or a stall, unless pianobar exited
+        meanwhile
+        """
+        if pianobar.is_running:
+            pianobar.notify(CONCRETE_MEDIATOR, event=MEDIA_NEXT, event2=None)
+
+    def _save_session_state(self):
+        """
+        Keep the active session's state for when we switch back to it
+        """
+        self._session_states[self._active_session] = {
+            "loved": self._is_loved,
+            "paused": self._is_paused,
+            "song": self._song_data,
+            "station": self._station,
+            "upcoming": self._upcoming,
+        }
+
+    def _show_upcoming(self):
+        """
+        Hands the MainWindow the cached up next list, nothing is asked of
+        pianobar here
+        """
+        self._main_window.upcoming_list = self._upcoming
+        self._main_window.notify(CONCRETE_MEDIATOR, event=UPCOMING, event2=None)
+
+    def _toggle_paused(self):
+        """
+        Track the play/pause toggle sent to pianobar for the tray icon
+        and MPRIS clients
+        """
+        self._is_paused = not self._is_paused
+        self._update_tray_icon()
+        self._notify_observers(PLAYBACK_STATUS, self._is_paused)
+
+    def _update_tray_icon(self, icon_state=None):
+        """
+        Tell the Systray which pre-rendered icon reflects the player state,
+        only when it actually changed.
+
+        Args:
+            icon_state (str): force an ICON_* state, else derive it
+        """
+        if icon_state is None:
+            if self._is_paused:
+                icon_state = ICON_PAUSED
+            elif self._is_loved:
+                icon_state = ICON_LOVED
+            else:
+                icon_state = ICON_PLAYING
+        if icon_state == self._icon_state:
+            return
+        self._icon_state = icon_state
+        if self._systray is not None:
+            self._systray.notify(CONCRETE_MEDIATOR,
+                                 event=TRAY_ICON,
+                                 event2=icon_state)
+
     def _start(self):
+        self._start_metrics_server()
         self._start_key_listener()  # must be first to start
         # note you could add while/sleep loop here to debug key_listener alone
 
+        self._start_loved_songs()
         # To test without pianobar running, but just the GUI
         # comment out this and in MainWindow: GetSongData, GetStations
-        self._start_pianobar()
+        self._start_sessions()
         if self._song_data is None:
-            logging.critical(f"{CONCRETE_MEDIATOR}: no data app exiting now!")
-            self._pianobar.notify(CONCRETE_MEDIATOR,
-                                  QUIT,
-                                  event2=None)
+            _logger.critical("%s: no data app exiting now!", CONCRETE_MEDIATOR)
+            self._stop_sessions()
             sys.exit(1)
 
         self._start_systray()
+        self._start_mpris()
+        self._start_control_api()
+        self._start_now_playing()
+        self._start_history()
+        self._start_stats()
         # to test tray we need some form of mainloop to keep app running
         # else tray exits right away, so uncomment this while loop, and
         # then comment out our call below to self._start_main_window()
@@ -227,34 +733,152 @@ class ConcreteMediator(Mediator):
 
         self._start_main_window()
 
+    def _start_control_api(self):
+        """
+        Starts the ControlApi class and hands it what is already playing
+        """
+        self._control_api = ControlApi()
+        self._control_api.mediator = self
+        self._control_api.notify(CONCRETE_MEDIATOR, event=START, event2=None)
+        self._control_api.notify(CONCRETE_MEDIATOR, event=SESSIONS, event2=self._active_session)
+        if self._station is not None:
+            self._control_api.notify(CONCRETE_MEDIATOR, event=NEW_STATION, event2=self._station)
+        if self._song_data is not None:
+            self._control_api.notify(CONCRETE_MEDIATOR, event=NEW_SONG, event2=self._song_data)
+        self._control_api.notify(CONCRETE_MEDIATOR, event=VOLUME, event2=self._pianobar.volume)
+
+    def _start_history(self):
+        """
+        Starts the PlayHistory class, the song already playing is its first
+        """
+        self._history = PlayHistory()
+        self._history.mediator = self
+        self._history.notify(CONCRETE_MEDIATOR, event=START, event2=None)
+        if self._station is not None:
+            self._history.notify(CONCRETE_MEDIATOR, event=NEW_STATION, event2=self._station)
+        if self._song_data is not None:
+            self._history.notify(CONCRETE_MEDIATOR, event=NEW_SONG, event2=self._song_data)
+
     def _start_key_listener(self):
         """
         Starts the KeyListener class
         """
-        self._key_listener = KeyListener()
+        self._key_listener = KeyListener(volume_keys=self._volume_keys)
         self._key_listener.mediator = self
         self._key_listener.notify(CONCRETE_MEDIATOR, event=START, event2=None)
 
+    def _start_loved_songs(self):
+        """
+        Loads the loved songs before the first song arrives
+        """
+        self._loved_songs = LovedSongs()
+        self._loved_songs.load()
+
     def _start_main_window(self):
         """
         Starts the MainWindow class
         """
-        self._main_window = MainWindow(self._app_name, self._theme)
+        self._main_window = MainWindow(self._app_name, self._theme, self._assets)
         self._main_window.mediator = self
+        self._main_window.session_list = list(self._sessions)
+        self._main_window.active_session = self._active_session
         self._main_window.notify(CONCRETE_MEDIATOR, event=START, event2=None)
 
-    def _start_pianobar(self):
+    def _start_metrics_server(self):
+        """
+        Starts the MetricsServer class, so start up itself can be scraped
+        """
+        self._metrics_server = MetricsServer()
+        self._metrics_server.mediator = self
+        self._metrics_server.notify(CONCRETE_MEDIATOR, event=START, event2=None)
+
+    def _start_mpris(self):
+        """
+        Starts the Mpris class and hands it what is already playing
+        """
+        self._mpris = Mpris(self._app_name)
+        self._mpris.mediator = self
+        self._mpris.notify(CONCRETE_MEDIATOR, event=START, event2=None)
+        if self._station is not None:
+            self._mpris.notify(CONCRETE_MEDIATOR, event=NEW_STATION, event2=self._station)
+        if self._song_data is not None:
+            self._mpris.notify(CONCRETE_MEDIATOR, event=NEW_SONG, event2=self._song_data)
+
+    def _start_now_playing(self):
+        """
+        Starts the NowPlaying class and hands it what is already playing
+        """
+        self._now_playing = NowPlaying()
+        self._now_playing.mediator = self
+        self._now_playing.notify(CONCRETE_MEDIATOR, event=START, event2=None)
+        if self._station is not None:
+            self._now_playing.notify(CONCRETE_MEDIATOR, event=NEW_STATION, event2=self._station)
+        if self._song_data is not None:
+            self._now_playing.notify(CONCRETE_MEDIATOR, event=NEW_SONG, event2=self._song_data)
+
+    def _start_sessions(self):
+        """
+        Starts one Pianobar class per session, side by side as each one
+        waits for pianobar to connect, and makes the first one active
+        """
+        self._active_session = next(iter(self._session_configs))
+        for session_id, config_home in self._session_configs.items():
+            self._session_states[session_id] = {
+                "loved": False, "paused": False, "song": None, "station": None, "upcoming": []}
+            pianobar = Pianobar(session_id=session_id,
+                                config_home=config_home,
+                                binary=self._pianobar_binary)
+            pianobar.mediator = self
+            self._retry_backoffs[session_id] = RetryBackoff()
+            self._sessions[session_id] = pianobar
+        self._pianobar = self._sessions[self._active_session]
+
+        threads = [threading.Thread(target=pianobar.notify,
+                                    args=(CONCRETE_MEDIATOR, START, None),
+                                    daemon=True)
+                   for pianobar in self._sessions.values()]
+        with self._starting_lock:
+            self._starting = True
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with self._starting_lock:
+            self._starting = False
+            aborted, self._aborted_at_start = self._aborted_at_start, []
+        for pianobar in aborted:
+            pianobar.notify(CONCRETE_MEDIATOR, QUIT, event2=None)
+
+    def _stop_sessions(self):
+        """
+        Quits every pianobar session
+        """
+        for pianobar in self._sessions.values():
+            pianobar.notify(CONCRETE_MEDIATOR, QUIT, event2=None)
+
+    def _start_stats(self):
         """
-        Starts the pianobar class
+        Starts the ListeningStats class, the song already playing counts
         """
-        self._pianobar = Pianobar()
-        self._pianobar.mediator = self
-        self._pianobar.notify(CONCRETE_MEDIATOR, event=START, event2=None)
+        self._stats = ListeningStats()
+        self._stats.mediator = self
+        self._stats.notify(CONCRETE_MEDIATOR, event=START, event2=None)
+        if self._station is not None:
+            self._stats.notify(CONCRETE_MEDIATOR, event=NEW_STATION, event2=self._station)
+        if self._song_data is not None:
+            self._stats.notify(CONCRETE_MEDIATOR, event=NEW_SONG, event2=self._song_data)
 
     def _start_systray(self):
         """
         Starts the Systray class.
         """
-        self._systray = Systray(self._app_icon, self._app_name)
+        self._systray = Systray(self._app_icon, self._app_name, self._assets)
         self._systray.mediator = self
+        self._systray.session_list = list(self._sessions)
+        _SYSTRAY_RESTARTS.set_function(lambda: self._systray.restart_count)
         self._systray.notify(CONCRETE_MEDIATOR, event=START, event2=None)
+        self._systray.notify(CONCRETE_MEDIATOR, event=SESSIONS, event2=self._active_session)
+        if self._icon_state is not None:
+            self._systray.notify(CONCRETE_MEDIATOR,
+                                 event=TRAY_ICON,
+                                 event2=self._icon_state)
@@ -0,0 +1,131 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+"""
+from constants.constants import MEMORY_REPORT
+import logging
+import os
+import signal
+import time
+import tracemalloc
+
+_logger = logging.getLogger(__name__)
+
+# the snapshot the next report is compared with
+_previous = None
+
+
+def default_report_path():
+    """
+    Returns:
+        path (str): where reports go, in the per user runtime directory
+    """
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR") or f"/tmp/pianobar-wrapper-{os.getuid()}"
+    return os.path.join(runtime_dir, "pianobar-wrapper", "memory_report.txt")
+
+
+def read_rss_kb(pid="self"):
+    """
+    Returns:
+        rss (int): resident memory of the process in kB, or None
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def format_top(snapshot, previous=None, limit=25):
+    """
+    Args:
+        snapshot (tracemalloc.Snapshot): the allocations now
+        previous (tracemalloc.Snapshot): compare with this one if given
+        limit (int): how many allocation sites to list
+
+    Returns:
+        (List[str]) one line per allocation site, largest first
+    """
+    noise = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    )
+    snapshot = snapshot.filter_traces(noise)
+    if previous is None:
+        return [str(stat) for stat in snapshot.statistics("lineno")[:limit]]
+    previous = previous.filter_traces(noise)
+    return [str(stat) for stat in snapshot.compare_to(previous, "lineno")[:limit]]
+
+
+def install(signum=signal.SIGUSR1, path=None, limit=25):
+    """
+    Dump the top allocation sites whenever the process gets 'signum', e.g.
+    kill -USR1 <pid>. The first signal starts tracemalloc if it is not
+    running yet (PYTHONTRACEMALLOC=1 starts it at launch), later ones write
+    the top sites and how they grew since the previous report.
+
+    Must be called from the main thread.
+
+    Args:
+        signum (int): the signal to react to
+        path (str): the report file, defaults to the runtime dir
+        limit (int): how many allocation sites to report
+    """
+    path = path or default_report_path()
+    signal.signal(signum, lambda signum, frame: report(path, limit))
+    _logger.debug("%s: memory report on signal %s to %s", MEMORY_REPORT, signum, path)
+
+
+def report(path=None, limit=25):
+    """
+    Write the top allocation sites to 'path' and the log.
+
+    Args:
+        path (str): the report file, defaults to the runtime dir
+        limit (int): how many allocation sites to report
+    """
+    global _previous
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(10)
+        _previous = tracemalloc.take_snapshot()
+        _logger.info("%s: tracemalloc started, signal again for a report", MEMORY_REPORT)
+        return
+
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    lines = [f"{time.strftime('%Y-%m-%d %H:%M:%S')} pid {os.getpid()}",
+             f"rss {read_rss_kb()} kB, traced {current // 1024} kB, peak {peak // 1024} kB",
+             "", f"top {limit} allocation sites:"]
+    lines += format_top(snapshot, limit=limit)
+    if _previous is not None:
+        lines += ["", f"top {limit} changes since the previous report:"]
+        lines += format_top(snapshot, _previous, limit)
+    _previous = snapshot
+
+    path = path or default_report_path()
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+    except OSError as e:
+        _logger.error("%s: could not write %s: %s", MEMORY_REPORT, path, e)
+    _logger.info("%s: %s\n%s", MEMORY_REPORT, path, "\n".join(lines))
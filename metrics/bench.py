@@ -0,0 +1,115 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+Benchmark of the metrics on the paths the app updates them from: times
+each kind of update against an empty call, checks that threads updating
+at once lose no counts, and times a scrape:
+
+    python3 -m metrics.bench --updates 1000000 --threads 4
+"""
+from metrics.metrics import Registry
+import argparse
+import sys
+import threading
+import time
+
+
+def _per_call(function, updates):
+    """
+    Returns:
+        (float) the best seconds per call over a few runs
+    """
+    best = None
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(updates):
+            function()
+        elapsed = (time.perf_counter() - started) / updates
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(args):
+    """
+    Returns:
+        (int) the exit code, 1 if an update was lost
+    """
+    registry = Registry()
+    counter = registry.counter("bench_counter_total", "a counter")
+    labelled = registry.counter("bench_labelled_total", "a counter with labels", ("event",))
+    gauge = registry.gauge("bench_gauge", "a gauge")
+    histogram = registry.histogram("bench_seconds", "a histogram")
+    child = labelled.labels("NEW_SONG")
+
+    baseline = _per_call(lambda: None, args.updates)
+    print(f"per update, {args.updates} updates, over an empty call of {baseline * 1e9:.0f} ns:")
+    for label, function in (("counter inc", counter.inc),
+                            ("labelled child inc", child.inc),
+                            ("labels() and inc", lambda: labelled.labels("NEW_SONG").inc()),
+                            ("gauge inc", gauge.inc),
+                            ("gauge set", lambda: gauge.set(1)),
+                            ("histogram observe", lambda: histogram.observe(0.003))):
+        print(f"  {label:<20} {(_per_call(function, args.updates) - baseline) * 1e9:8.0f} ns")
+
+    contended = registry.counter("bench_contended_total", "a counter updated by every thread")
+    per_thread = args.updates // args.threads
+
+    def update():
+        for _ in range(per_thread):
+            contended.inc()
+            histogram.observe(0.003)
+
+    threads = [threading.Thread(target=update) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    expected = per_thread * args.threads
+    print(f"{args.threads} threads: {expected / elapsed:,.0f} counter and histogram "
+          f"updates/s, counted {contended.value} of {expected}")
+
+    for number in range(args.children):
+        labelled.labels(f"EVENT_{number}").inc()
+    started = time.perf_counter()
+    text = registry.render()
+    print(f"scrape of {len(text.splitlines())} lines: "
+          f"{(time.perf_counter() - started) * 1000:.2f} ms")
+
+    if contended.value != expected:
+        print("metrics.bench: FAIL, updates were lost", file=sys.stderr)
+        return 1
+    return 0
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the metric updates and scrapes.")
+    parser.add_argument("--updates", type=int, default=1000000,
+                        help="updates to time of each kind (default: %(default)s)")
+    parser.add_argument("--threads", type=int, default=4,
+                        help="threads updating one counter at once (default: %(default)s)")
+    parser.add_argument("--children", type=int, default=100,
+                        help="label values to scrape (default: %(default)s)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(run(_parse_args(sys.argv[1:])))
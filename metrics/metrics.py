@@ -0,0 +1,347 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+"""
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+import math
+import threading
+
+# seconds, for latencies of local I/O and Tk updates
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Shards:
+    """
+    Per thread cells of numbers. The owning thread is the only writer of a
+    cell, so updates take no lock; readers add the cells up.
+    """
+
+    def __init__(self, width):
+        self._cells = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._retired = [0] * width
+        self._width = width
+
+    def cell(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = [0] * self._width
+            with self._lock:
+                # short lived threads come and go without a scrape between
+                self._fold_exited()
+                self._cells.append((threading.current_thread(), cell))
+            self._local.cell = cell
+            return cell
+
+    def totals(self):
+        """
+        Returns: (List[number]) the sum of every cell
+        """
+        with self._lock:
+            self._fold_exited()
+            totals = list(self._retired)
+            for _, cell in self._cells:
+                totals = [a + b for a, b in zip(totals, cell)]
+        return totals
+
+    def _fold_exited(self):
+        """
+        Fold the cells of threads which have exited into the retired totals,
+        so they do not pile up. Called with self._lock held.
+        """
+        live = []
+        for thread, cell in self._cells:
+            if thread.is_alive():
+                live.append((thread, cell))
+            else:
+                self._retired = [a + b for a, b in zip(self._retired, cell)]
+        self._cells = live
+
+
+class _Metric(ABC):
+    """
+    Base class of the metric families, a family holds one child per set of
+    label values.
+    """
+
+    kind = None
+
+    def __init__(self, name, help_text, label_names=()):
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.name = name
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.label_names:
+            self._default = self._new_child()
+
+    def labels(self, *values):
+        """
+        Args:
+            values (str): one value per label name, in order
+
+        Returns: the child metric for those label values
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} takes labels {self.label_names}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def samples(self):
+        """
+        Returns: (List[Tuple[str, str, number]]) name suffix, labels, value
+        """
+        if not self.label_names:
+            return self._child_samples((), self._default)
+        samples = []
+        for values, child in sorted(self._children.items()):
+            samples.extend(self._child_samples(values, child))
+        return samples
+
+    @abstractmethod
+    def _child_samples(self, values, child):
+        """
+        Returns: (List[Tuple[str, str, number]]) the samples of one child
+        """
+
+    @abstractmethod
+    def _new_child(self):
+        """
+        Returns: a child metric for a new set of label values
+        """
+
+
+class _CounterChild:
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount=1):
+        self._shards.cell()[0] += amount
+
+    @property
+    def value(self):
+        return self._shards.totals()[0]
+
+
+class Counter(_Metric):
+    """
+    A number which only goes up, such as lines read.
+    """
+
+    kind = "counter"
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    @property
+    def value(self):
+        return self._default.value
+
+    def _child_samples(self, values, child):
+        return [("", _format_labels(self.label_names, values), child.value)]
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._function = None
+        self._lock = threading.Lock()
+        self._value = 0
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def set(self, value):
+        with self._lock:
+            self._value = value
+
+    def set_function(self, function):
+        """
+        Args:
+            function (Callable[[], number]): read at scrape time instead
+        """
+        self._function = function
+
+    @property
+    def value(self):
+        if self._function is not None:
+            return self._function()
+        return self._value
+
+
+class Gauge(_Metric):
+    """
+    A number which goes up and down, or is read from a function when
+    scraped, such as restart counts kept by a component.
+    """
+
+    kind = "gauge"
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def set(self, value):
+        self._default.set(value)
+
+    def set_function(self, function):
+        self._default.set_function(function)
+
+    @property
+    def value(self):
+        return self._default.value
+
+    def _child_samples(self, values, child):
+        return [("", _format_labels(self.label_names, values), child.value)]
+
+    def _new_child(self):
+        return _GaugeChild()
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self._buckets = buckets
+        # one cell per bucket, then +Inf, then the sum
+        self._shards = _Shards(len(buckets) + 2)
+
+    def observe(self, value):
+        cell = self._shards.cell()
+        cell[bisect_left(self._buckets, value)] += 1
+        cell[-1] += value
+
+    def totals(self):
+        totals = self._shards.totals()
+        return totals[:-1], totals[-1]
+
+
+class Histogram(_Metric):
+    """
+    Counts observations, such as latencies, into fixed buckets.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self._buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, label_names)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def _child_samples(self, values, child):
+        counts, total = child.totals()
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self._buckets + (math.inf,), counts):
+            cumulative += count
+            labels = _format_labels(self.label_names, values, ("le", _format_value(float(bound))))
+            samples.append(("_bucket", labels, cumulative))
+        labels = _format_labels(self.label_names, values)
+        samples.append(("_sum", labels, total))
+        samples.append(("_count", labels, cumulative))
+        return samples
+
+    def _new_child(self):
+        return _HistogramChild(self._buckets)
+
+
+class Registry:
+    """
+    Holds the metric families and renders them in the Prometheus text
+    exposition format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def counter(self, name, help_text, label_names=()):
+        return self._register(Counter, name, help_text, label_names)
+
+    def gauge(self, name, help_text, label_names=()):
+        return self._register(Gauge, name, help_text, label_names)
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help_text, label_names, buckets=buckets)
+
+    def render(self):
+        """
+        Returns: (str) every metric in the Prometheus text format 0.0.4
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.help)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric_class, name, help_text, label_names, **kwargs):
+        """
+        Returns: the existing family of that name, so modules can declare
+        their metrics at import time in any order
+        """
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = metric_class(name, help_text, label_names, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, metric_class):
+                raise ValueError(f"{name} is already a {metric.kind}")
+            return metric
+
+
+# the registry the components instrument and the exporter serves
+REGISTRY = Registry()
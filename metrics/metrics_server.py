@@ -0,0 +1,120 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+"""
+from constants.constants import (
+    CONCRETE_MEDIATOR,
+    METRICS,
+    QUIT,
+    START
+)
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from mediator.base_component import BaseComponent
+from metrics.metrics import REGISTRY
+import logging
+import threading
+
+_logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Answers GET /metrics with the registry in the Prometheus text format.
+    """
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # every scrape would otherwise be printed to stderr
+        pass
+
+
+class MetricsServer(BaseComponent):
+    """
+    Serves the metrics registry over HTTP on the loopback interface for
+    Prometheus to scrape.
+
+    Users of this class should only:
+    - Instantiate
+    - Set mediator
+    - Call into this class using the 'notify' method.
+    """
+
+    _host = None
+    _port = None
+    _registry = None
+    _server = None
+    mediator = None
+
+    def __init__(self, port=9732, host="127.0.0.1", registry=REGISTRY):
+        """
+        Args:
+            port (int): the TCP port to listen on
+            host (str): the address to listen on, loopback by default
+            registry (Registry): the metrics to serve
+        """
+        super().__init__()
+        self._host = host
+        self._port = port
+        self._registry = registry
+
+    def notify(self, sender, event, event2):
+        """
+        Consumers of this class should only communicate through here
+        using the mediator design pattern.
+        """
+        if sender != CONCRETE_MEDIATOR:
+            return
+        if event == START:
+            self._start()
+        elif event == QUIT:
+            self._stop()
+
+    def _start(self):
+        """
+        Listen from a thread, a taken port only disables the endpoint.
+        """
+        try:
+            self._server = ThreadingHTTPServer((self._host, self._port), _MetricsHandler)
+        except OSError as e:
+            _logger.error(f"{METRICS}: metrics endpoint disabled: {e}")
+            self._server = None
+            return
+        self._server.daemon_threads = True
+        self._server.registry = self._registry
+        thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        thread.start()
+        _logger.info(f"{METRICS}: serving http://{self._host}:{self._port}/metrics")
+
+    def _stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,458 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+"""
+from constants.constants import (
+    CONCRETE_MEDIATOR,
+    LOVE,
+    MEDIA_NEXT,
+    MEDIA_PLAY,
+    MPRIS,
+    NEW_SONG,
+    NEW_STATION,
+    PLAYBACK_STATUS,
+    QUIT,
+    SHOW,
+    START,
+    STATIONS,
+    STATION_CHANGE_REQUESTED
+)
+from mediator.base_component import BaseComponent
+from tracing.tracing import TRACER
+import logging
+import queue
+import threading
+
+_logger = logging.getLogger(__name__)
+
+_BUS_NAME = "org.mpris.MediaPlayer2.pianobar_wrapper"
+_NO_TRACK_PATH = "/org/mpris/MediaPlayer2/TrackList/NoTrack"
+_OBJECT_PATH = "/org/mpris/MediaPlayer2"
+# the spec keeps every other path under /org/mpris for itself
+_PLAYLIST_PATH = "/org/pianobar_wrapper/Playlist/"
+_TRACK_PATH = "/org/pianobar_wrapper/Track/"
+
+_IFACE_INTROSPECTABLE = "org.freedesktop.DBus.Introspectable"
+_IFACE_PEER = "org.freedesktop.DBus.Peer"
+_IFACE_PLAYER = "org.mpris.MediaPlayer2.Player"
+_IFACE_PLAYLISTS = "org.mpris.MediaPlayer2.Playlists"
+_IFACE_PROPERTIES = "org.freedesktop.DBus.Properties"
+_IFACE_ROOT = "org.mpris.MediaPlayer2"
+# vendor interface for what MPRIS has no verb for
+_IFACE_WRAPPER = "com.github.serverlinkdev.PianobarWrapper"
+
+_INTROSPECTION_XML = f"""<!DOCTYPE node PUBLIC "-//freedesktop//DTD D-BUS Object Introspection 1.0//EN"
+ "http://www.freedesktop.org/standards/dbus/1.0/introspect.dtd">
+<node>
+  <interface name="{_IFACE_INTROSPECTABLE}">
+    <method name="Introspect"><arg direction="out" type="s"/></method>
+  </interface>
+  <interface name="{_IFACE_PROPERTIES}">
+    <method name="Get">
+      <arg direction="in" type="s"/><arg direction="in" type="s"/>
+      <arg direction="out" type="v"/>
+    </method>
+    <method name="GetAll">
+      <arg direction="in" type="s"/><arg direction="out" type="a{{sv}}"/>
+    </method>
+    <method name="Set">
+      <arg direction="in" type="s"/><arg direction="in" type="s"/>
+      <arg direction="in" type="v"/>
+    </method>
+    <signal name="PropertiesChanged">
+      <arg type="s"/><arg type="a{{sv}}"/><arg type="as"/>
+    </signal>
+  </interface>
+  <interface name="{_IFACE_ROOT}">
+    <method name="Raise"/>
+    <method name="Quit"/>
+    <property name="CanQuit" type="b" access="read"/>
+    <property name="CanRaise" type="b" access="read"/>
+    <property name="HasTrackList" type="b" access="read"/>
+    <property name="Identity" type="s" access="read"/>
+    <property name="SupportedUriSchemes" type="as" access="read"/>
+    <property name="SupportedMimeTypes" type="as" access="read"/>
+  </interface>
+  <interface name="{_IFACE_PLAYER}">
+    <method name="Next"/>
+    <method name="Previous"/>
+    <method name="Pause"/>
+    <method name="PlayPause"/>
+    <method name="Stop"/>
+    <method name="Play"/>
+    <method name="Seek"><arg direction="in" type="x"/></method>
+    <method name="SetPosition">
+      <arg direction="in" type="o"/><arg direction="in" type="x"/>
+    </method>
+    <method name="OpenUri"><arg direction="in" type="s"/></method>
+    <signal name="Seeked"><arg type="x"/></signal>
+    <property name="PlaybackStatus" type="s" access="read"/>
+    <property name="Rate" type="d" access="read"/>
+    <property name="Metadata" type="a{{sv}}" access="read"/>
+    <property name="Volume" type="d" access="read"/>
+    <property name="Position" type="x" access="read"/>
+    <property name="MinimumRate" type="d" access="read"/>
+    <property name="MaximumRate" type="d" access="read"/>
+    <property name="CanGoNext" type="b" access="read"/>
+    <property name="CanGoPrevious" type="b" access="read"/>
+    <property name="CanPlay" type="b" access="read"/>
+    <property name="CanPause" type="b" access="read"/>
+    <property name="CanSeek" type="b" access="read"/>
+    <property name="CanControl" type="b" access="read"/>
+  </interface>
+  <interface name="{_IFACE_PLAYLISTS}">
+    <method name="ActivatePlaylist"><arg direction="in" type="o"/></method>
+    <method name="GetPlaylists">
+      <arg direction="in" type="u"/><arg direction="in" type="u"/>
+      <arg direction="in" type="s"/><arg direction="in" type="b"/>
+      <arg direction="out" type="a(oss)"/>
+    </method>
+    <signal name="PlaylistChanged"><arg type="(oss)"/></signal>
+    <property name="PlaylistCount" type="u" access="read"/>
+    <property name="Orderings" type="as" access="read"/>
+    <property name="ActivePlaylist" type="(b(oss))" access="read"/>
+  </interface>
+  <interface name="{_IFACE_WRAPPER}">
+    <method name="Love"/>
+  </interface>
+</node>
+"""
+
+
+class Mpris(BaseComponent):
+    """
+    Exports org.mpris.MediaPlayer2 on the session bus so desktops,
+    headset daemons and playerctl can control the wrapper.
+
+    Users of this class should only:
+    - Instantiate
+    - Set mediator
+    - Call into this class using the 'notify' method.
+
+    pianobar's stations are exported as MPRIS playlists, and loving a song
+    is the Love method of the vendor interface. The bus is found through
+    DBUS_SESSION_BUS_ADDRESS, so a private dbus-daemon works as well as a
+    desktop session.
+    """
+
+    _app_name = None
+    _connection = None
+    _is_paused = False
+    _lock = None
+    # methods we accept, which may need no event or pianobar can not honour
+    _no_op_methods = {
+        (_IFACE_PLAYER, "OpenUri"),
+        (_IFACE_PLAYER, "Pause"),
+        (_IFACE_PLAYER, "Play"),
+        (_IFACE_PLAYER, "Previous"),
+        (_IFACE_PLAYER, "Seek"),
+        (_IFACE_PLAYER, "SetPosition"),
+        (_IFACE_PLAYER, "Stop"),
+        (_IFACE_PLAYLISTS, "ActivatePlaylist"),
+    }
+    _outbox = None
+    _properties = None
+    _song = None
+    _station = None
+    _stations = None
+    _stop_event = None
+    _thread = None
+    _track_number = 0
+    mediator = None
+
+    def __init__(self, app_name):
+        """
+        Args:
+            app_name (str): the Identity shown by MPRIS clients
+        """
+        super().__init__()
+        self._app_name = app_name
+        self._lock = threading.Lock()
+        self._outbox = queue.Queue()
+        self._properties = {}
+        self._stations = []
+        self._stop_event = threading.Event()
+
+    def notify(self, sender, event, event2):
+        """
+        Consumers of this class should only communicate through here
+        using the mediator design pattern.
+        """
+        if sender != CONCRETE_MEDIATOR:
+            return
+        _logger.debug(f"{MPRIS}: notify received event: {event}")
+        if event == LOVE:
+            # pianobar confirmed a love of the song playing
+            with self._lock:
+                if self._song is None:
+                    return
+                self._song = self._song.replace(favorite=True)
+            self._push_changes()
+        elif event == NEW_SONG:
+            with self._lock:
+                self._song = event2
+                self._track_number += 1
+                self._is_paused = False
+            self._push_changes()
+        elif event == NEW_STATION:
+            with self._lock:
+                self._station = event2
+            self._push_changes()
+        elif event == PLAYBACK_STATUS:
+            with self._lock:
+                self._is_paused = event2
+            self._push_changes()
+        elif event == QUIT:
+            self._stop()
+        elif event == START:
+            self._start()
+        elif event == STATIONS:
+            with self._lock:
+                self._stations = list(event2 or [])
+            self._push_changes()
+
+    def _dispatch(self, msg):
+        """
+        Answer one method call from the bus.
+        """
+        from jeepney import HeaderFields, new_error, new_method_return
+
+        fields = msg.header.fields
+        interface = fields.get(HeaderFields.interface)
+        member = fields.get(HeaderFields.member)
+        path = fields.get(HeaderFields.path)
+        if path != _OBJECT_PATH:
+            return new_error(msg, "org.freedesktop.DBus.Error.UnknownObject")
+
+        if interface == _IFACE_INTROSPECTABLE and member == "Introspect":
+            return new_method_return(msg, "s", (_INTROSPECTION_XML,))
+        if interface == _IFACE_PEER and member == "Ping":
+            return new_method_return(msg)
+        if interface == _IFACE_PROPERTIES:
+            properties = self._get_properties()
+            if member == "GetAll":
+                return new_method_return(msg, "a{sv}", (properties.get(msg.body[0], {}),))
+            if member == "Get":
+                value = properties.get(msg.body[0], {}).get(msg.body[1])
+                if value is None:
+                    return new_error(msg, "org.freedesktop.DBus.Error.UnknownProperty")
+                return new_method_return(msg, "v", (value,))
+            if member == "Set":
+                return new_error(msg, "org.freedesktop.DBus.Error.PropertyReadOnly")
+
+        if interface == _IFACE_PLAYLISTS and member == "GetPlaylists":
+            index, max_count, _, reverse = msg.body
+            with self._lock:
+                playlists = self._get_playlists()
+            if reverse:
+                playlists.reverse()
+            return new_method_return(msg, "a(oss)", (playlists[index:index + max_count],))
+
+        event, event2 = self._method_to_event(interface, member, msg.body)
+        if event is None and (interface, member) not in self._no_op_methods:
+            return new_error(msg, "org.freedesktop.DBus.Error.UnknownMethod")
+        if event is not None:
+            _logger.debug(f"{MPRIS}: {member} => {event}")
+            with TRACER.action(event, MPRIS):
+                self.mediator.notify(MPRIS, event=event, event2=event2)
+        return new_method_return(msg)
+
+    def _get_playlists(self):
+        """
+        Returns: (List[Tuple[str, str, str]]) the stations as MPRIS playlists
+        """
+        return [(f"{_PLAYLIST_PATH}{number}", name, "")
+                for number, name in self._stations]
+
+    def _get_properties(self):
+        """
+        Returns: (Dict[str, Dict[str, Tuple[str, Any]]]) every property of
+        every interface as jeepney variants
+        """
+        with self._lock:
+            song, station, paused = self._song, self._station, self._is_paused
+            playlists = self._get_playlists()
+            track_number = self._track_number
+
+        metadata = {"mpris:trackid": ("o", _NO_TRACK_PATH)}
+        if song is not None:
+            metadata["mpris:trackid"] = ("o", f"{_TRACK_PATH}{track_number}")
+            metadata["xesam:title"] = ("s", song.title or "")
+            metadata["xesam:artist"] = ("as", [song.artist or ""])
+            metadata["xesam:album"] = ("s", song.album or "")
+            metadata["xesam:userRating"] = ("d", 1.0 if song.favorite else 0.0)
+        if station:
+            metadata["pianobar:station"] = ("s", station)
+
+        if song is None:
+            status = "Stopped"
+        elif paused:
+            status = "Paused"
+        else:
+            status = "Playing"
+
+        active = (False, ("/", "", ""))
+        for playlist in playlists:
+            if playlist[1] == station:
+                active = (True, playlist)
+
+        return {
+            _IFACE_ROOT: {
+                "CanQuit": ("b", True),
+                "CanRaise": ("b", True),
+                "HasTrackList": ("b", False),
+                "Identity": ("s", self._app_name),
+                "SupportedMimeTypes": ("as", []),
+                "SupportedUriSchemes": ("as", []),
+            },
+            _IFACE_PLAYER: {
+                "CanControl": ("b", True),
+                "CanGoNext": ("b", True),
+                "CanGoPrevious": ("b", False),
+                "CanPause": ("b", True),
+                "CanPlay": ("b", True),
+                "CanSeek": ("b", False),
+                "MaximumRate": ("d", 1.0),
+                "Metadata": ("a{sv}", metadata),
+                "MinimumRate": ("d", 1.0),
+                "PlaybackStatus": ("s", status),
+                "Position": ("x", 0),
+                "Rate": ("d", 1.0),
+                "Volume": ("d", 1.0),
+            },
+            _IFACE_PLAYLISTS: {
+                "ActivePlaylist": ("(b(oss))", active),
+                "Orderings": ("as", ["UserDefined"]),
+                "PlaylistCount": ("u", len(playlists)),
+            },
+        }
+
+    def _method_to_event(self, interface, member, body):
+        """
+        Returns:
+            (event, event2): the mediator event for a method call, or
+            (None, None) if the method needs no event
+        """
+        with self._lock:
+            paused = self._is_paused
+        if interface == _IFACE_ROOT:
+            if member == "Raise":
+                return SHOW, None
+            if member == "Quit":
+                return QUIT, None
+        elif interface == _IFACE_PLAYER:
+            if member == "Next":
+                return MEDIA_NEXT, None
+            if member == "PlayPause":
+                return MEDIA_PLAY, None
+            # pianobar only has a toggle, so only toggle into the asked state
+            if member == "Play" and paused:
+                return MEDIA_PLAY, None
+            if member in ("Pause", "Stop") and not paused:
+                return MEDIA_PLAY, None
+        elif interface == _IFACE_PLAYLISTS and member == "ActivatePlaylist":
+            path = body[0]
+            if path.startswith(_PLAYLIST_PATH):
+                try:
+                    return STATION_CHANGE_REQUESTED, int(path[len(_PLAYLIST_PATH):])
+                except ValueError:
+                    pass
+        elif interface == _IFACE_WRAPPER and member == "Love":
+            return LOVE, None
+        return None, None
+
+    def _push_changes(self):
+        """
+        Queue a PropertiesChanged signal holding only the properties whose
+        values changed since the last one.
+        """
+        if self._connection is None:
+            return
+        properties = self._get_properties()
+        with self._lock:
+            for interface in (_IFACE_PLAYER, _IFACE_PLAYLISTS):
+                old = self._properties.get(interface, {})
+                changed = {k: v for k, v in properties[interface].items() if old.get(k) != v}
+                self._properties[interface] = properties[interface]
+                if changed:
+                    self._outbox.put((interface, changed))
+
+    def _run(self):
+        """
+        Serve method calls and send queued signals until stopped.
+        """
+        from jeepney import DBusAddress, MessageType, new_signal
+
+        address = DBusAddress(_OBJECT_PATH, interface=_IFACE_PROPERTIES)
+        while not self._stop_event.is_set():
+            while not self._outbox.empty():
+                interface, changed = self._outbox.get_nowait()
+                _logger.debug(f"{MPRIS}: PropertiesChanged {interface} {sorted(changed)}")
+                self._connection.send(new_signal(address, "PropertiesChanged", "sa{sv}as",
+                                                 (interface, changed, [])))
+            try:
+                msg = self._connection.receive(timeout=0.25)
+            except TimeoutError:
+                continue
+            except Exception as e:
+                _logger.error(f"{MPRIS}: lost the session bus: {e}")
+                break
+            if msg.header.message_type == MessageType.method_call:
+                try:
+                    self._connection.send(self._dispatch(msg))
+                except Exception as e:
+                    _logger.error(f"{MPRIS}: failed to answer method call: {e}")
+        self._connection.close()
+        self._connection = None
+
+    def _start(self):
+        """
+        Connect to the session bus, claim our name and serve it from a
+        thread. A missing bus or jeepney only disables MPRIS.
+        """
+        try:
+            from jeepney.bus_messages import message_bus
+            from jeepney.io.blocking import open_dbus_connection
+        except ImportError as e:
+            _logger.info(f"{MPRIS}: jeepney is not installed, MPRIS disabled: {e}")
+            return
+        try:
+            self._connection = open_dbus_connection(bus="SESSION")
+            reply = self._connection.send_and_get_reply(
+                message_bus.RequestName(_BUS_NAME, 4), timeout=5)  # 4 = do not queue
+        except Exception as e:
+            _logger.info(f"{MPRIS}: no session bus, MPRIS disabled: {e}")
+            self._connection = None
+            return
+        if reply.body[0] not in (1, 4):  # primary owner, already owner
+            _logger.warning(f"{MPRIS}: {_BUS_NAME} is owned by another process")
+            self._connection.close()
+            self._connection = None
+            return
+
+        # seed the change tracking so the first signal only holds changes
+        properties = self._get_properties()
+        with self._lock:
+            self._properties = properties
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        _logger.debug(f"{MPRIS}: serving {_BUS_NAME}")
+
+    def _stop(self):
+        self._stop_event.set()
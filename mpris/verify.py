@@ -0,0 +1,63 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+Feed the MPRIS player a love before any song, a song, pianobar's
+confirmation of a love and the next song, and check the xesam:userRating
+in its metadata after each. No session bus is needed:
+
+    python3 -m mpris.verify
+"""
+from constants.constants import CONCRETE_MEDIATOR, LOVE, NEW_SONG
+from mpris.mpris import Mpris
+from song.song import Song
+import sys
+
+# (event, event2, the rating expected after it, None for no song)
+STEPS = (
+    (LOVE, None, None),
+    (NEW_SONG, Song(album="Album", artist="Artist", favorite=False, title="First"), 0.0),
+    (LOVE, None, 1.0),
+    (NEW_SONG, Song(album="Album", artist="Artist", favorite=False, title="Second"), 0.0),
+)
+
+
+def verify():
+    """
+    Returns:
+        (int) the exit code, 1 if a rating is wrong
+    """
+    failures = 0
+    mpris = Mpris("verify")
+    for event, event2, expected in STEPS:
+        mpris.notify(CONCRETE_MEDIATOR, event, event2)
+        metadata = mpris._get_properties()["org.mpris.MediaPlayer2.Player"]["Metadata"][1]
+        rating = metadata.get("xesam:userRating", (None, None))[1]
+        if rating != expected:
+            print(f"after {event}: userRating {rating}, expected {expected}")
+            failures += 1
+    if failures:
+        print("verify: FAIL, the rating is wrong", file=sys.stderr)
+        return 1
+    print(f"verify: ok, {len(STEPS)} events")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(verify())
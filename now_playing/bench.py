@@ -0,0 +1,144 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+Benchmark of the now playing file: reader processes read snapshots for a
+while, first with the writer idle and then with writer threads sending
+songs and time updates as fast as they can, and every snapshot is checked
+for a song torn between two updates:
+
+    python3 -m now_playing.bench --readers 4 --writers 2 --seconds 3
+"""
+from constants.constants import CONCRETE_MEDIATOR, NEW_SONG, QUIT, START, TIME_UPDATE
+from now_playing.now_playing import NowPlaying, NowPlayingReader
+from song.song import Song
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+
+def _read(path, seconds, results):
+    """
+    Read snapshots for 'seconds' in a reader process and put (reads,
+    torn snapshots, timeouts) on 'results'.
+    """
+    reader = NowPlayingReader(path)
+    reads = torn = timeouts = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for _ in range(1000):
+            try:
+                snapshot = reader.read()
+            except TimeoutError:
+                timeouts += 1
+                continue
+            reads += 1
+            # every song the writers send has the same number in each field
+            numbers = {snapshot[name].rpartition(" ")[2]
+                       for name in ("title", "artist", "album")}
+            if len(numbers) != 1:
+                torn += 1
+    reader.close()
+    results.put((reads, torn, timeouts))
+
+
+def _write(now_playing, writer, stop, counts):
+    """
+    Send songs and time updates until 'stop' is set.
+    """
+    number = 0
+    while not stop.is_set():
+        number += 1
+        tag = f"{writer}.{number}"
+        now_playing.notify(CONCRETE_MEDIATOR, NEW_SONG,
+                           Song(f"album {tag}", f"artist {tag}", number % 2 == 0, f"title {tag}"))
+        for position in range(10):
+            now_playing.notify(CONCRETE_MEDIATOR, TIME_UPDATE, (position, 240))
+    counts[writer] = number * 11
+
+
+def _measure(path, now_playing, args, writers):
+    """
+    Returns:
+        (Tuple[int, int, int, int]) reads, torn snapshots, timeouts and
+        writer updates
+    """
+    results = multiprocessing.Queue()
+    readers = [multiprocessing.Process(target=_read, args=(path, args.seconds, results))
+               for _ in range(args.readers)]
+    stop = threading.Event()
+    counts = [0] * writers
+    threads = [threading.Thread(target=_write, args=(now_playing, writer, stop, counts))
+               for writer in range(writers)]
+    for thread in threads:
+        thread.start()
+    for reader in readers:
+        reader.start()
+    totals = [0, 0, 0]
+    for _ in readers:
+        for index, value in enumerate(results.get()):
+            totals[index] += value
+    stop.set()
+    for thread in threads + readers:
+        thread.join()
+    return (*totals, sum(counts))
+
+
+def run(args):
+    """
+    Returns:
+        (int) the exit code, 1 if a reader saw a torn snapshot
+    """
+    path = os.path.join(tempfile.mkdtemp(prefix="pianobar-now-playing-"), "now_playing")
+    now_playing = NowPlaying(path)
+    now_playing.notify(CONCRETE_MEDIATOR, START, None)
+    now_playing.notify(CONCRETE_MEDIATOR, NEW_SONG, Song("album 0", "artist 0", False, "title 0"))
+    torn_total = 0
+    print(f"{args.readers} reader processes, {args.seconds:g}s each:")
+    for writers in (0, args.writers):
+        reads, torn, timeouts, updates = _measure(path, now_playing, args, writers)
+        torn_total += torn
+        print(f"  {writers} writer threads  {reads / args.seconds / args.readers:12,.0f} reads/s "
+              f"per reader  {updates / args.seconds:10,.0f} updates/s  "
+              f"{torn} torn  {timeouts} timeouts")
+    now_playing.notify(CONCRETE_MEDIATOR, QUIT, None)
+    os.remove(path)
+    if torn_total:
+        print("now_playing.bench: FAIL, readers saw torn snapshots", file=sys.stderr)
+        return 1
+    return 0
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark reads of the now playing file.")
+    parser.add_argument("--readers", type=int, default=4,
+                        help="reader processes (default: %(default)s)")
+    parser.add_argument("--writers", type=int, default=2,
+                        help="writer threads in the busy run (default: %(default)s)")
+    parser.add_argument("--seconds", type=float, default=3.0,
+                        help="how long each run reads (default: %(default)s)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(run(_parse_args(sys.argv[1:])))
@@ -0,0 +1,287 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+Layout of the now playing file, all integers little endian:
+
+    offset  size  field
+         0     8  magic b"PBNOWPL1"
+         8     4  u32 layout version (1)
+        12     4  u32 used size in bytes
+        16     8  u64 sequence, odd while the writer is updating
+        24     4  u32 flags: 1 song loaded, 2 favorite, 4 paused
+        28     4  u32 position in seconds
+        32     4  u32 duration in seconds
+        36     4  reserved
+        40     8  u64 wall clock time of the update, ns since the epoch
+        64   256  station
+       320   256  title
+       576   256  artist
+       832   256  album
+
+Each text slot is a u16 byte length followed by up to 254 bytes of UTF-8.
+A reader copies the fields between two reads of the sequence and retries
+when the sequence was odd or changed (a seqlock), so it never blocks the
+writer and needs no syscalls after mapping the file.
+"""
+from constants.constants import (
+    CONCRETE_MEDIATOR,
+    LOVE,
+    NEW_SONG,
+    NEW_STATION,
+    NOW_PLAYING,
+    PLAYBACK_STATUS,
+    QUIT,
+    START,
+    TIME_UPDATE
+)
+from mediator.base_component import BaseComponent
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+FLAG_FAVORITE = 2
+FLAG_PAUSED = 4
+FLAG_SONG = 1
+MAGIC = b"PBNOWPL1"
+VERSION = 1
+
+_FILE_SIZE = 4096
+_INFO = struct.Struct("<IIII Q")  # flags, position, duration, reserved, updated
+_INFO_OFFSET = 24
+_PREFIX = struct.Struct("<8sII")  # magic, version, size
+_SEQ = struct.Struct("<Q")
+_SEQ_OFFSET = 16
+_SLOT_LEN = struct.Struct("<H")
+_SLOT_SIZE = 256
+_SLOTS = ("station", "title", "artist", "album")
+_SLOTS_OFFSET = 64
+_USED_SIZE = _SLOTS_OFFSET + _SLOT_SIZE * len(_SLOTS)
+
+
+def default_path():
+    """
+    Returns:
+        path (str): the now playing file, in the per user runtime directory
+        which is a tmpfs on most systems, so updates never touch a disk
+    """
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR") or f"/tmp/pianobar-wrapper-{os.getuid()}"
+    return os.path.join(runtime_dir, "pianobar-wrapper", "now_playing")
+
+
+class NowPlaying(BaseComponent):
+    """
+    Publishes the current song, station, favorite flag and position into a
+    small memory mapped file for status bars to read without IPC.
+
+    Users of this class should only:
+    - Instantiate
+    - Set mediator
+    - Call into this class using the 'notify' method.
+    """
+
+    _fields = None
+    _lock = None
+    _map = None
+    _path = None
+    _seq = 0
+    mediator = None
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str): where to put the file, defaults to the runtime dir
+        """
+        super().__init__()
+        self._path = path or default_path()
+        # the seqlock allows one writer, events come from several threads
+        self._lock = threading.Lock()
+        self._fields = {
+            "album": "",
+            "artist": "",
+            "duration": 0,
+            "favorite": False,
+            "has_song": False,
+            "paused": False,
+            "position": 0,
+            "station": "",
+            "title": "",
+        }
+
+    def notify(self, sender, event, event2):
+        """
+        Consumers of this class should only communicate through here
+        using the mediator design pattern.
+        """
+        if sender != CONCRETE_MEDIATOR:
+            return
+        if event == START:
+            self._start()
+            return
+        if event == QUIT:
+            self._stop()
+            return
+
+        with self._lock:
+            if event == NEW_SONG:
+                self._fields.update(album=event2.album or "",
+                                    artist=event2.artist or "",
+                                    duration=0,
+                                    favorite=bool(event2.favorite),
+                                    has_song=True,
+                                    paused=False,
+                                    position=0,
+                                    title=event2.title or "")
+            elif event == LOVE:
+                # pianobar confirmed a love of the song playing
+                if not self._fields["has_song"]:
+                    return
+                self._fields["favorite"] = True
+            elif event == NEW_STATION:
+                self._fields["station"] = event2 or ""
+            elif event == PLAYBACK_STATUS:
+                self._fields["paused"] = bool(event2)
+            elif event == TIME_UPDATE:
+                self._fields["position"], self._fields["duration"] = event2
+            else:
+                return
+            self._publish(text_changed=event != TIME_UPDATE)
+
+    def _publish(self, text_changed=True):
+        """
+        Write the fields under the seqlock. Called with self._lock held.
+
+        Args:
+            text_changed (bool): False to skip rewriting the text slots
+        """
+        if self._map is None:
+            return
+        fields = self._fields
+        flags = ((FLAG_SONG if fields["has_song"] else 0)
+                 | (FLAG_FAVORITE if fields["favorite"] else 0)
+                 | (FLAG_PAUSED if fields["paused"] else 0))
+
+        self._seq += 1  # odd, readers will retry
+        _SEQ.pack_into(self._map, _SEQ_OFFSET, self._seq)
+        _INFO.pack_into(self._map, _INFO_OFFSET, flags, fields["position"],
+                        fields["duration"], 0, time.time_ns())
+        if text_changed:
+            for index, name in enumerate(_SLOTS):
+                self._write_slot(_SLOTS_OFFSET + index * _SLOT_SIZE, fields[name])
+        self._seq += 1  # even, the snapshot is consistent again
+        _SEQ.pack_into(self._map, _SEQ_OFFSET, self._seq)
+
+    def _start(self):
+        """
+        Create the file at its full size and map it.
+        """
+        try:
+            os.makedirs(os.path.dirname(self._path), mode=0o700, exist_ok=True)
+            tmp_path = self._path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(_PREFIX.pack(MAGIC, VERSION, _USED_SIZE))
+                f.write(b"\0" * (_FILE_SIZE - _PREFIX.size))
+            # readers never see a half created file
+            os.replace(tmp_path, self._path)
+            with open(self._path, "r+b") as f:
+                new_map = mmap.mmap(f.fileno(), _FILE_SIZE)
+        except OSError as e:
+            _logger.error(f"{NOW_PLAYING}: now playing file disabled: {e}")
+            return
+        with self._lock:
+            self._map = new_map
+            self._publish()
+        _logger.debug(f"{NOW_PLAYING}: publishing to {self._path}")
+
+    def _stop(self):
+        with self._lock:
+            if self._map is not None:
+                self._fields["has_song"] = False
+                self._publish()
+                self._map.close()
+                self._map = None
+
+    def _write_slot(self, offset, text):
+        data = text.encode("utf-8")[:_SLOT_SIZE - _SLOT_LEN.size]
+        # never leave half a character at the end
+        data = data.decode("utf-8", "ignore").encode("utf-8")
+        _SLOT_LEN.pack_into(self._map, offset, len(data))
+        self._map[offset + _SLOT_LEN.size:offset + _SLOT_LEN.size + len(data)] = data
+
+
+class NowPlayingReader:
+    """
+    Reference reader of the now playing file, readers in other languages
+    follow the same steps.
+    """
+
+    _map = None
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str): the now playing file, defaults to the runtime dir
+        """
+        with open(path or default_path(), "rb") as f:
+            self._map = mmap.mmap(f.fileno(), _FILE_SIZE, access=mmap.ACCESS_READ)
+        magic, version, _ = _PREFIX.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"not a version {VERSION} now playing file")
+
+    def close(self):
+        self._map.close()
+
+    def read(self, retries=1000):
+        """
+        Returns:
+            (dict): a consistent snapshot of the now playing fields
+
+        Raises:
+            TimeoutError: if no consistent snapshot was seen in 'retries'
+        """
+        for _ in range(retries):
+            seq = _SEQ.unpack_from(self._map, _SEQ_OFFSET)[0]
+            if seq & 1:
+                continue
+            raw = self._map[_INFO_OFFSET:_USED_SIZE]
+            if _SEQ.unpack_from(self._map, _SEQ_OFFSET)[0] != seq:
+                continue
+            flags, position, duration, _, updated = _INFO.unpack_from(raw, 0)
+            snapshot = {
+                "duration": duration,
+                "favorite": bool(flags & FLAG_FAVORITE),
+                "has_song": bool(flags & FLAG_SONG),
+                "paused": bool(flags & FLAG_PAUSED),
+                "position": position,
+                "seq": seq,
+                "updated_ns": updated,
+            }
+            for index, name in enumerate(_SLOTS):
+                offset = _SLOTS_OFFSET - _INFO_OFFSET + index * _SLOT_SIZE
+                length = _SLOT_LEN.unpack_from(raw, offset)[0]
+                start = offset + _SLOT_LEN.size
+                snapshot[name] = raw[start:start + length].decode("utf-8", "replace")
+            return snapshot
+        raise TimeoutError("the now playing file kept changing")
@@ -0,0 +1,73 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+Feed the now playing file a love before any song, a song, pianobar's
+confirmation of a love and the next song, and check the favorite flag a
+reader sees after each:
+
+    python3 -m now_playing.verify
+"""
+from constants.constants import CONCRETE_MEDIATOR, LOVE, NEW_SONG, QUIT, START
+from now_playing.now_playing import NowPlaying, NowPlayingReader
+from song.song import Song
+import os
+import sys
+import tempfile
+
+# (event, event2, the favorite flag expected after it)
+STEPS = (
+    (LOVE, None, False),
+    (NEW_SONG, Song(album="Album", artist="Artist", favorite=False, title="First"), False),
+    (LOVE, None, True),
+    (NEW_SONG, Song(album="Album", artist="Artist", favorite=False, title="Second"), False),
+)
+
+
+def verify():
+    """
+    Returns:
+        (int) the exit code, 1 if a reader saw the wrong flag
+    """
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "now_playing")
+        now_playing = NowPlaying(path)
+        now_playing.notify(CONCRETE_MEDIATOR, START, None)
+        reader = NowPlayingReader(path)
+        try:
+            for event, event2, expected in STEPS:
+                now_playing.notify(CONCRETE_MEDIATOR, event, event2)
+                snapshot = reader.read()
+                if snapshot["favorite"] != expected:
+                    print(f"after {event} ({snapshot['title'] or 'no song'}): "
+                          f"favorite {snapshot['favorite']}, expected {expected}")
+                    failures += 1
+        finally:
+            reader.close()
+            now_playing.notify(CONCRETE_MEDIATOR, QUIT, None)
+    if failures:
+        print("verify: FAIL, the favorite flag is wrong", file=sys.stderr)
+        return 1
+    print(f"verify: ok, {len(STEPS)} events")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(verify())
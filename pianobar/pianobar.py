@@ -18,12 +18,20 @@ python-pianobar-wrapper:
     You should have received a copy of the GNU General Public License
     along with this program.  If not, see <https://www.gnu.org/licenses/>
 """
-import os
-
+from collections import deque
+from concurrent.futures import Future
 from constants.constants import (
     CMD_NEXT,
     CMD_PLAY_PAUSE,
+    CMD_SONG_INFO,
+    CMD_UPCOMING,
+    CMD_VOLUME_DOWN,
+    CMD_VOLUME_RESET,
+    CMD_VOLUME_UP,
     CONCRETE_MEDIATOR,
+    DEFAULT_SESSION,
+    GET_RESOURCE_USAGE,
+    GET_SONG_INFO,
     GET_STATIONS,
     LOVE,
     MEDIA_NEXT,
@@ -31,19 +39,85 @@ from constants.constants import (
     NEW_SONG,
     NEW_STATION,
     PIANOBAR,
+    PIANOBAR_ERROR,
+    PLAYBACK_STALL,
+    POLICY_ABORT,
     QUIT,
     START,
-    STATION_CHANGE_REQUESTED
+    STATION_CHANGE_REQUESTED,
+    TIME_UPDATE,
+    UPCOMING,
+    VOLUME,
+    VOLUME_DOWN,
+    VOLUME_RESET,
+    VOLUME_UP
 )
 from mediator.base_component import BaseComponent
+from metrics.metrics import REGISTRY
+from pianobar_error.pianobar_error import classify
 from song.song import Song
+from song_info.song_info import SongInfo, SongInfoCache, info_key
+from stall_detector.stall_detector import StallDetector
+from tracing.tracing import TRACER
 from typing import List, Tuple
 import logging
+import os
 import re
 import subprocess
 import threading
 import time
 
+_logger = logging.getLogger(__name__)
+
+_COMMAND_SECONDS = REGISTRY.histogram(
+    "pianobar_wrapper_pianobar_command_seconds",
+    "Time from writing a command until pianobar confirmed or refused it",
+    ("command", "outcome"),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0))
+_DUPLICATE_SONGS = REGISTRY.counter(
+    "pianobar_wrapper_pianobar_duplicate_songs_total",
+    "Song lines pianobar printed again for the song playing, not sent on", ("session",))
+_ERRORS = REGISTRY.counter(
+    "pianobar_wrapper_pianobar_errors_total",
+    "Error lines pianobar printed, by kind", ("session", "kind"))
+_FIFO_WRITE_SECONDS = REGISTRY.histogram(
+    "pianobar_wrapper_pianobar_fifo_write_seconds",
+    "Time to open and write a command to the pianobar FIFO", ("session",))
+_LINES_READ = REGISTRY.counter(
+    "pianobar_wrapper_pianobar_lines_read_total",
+    "Lines read from pianobar's output", ("session",))
+_PARSE_FAILURES = REGISTRY.counter(
+    "pianobar_wrapper_pianobar_parse_failures_total",
+    "Song lines from pianobar which could not be parsed", ("session",))
+_VOLUME_ADJUSTMENTS = REGISTRY.counter(
+    "pianobar_wrapper_pianobar_volume_adjustments_total",
+    "Volume ups, downs and resets asked for", ("session",))
+_VOLUME_WRITES = REGISTRY.counter(
+    "pianobar_wrapper_pianobar_volume_writes_total",
+    "Batched volume writes to the pianobar FIFO", ("session",))
+
+
+class PianobarCommandError(Exception):
+    """
+    Set on a command's future when pianobar refused it, did not answer in
+    time, or the FIFO could not be written.
+    """
+
+
+class _PendingCommand:
+    """
+    A command written to pianobar which waits for its confirmation line.
+    """
+
+    __slots__ = ("event", "future", "prompted", "started", "timer")
+
+    def __init__(self, event):
+        self.event = event
+        self.future = Future()
+        self.prompted = False  # pianobar printed that it works on it
+        self.started = time.perf_counter()
+        self.timer = None
+
 
 class Pianobar(BaseComponent):
     """
@@ -53,19 +127,165 @@ class Pianobar(BaseComponent):
     - Instantiate
     - Set mediator
     - Call in to this class using 'notify' method.
+
+    Every instance is one pianobar session with its own config directory,
+    FIFO, reader and state, so several accounts can play side by side.
+    Events reach the mediator from "PIANOBAR/<session_id>".
+
+    LOVE, MEDIA_NEXT, MEDIA_PLAY and STATION_CHANGE_REQUESTED return a
+    concurrent.futures.Future. It resolves to the round trip in seconds
+    when pianobar prints the matching confirmation, e.g. "(i) Loving
+    song... Ok.", a new song or a new station line. On error text or a
+    timeout it fails with PianobarCommandError.
+
+    NEW_SONG is only sent when the song changes, a song line pianobar
+    prints again for the song playing is counted and dropped.
+
+    The songs queued after the current one are asked for with 'u' when a
+    new playlist arrives, and sent as UPCOMING. On each new song the cached
+    list is shifted instead of asking again.
+
+    GET_SONG_INFO returns a Future of the SongInfo of the current song,
+    what pianobar prints on 'i'. The details are asked for a few seconds
+    after each song starts and kept in an LRU cache, so they are usually
+    there at once.
+
+    Error lines are classified and sent as PIANOBAR_ERROR with a
+    PianobarError, the mediator applies its policy.
+
+    The time updates are watched for stalls, gaps and jumps, which are sent
+    as PLAYBACK_STALL with a Stall; a stall which lasts is sent again as
+    prolonged.
+
+    VOLUME_UP and VOLUME_DOWN (event2: the steps, 1 if None) and
+    VOLUME_RESET return the level pianobar will be at, in dB. Adjustments
+    are gathered for a short while and written to the FIFO at once, e.g.
+    "))))" for a turn of the scroll wheel, then sent as VOLUME with the
+    level.
     """
-    _fifo_path = None  # TODO hard coded value
+    _ack_timeout = 15.0  # seconds, pianobar may be waiting on Pandora
+    _background_thread = None
+    _background_wanted = None
+    _binary = None
+    _config_home = None
+    _config_path = None
+    _current_song = None
+    _duplicate_songs = None
+    _exited = None
+    _fifo_lock = None
+    _fifo_path = None
+    _fifo_write_seconds = None
+    _info = None  # SongInfo, collected from the output of 'i'
+    _info_cache = None
+    _info_delay = 3.0  # seconds after a song starts, not to hold up the user
+    _info_done = None
+    _info_due = None  # time.monotonic() the details are asked for at
+    _info_song = None
+    _info_timeout = 2.0  # seconds
+    _info_waiters = None  # info_key => List[Future]
+    _lines_read = None
     _lock = None
-    _output_buffer = []
+    _output_buffer = None
+    _parse_failures = None
+    _paused = False
+    _pending = None
+    _pending_lock = None
     _process = None
+    _prompt_lock = None
+    _quit_timeout = 5.0  # seconds to wait for a prompt sequence to end
     _reader_thread = None
+    _ready = None
+    _sender = None
+    _session_id = None
+    _stall_detector = None
+    _start_timeout = 30.0  # seconds, for login and the first playlist
+    _stop_lock = None
+    _time_pattern = re.compile(r'#\s+-?(\d+):(\d+)/(\d+):(\d+)')
+    _time_position = None
     _time_update = ""
+    _upcoming = None  # List[Song], the songs after the current one
+    _upcoming_done = None
+    _upcoming_entries = None  # collected from the output of 'u'
+    _upcoming_pattern = re.compile(r'^\d+\) (.+?) - (.+?)( <3)?(?: \([\d?]+:[\d?]+\))?$')
+    _upcoming_stale = False
+    _upcoming_timeout = 2.0  # seconds
+    _volume = 0  # dB, the level last written to pianobar
+    _volume_adjustments = None
+    _volume_interval = 0.1  # seconds a burst of adjustments is gathered for
+    _volume_max = 10  # dB, pianobar's max_gain
+    _volume_min = -40  # dB, as good as silent
+    _volume_pending = 0  # steps not written yet
+    _volume_reset = False  # '^' not written yet
+    _volume_thread = None
+    _volume_wanted = None
+    _volume_writes = None
+    _watch_interval = 1.0  # seconds between stall checks
+    _watch_thread = None
     mediator = None
 
-    def __init__(self):
+    def __init__(self, session_id=DEFAULT_SESSION, config_home=None,
+                 binary="/usr/bin/pianobar"):
+        """
+        Args:
+            session_id (str): the name the mediator knows this session by
+            config_home (str): used as XDG_CONFIG_HOME for pianobar, so its
+            config and FIFO are read from <config_home>/pianobar/. None uses
+            the user's own config directory.
+            binary (str): the pianobar executable
+        """
         super().__init__()
-        self._fifo_path = os.path.join(os.getenv('HOME'), '.config', 'pianobar','ctl')
+        self._background_wanted = threading.Event()
+        self._binary = binary
+        self._config_home = config_home
+        self._duplicate_songs = _DUPLICATE_SONGS.labels(session_id)
+        self._exited = threading.Event()
+        if config_home is None:
+            config_home = os.getenv('XDG_CONFIG_HOME') or os.path.join(
+                os.getenv('HOME'), '.config')
+        self._config_path = os.path.join(config_home, 'pianobar', 'config')
+        self._fifo_path = os.path.join(config_home, 'pianobar', 'ctl')
+        # re-entrant, a prompt sequence holds it across all of its writes
+        self._fifo_lock = threading.RLock()
+        self._fifo_write_seconds = _FIFO_WRITE_SECONDS.labels(session_id)
+        self._info_cache = SongInfoCache(session_id=session_id)
+        self._info_done = threading.Event()
+        self._info_waiters = {}
+        self._lines_read = _LINES_READ.labels(session_id)
         self._lock = threading.Lock()
+        # only the station list is parsed from here, keep the tail
+        self._output_buffer = deque(maxlen=1000)
+        self._parse_failures = _PARSE_FAILURES.labels(session_id)
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        # one at a time, the station prompt would take the keys of another
+        self._prompt_lock = threading.Lock()
+        # set by the first song, a fatal error or pianobar exiting
+        self._ready = threading.Event()
+        self._sender = f"{PIANOBAR}/{session_id}"
+        self._session_id = session_id
+        self._stall_detector = StallDetector(session_id)
+        # the mediator and an error policy may both quit the session
+        self._stop_lock = threading.Lock()
+        self._upcoming = []
+        self._upcoming_done = threading.Event()
+        self._volume_adjustments = _VOLUME_ADJUSTMENTS.labels(session_id)
+        self._volume_wanted = threading.Event()
+        self._volume_writes = _VOLUME_WRITES.labels(session_id)
+
+    @property
+    def is_running(self):
+        return self._process is not None and self._process.poll() is None
+
+    @property
+    def session_id(self):
+        return self._session_id
+
+    @property
+    def volume(self):
+        """
+        Returns: (int) the level pianobar was last set to, in dB
+        """
+        return self._volume
 
     def notify(self, sender, event, event2):
         """
@@ -73,25 +293,153 @@ class Pianobar(BaseComponent):
         using the mediator design pattern.
         """
         if sender == CONCRETE_MEDIATOR:
-            logging.debug(f"{PIANOBAR}: notify received event: {event}")
-            if event == GET_STATIONS:
+            _logger.debug("%s: notify received event: %s", PIANOBAR, event)
+            if event == GET_SONG_INFO:
+                return self._get_song_info()
+            elif event == GET_STATIONS:
                 return self._get_stations()
+            elif event == GET_RESOURCE_USAGE:
+                return self._get_resource_usage()
             elif event == LOVE:
                 # go to https://www.pandora.com/profile in web browser when
                 # logged in, and then click "Thumbs Up" text on left in page
                 # and the most recently thumbs up'd songs will appear at the
                 # top of the page on the right hand side.
-                self._send_command("+\n")
+                return self._run_command(LOVE, self._send_command, "+\n")
             elif event == MEDIA_PLAY:
-                self._send_command(CMD_PLAY_PAUSE)
+                # pianobar prints nothing for a pause, the write confirms it
+                future = self._run_command(MEDIA_PLAY, self._send_command, CMD_PLAY_PAUSE,
+                                           acknowledged=True)
+                if future.exception() is None:
+                    with self._lock:
+                        self._paused = not self._paused
+                        self._stall_detector.pause(self._paused, time.monotonic())
+                return future
             elif event == MEDIA_NEXT:
-                self._send_command(CMD_NEXT)
+                # the NEW_SONG which follows acknowledges it
+                return self._run_command(MEDIA_NEXT, self._send_command, CMD_NEXT, parked=True)
             elif event == QUIT:
                 self._stop()
             elif event == START:
                 self._start()
             elif event == STATION_CHANGE_REQUESTED:
-                self._change_station(event2)
+                return self._run_command(STATION_CHANGE_REQUESTED, self._change_station, event2,
+                                         parked=True)
+            elif event in (VOLUME_DOWN, VOLUME_RESET, VOLUME_UP):
+                return self._adjust_volume(event, event2)
+
+    def _acknowledgement(self, pending, line):
+        """
+        Args:
+            pending (_PendingCommand): the command waiting for an answer
+            line (str): an output line, without ANSI escapes
+
+        Returns:
+            (Tuple[bool, str]): whether the line answers the command, and
+            the error if it refused it
+        """
+        event = pending.event
+        if event == LOVE and "Loving song" in line:
+            if "Ok." in line:
+                return True, None
+            if "Error" in line:
+                return True, line.strip()
+            pending.prompted = True
+        elif event == MEDIA_NEXT and "|>  " in line and "|>  Station " not in line:
+            return True, None
+        elif event == STATION_CHANGE_REQUESTED:
+            if "|>  Station " in line:
+                return True, None
+            if "Select station" in line:
+                pending.prompted = True
+        # an error refuses the command only once pianobar works on it, any
+        # other is about the playback and left to the error policies
+        if pending.prompted and "/!\\" in line:
+            return True, line[line.index("/!\\"):].strip()
+        return False, None
+
+    def _adjust_volume(self, event, steps=None):
+        """
+        Add an adjustment to those waiting to be written, the volume thread
+        writes them all at once.
+
+        Args:
+            event (str): VOLUME_UP, VOLUME_DOWN or VOLUME_RESET
+            steps (int): how many dB up or down, 1 if None
+
+        Returns:
+            level (int): the level once the adjustments are written
+        """
+        with self._lock:
+            if event == VOLUME_RESET:
+                # what came before the reset no longer matters
+                self._volume_reset = True
+                self._volume_pending = 0
+            else:
+                steps = steps or 1
+                self._volume_pending += steps if event == VOLUME_UP else -steps
+            base = 0 if self._volume_reset else self._volume
+            # steps past the limits would not change what pianobar plays
+            level = self._clamp_volume(base + self._volume_pending)
+            self._volume_pending = level - base
+        self._volume_adjustments.inc()
+        self._volume_wanted.set()
+        return level
+
+    def _ask_upcoming(self):
+        """
+        Write 'u' and wait until the reader thread collected the answer.
+        """
+        with self._prompt_lock:
+            with self._lock:
+                self._upcoming_entries = []
+                self._upcoming_done.clear()
+            try:
+                self._send_command(CMD_UPCOMING)
+            except OSError as e:
+                _logger.error("%s: could not ask for the upcoming songs: %s", PIANOBAR, e)
+                answered = False
+            else:
+                answered = self._upcoming_done.wait(self._upcoming_timeout)
+            if not answered:
+                with self._lock:
+                    self._upcoming_entries = None
+
+    def _ask_song_info(self, song):
+        """
+        Write 'i' unless the details of 'song' are cached, and hand them to
+        whoever waits for them.
+
+        Args:
+            song (Song): the song pianobar is playing
+        """
+        key = info_key(song)
+        info = self._info_cache.peek(key)
+        if info is None:
+            with self._prompt_lock:
+                with self._lock:
+                    self._info = SongInfo(song)
+                    self._info_done.clear()
+                try:
+                    self._send_command(CMD_SONG_INFO)
+                except OSError as e:
+                    _logger.error("%s: could not ask for the song details: %s", PIANOBAR, e)
+                else:
+                    # paused, pianobar prints no time update to end the details
+                    self._info_done.wait(self._info_timeout)
+                with self._lock:
+                    info, self._info = self._info, None
+            if info.is_empty:
+                info = None
+            else:
+                self._info_cache.put(key, info)
+        with self._lock:
+            waiters = self._info_waiters.pop(key, [])
+        for future in waiters:
+            if info is None:
+                future.set_exception(PianobarCommandError("pianobar printed no song details"))
+            else:
+                future.set_result(info)
 
     def _change_station(self, station):
         """
@@ -99,17 +447,85 @@ class Pianobar(BaseComponent):
         Args:
             station (int): an integer corresponding to the desired station
         """
-        logging.debug(f"{PIANOBAR}: changing to station: {station}")
-        self._send_command("s")
-        time.sleep(1)  # wait for list to print out
-        self._send_command(str(station))
-        self._send_command("\n")
-        self._send_command("\n")
+        _logger.debug("%s: changing to station: %s", PIANOBAR, station)
+        # no other write may land between 's' and the station number
+        with self._prompt_lock, self._fifo_lock:
+            self._send_command("s")
+            time.sleep(1)  # wait for list to print out
+            self._send_command(str(station))
+            self._send_command("\n")
+            self._send_command("\n")
+
+    def _check_acknowledgements(self, line):
+        """
+        Settle the oldest pending command this output line answers.
+
+        Args:
+            line (str): an output line, without ANSI escapes
+        """
+        with self._pending_lock:
+            pending_commands = list(self._pending)
+        for pending in pending_commands:
+            answered, error = self._acknowledgement(pending, line)
+            if answered:
+                self._settle(pending, error)
+                return
+
+    def _clamp_volume(self, level):
+        """
+        Returns:
+            level (int): level kept between the quietest level we go to and
+            the gain pianobar allows
+        """
+        return max(self._volume_min, min(level, self._volume_max))
 
     def _clear_buffer(self):
         with self._lock:
             self._output_buffer.clear()
 
+    def _collect_song_info(self, line):
+        """
+        Args:
+            line (str): an output line, without ANSI escapes
+
+        Returns:
+            (bool) True if the line was part of the song details
+        """
+        if "|>  " in line and "|>  Station " not in line:
+            # 'i' prints the song again, any other is a new song
+            song = self._extract_song_data(line)
+            if song is not None and info_key(song) == info_key(self._info):
+                return True
+        elif self._info.add_line(line):
+            return True
+        # the details are over once pianobar prints something else
+        if not self._info.is_empty:
+            self._info_done.set()
+        return False
+
+    def _collect_upcoming(self, line, events):
+        """
+        Args:
+            line (str): an output line, without ANSI escapes
+            events (list): gets UPCOMING once the list is over
+
+        Returns:
+            (bool) True if the line was part of the upcoming list
+        """
+        text = line.strip()
+        if text == "(i) No songs in queue.":
+            self._finish_upcoming(events)
+            return True
+        match = self._upcoming_pattern.match(text)
+        if match is None:
+            # the list is over once pianobar prints something else
+            if self._upcoming_entries:
+                self._finish_upcoming(events)
+            return False
+        artist, title, loved = match.group(1), match.group(2), match.group(3)
+        self._upcoming_entries.append(Song(None, artist, loved is not None, title))
+        return True
+
     def _extract_song_data(self, text):
         """
         Extracts song information and sends it to Mediator for consumption
@@ -122,12 +538,13 @@ class Pianobar(BaseComponent):
             or
             None (None) : if no data found
         """
-        logging.debug(f"{PIANOBAR}: extracting data from text: {text}")
+        _logger.debug("%s: extracting data from text: %s", PIANOBAR, text)
 
         text = text.strip("|> ")
 
         if text is None:
-            logging.critical(f"{PIANOBAR}: received None type for song data!")
+            _logger.critical("%s: received None type for song data!", PIANOBAR)
+            self._parse_failures.inc()
             return None
 
         parts = text.split('"')
@@ -138,46 +555,198 @@ class Pianobar(BaseComponent):
             album = parts[5]
             is_favorite = False
             if text.strip('\n').endswith("<3"):
-                logging.debug(f"{PIANOBAR}: is favorite song")
+                _logger.debug("%s: is favorite song", PIANOBAR)
                 is_favorite = True
             else:
-                logging.debug(f"{PIANOBAR}: is NOT favorite song")
-            logging.debug(f"{PIANOBAR}: extracted => song: {title}, artist: {artist}, album: {album}, favorite: {is_favorite}")
+                _logger.debug("%s: is NOT favorite song", PIANOBAR)
+            _logger.debug("%s: extracted => song: %s, artist: %s, album: %s, favorite: %s", PIANOBAR, title, artist, album, is_favorite)
             song_data = Song(album=album, artist=artist, title=title, favorite=is_favorite)
             # return a Song object with structured data
             return song_data
 
         # Return None if the format is incorrect
-        logging.critical(f"{PIANOBAR}: extracted no song data, improperly formatted string!")
-        logging.critical(f"{PIANOBAR}: the improper string held: {text}")
+        self._parse_failures.inc()
+        _logger.critical("%s: extracted no song data, improperly formatted string!", PIANOBAR)
+        _logger.critical("%s: the improper string held: %s", PIANOBAR, text)
         return None
 
+    def _finish_upcoming(self, events):
+        """
+        Args:
+            events (list): gets UPCOMING with the collected list
+        """
+        self._upcoming = self._upcoming_entries
+        self._upcoming_entries = None
+        self._upcoming_done.set()
+        _logger.debug("%s: %s songs up next", PIANOBAR, len(self._upcoming))
+        events.append((UPCOMING, list(self._upcoming)))
+
+    def _get_resource_usage(self):
+        """
+        Returns:
+            usage (dict): pid, resident memory (kB) and CPU seconds of this
+            session's pianobar process, read from /proc
+        """
+        usage = {"session": self._session_id, "pid": None, "rss_kb": None, "cpu_seconds": None}
+        if self._process is None or self._process.poll() is not None:
+            return usage
+        pid = self._process.pid
+        usage["pid"] = pid
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        usage["rss_kb"] = int(line.split()[1])
+                        break
+            with open(f"/proc/{pid}/stat") as f:
+                # the command name may hold spaces, fields follow the ')'
+                fields = f.read().rsplit(")", 1)[1].split()
+            ticks = os.sysconf("SC_CLK_TCK")
+            usage["cpu_seconds"] = (int(fields[11]) + int(fields[12])) / ticks
+        except (OSError, ValueError, IndexError) as e:
+            _logger.debug("%s: could not read /proc for %s: %s", PIANOBAR, pid, e)
+        return usage
+
+    def _get_song_info(self):
+        """
+        Returns:
+            (Future): resolves to the SongInfo of the current song, from
+            the cache or once pianobar printed it
+        """
+        future = Future()
+        song = self._current_song
+        if song is None:
+            future.set_exception(PianobarCommandError("no song is playing"))
+            return future
+        key = info_key(song)
+        info = self._info_cache.get(key)
+        if info is not None:
+            future.set_result(info)
+            return future
+        with self._lock:
+            self._info_waiters.setdefault(key, []).append(future)
+            self._schedule_song_info(song, 0)
+        return future
+
     def _get_stations(self):
         """
         Returns: raw data holding the list of stations from pianobar
         """
-        logging.debug(f"{PIANOBAR}: getting stations list")
-        self._clear_buffer()
-        self._send_command("s")
-        time.sleep(1)  # wait for list to print out
-        stations = self._parse_stations()
-        self._send_command("\n")
-        self._clear_buffer()
+        _logger.debug("%s: getting stations list", PIANOBAR)
+        with self._prompt_lock, self._fifo_lock:
+            self._clear_buffer()
+            self._send_command("s")
+            time.sleep(1)  # wait for list to print out
+            stations = self._parse_stations()
+            self._send_command("\n")
+            self._clear_buffer()
         return stations
 
     def _get_time_update(self):
         with self._lock:
             return self._time_update
 
+    def _handle_line(self, line):
+        """
+        Take in an output line other than the song details and the answers
+        to commands. Called with self._lock held, so the events it causes
+        are returned rather than sent.
+
+        Args:
+            line (str): a raw output line
+
+        Returns:
+            events (List[Tuple[str, object]]): (event, event2) to send
+        """
+        events = []
+        if self._is_time_update(line):
+            if self._upcoming_entries:
+                self._finish_upcoming(events)
+            if self._info is not None and not self._info.is_empty:
+                self._info_done.set()
+            self._time_update = line.strip()
+            position = self._parse_time_update(self._time_update)
+            if position is not None:
+                stall = self._stall_detector.tick(position[0], time.monotonic())
+                if stall is not None:
+                    events.append((PLAYBACK_STALL, stall))
+            # pianobar redraws the same second, only pass on changes
+            if position is not None and position != self._time_position:
+                self._time_position = position
+                events.append((TIME_UPDATE, position))
+            return events
+        clean_line = self._remove_ansi_escape_and_tabs(line)
+        if self._upcoming_entries is not None and self._collect_upcoming(clean_line, events):
+            return events
+        self._output_buffer.append(line.strip())
+        line = clean_line
+        if "|>  Station " in line:  # handle station name updates
+            line = line.strip("|> ")
+            results = []
+            start_index = 0
+            while True:
+                start_index = line.find('"', start_index) + 1
+                if start_index == 0:
+                    break
+                end_index = line.find('"', start_index)
+                if end_index == -1:
+                    break
+                results.append(line[start_index:end_index])
+                start_index = end_index + 1
+            station = ' '.join(results)
+            # tell mediator we have a station change event
+            _logger.debug("%s: new station event! sending event2=%s", PIANOBAR, station)
+            events.append((NEW_STATION, station))
+        elif "|>  " in line:  # handle songs
+            _logger.debug("%s: new song event! begin parsing with event2=%s", PIANOBAR, line)
+            song_obj = self._extract_song_data(line)
+            if song_obj is None:
+                _logger.debug("%s: new song event recv 'None' for song obj!", PIANOBAR)
+            elif self._current_song is not None and song_obj.identity == self._current_song.identity:
+                # e.g. reprinted after a pause, nothing changed
+                self._duplicate_songs.inc()
+                _logger.debug("%s: same song printed again, not sending it", PIANOBAR)
+            else:
+                _logger.debug("%s: new song event sending data to mediator!", PIANOBAR)
+                events.append((NEW_SONG, song_obj))
+                self._current_song = song_obj
+                self._paused = False
+                self._stall_detector.reset(time.monotonic())
+                self._shift_upcoming(song_obj, events)
+                if info_key(song_obj) not in self._info_cache:
+                    self._schedule_song_info(song_obj, self._info_delay)
+        elif "Receiving new playlist" in line and "Ok." in line:
+            self._upcoming_stale = True
+        elif line.lstrip().startswith(("/!\\", "(i) ")):
+            error = classify(line)
+            if error is not None:
+                events.append((PIANOBAR_ERROR, error))
+        return events
+
     def _is_time_update(self, line):
         # Adjust this logic to accurately identify time update lines
         return line.strip().startswith('#')
 
+    def _parse_time_update(self, line):
+        """
+        Args:
+            line (str): a time update line such as '#  -02:54/03:54'
+
+        Returns:
+            (Tuple[int, int]): (position, duration) in seconds, or None
+        """
+        match = self._time_pattern.search(line)
+        if match is None:
+            return None
+        remaining = int(match.group(1)) * 60 + int(match.group(2))
+        duration = int(match.group(3)) * 60 + int(match.group(4))
+        return max(duration - remaining, 0), duration
+
     def _next_song(self):
         """
         Send the next song cmd to pianobar
         """
-        logging.debug(f"{PIANOBAR}: sending next song command")
+        _logger.debug("%s: sending next song command", PIANOBAR)
         self._send_command("n")
 
     def _parse_stations(self):
@@ -201,14 +770,14 @@ class Pianobar(BaseComponent):
                     if station_name_cleaned.startswith("q  "):
                         station_name_cleaned = station_name_cleaned.strip("q  ")
                     station_list.append((number, station_name_cleaned))
-        logging.debug(f"{PIANOBAR}: returning station_list with contents:\n {station_list}")
+        _logger.debug("%s: returning station_list with contents:\n %s", PIANOBAR, station_list)
         return station_list
 
     def _play_pause(self):
         """
         Sends play / pause cmd to pianobar
         """
-        logging.debug(f"{PIANOBAR}: toggle play/pause")
+        _logger.debug("%s: toggle play/pause", PIANOBAR)
         self._send_command("p")
 
     def _read_output(self):
@@ -217,38 +786,48 @@ class Pianobar(BaseComponent):
         of concern to the mediator.
         """
         for line in self._process.stdout:
+            self._lines_read.inc()
+            if self._info is not None and not self._is_time_update(line):
+                # the song and station 'i' prints again are no news
+                with self._lock:
+                    collected = self._info is not None and self._collect_song_info(
+                        self._remove_ansi_escape_and_tabs(line))
+                if collected:
+                    continue
+            if self._pending and not self._is_time_update(line):
+                # outside the lock, futures run their callbacks right here
+                self._check_acknowledgements(self._remove_ansi_escape_and_tabs(line))
             with self._lock:
-                if self._is_time_update(line):
-                    # TODO pass to GUI
-                    self._time_update = line.strip()
-                else:
-                    self._output_buffer.append(line.strip())
-                    line = self._remove_ansi_escape_and_tabs(line)
-                    if "|>  Station " in line:  # handle station name updates
-                        line = line.strip("|> ")
-                        results = []
-                        start_index = 0
-                        while True:
-                            start_index = line.find('"', start_index) + 1
-                            if start_index == 0:
-                                break
-                            end_index = line.find('"', start_index)
-                            if end_index == -1:
-                                break
-                            results.append(line[start_index:end_index])
-                            start_index = end_index + 1
-                        station = ' '.join(results)
-                        # tell mediator we have a station change event
-                        logging.debug(f"{PIANOBAR}: new station event! sending event2={station}")
-                        self.mediator.notify(PIANOBAR, event=NEW_STATION, event2=station)
-                    elif "|>  " in line:  # handle songs
-                        logging.debug(f"{PIANOBAR}: new song event! begin parsing with event2={line}")
-                        song_obj = self._extract_song_data(line)
-                        if song_obj is None:
-                            logging.debug(f"{PIANOBAR}: new song event recv 'None' for song obj!")
-                        else:
-                            logging.debug(f"{PIANOBAR}: new song event sending data to mediator!")
-                            self.mediator.notify(PIANOBAR, event=NEW_SONG, event2=song_obj)
+                events = self._handle_line(line)
+            # outside the lock, observers may wait on the Tk thread, which
+            # takes it for the volume and play / pause
+            self._send_events(events)
+        # pianobar exited, do not keep a start up or the background threads waiting
+        self._process.wait()
+        self._exited.set()
+        self._ready.set()
+        self._background_wanted.set()
+        self._volume_wanted.set()
+
+    def _read_config(self, setting, default):
+        """
+        Args:
+            setting (str): a numeric setting, e.g. 'volume'
+            default (int): pianobar's default for it
+
+        Returns:
+            value (int): the setting from pianobar's config, the default if
+            it sets none
+        """
+        try:
+            with open(self._config_path, encoding="utf-8") as f:
+                for line in f:
+                    name, _, value = line.partition("=")
+                    if name.strip() == setting:
+                        return int(value.strip())
+        except (OSError, ValueError) as e:
+            _logger.debug("%s: no %s read from %s: %s", PIANOBAR, setting, self._config_path, e)
+        return default
 
     def _remove_ansi_escape_and_tabs(self, text):
         """
@@ -264,6 +843,132 @@ class Pianobar(BaseComponent):
         cleaned_text = pattern.sub('', text)
         return cleaned_text
 
+    def _report_error(self, error):
+        """
+        Send a classified error line to the mediator.
+
+        Args:
+            error (PianobarError): what the line was classified as
+        """
+        _ERRORS.labels(self._session_id, error.kind).inc()
+        _logger.warning("%s: session %s: %s (%s, %s)", PIANOBAR, self._session_id,
+                        error.message, error.kind, error.policy)
+        if error.policy == POLICY_ABORT:
+            self._ready.set()
+        self.mediator.notify(self._sender, event=PIANOBAR_ERROR, event2=error)
+
+    def _report_stall(self, stall):
+        """
+        Args:
+            stall (Stall): what the stall detector saw
+        """
+        at = "the start" if stall.position is None else f"{stall.position}s"
+        _logger.warning("%s: session %s: %s for %.1fs at %s%s", PIANOBAR, self._session_id,
+                        stall.kind, stall.seconds, at, ", prolonged" if stall.prolonged else "")
+        self.mediator.notify(self._sender, event=PLAYBACK_STALL, event2=stall)
+
+    def _run_background(self):
+        """
+        Ask pianobar for the upcoming songs and the details of the current
+        song whenever they are wanted, on a thread of its own as the
+        answers are read by the reader thread. Requests made while one is
+        asked for are folded into the next one.
+        """
+        while True:
+            with self._lock:
+                due = self._info_due
+            self._background_wanted.wait(None if due is None else max(0.0, due - time.monotonic()))
+            self._background_wanted.clear()
+            if not self.is_running:
+                return
+            if self._upcoming_stale:
+                self._upcoming_stale = False
+                self._ask_upcoming()
+            with self._lock:
+                song = None
+                if self._info_due is not None and self._info_due <= time.monotonic():
+                    song, self._info_due = self._info_song, None
+            if song is not None:
+                self._ask_song_info(song)
+
+    def _run_command(self, event, send, argument, acknowledged=False, parked=False):
+        """
+        Write a command and return a future for pianobar's answer.
+
+        Args:
+            event (str): the command, e.g. LOVE
+            send (Callable[[str], None]): writes it to the FIFO
+            argument (str): passed to 'send'
+            acknowledged (bool): True if writing it is all the answer there
+            will be
+            parked (bool): True to park the current trace until the song
+            the command brings is read
+
+        Returns:
+            future (Future): resolves to the round trip in seconds
+        """
+        pending = _PendingCommand(event)
+        pending.timer = threading.Timer(
+            self._ack_timeout, self._settle,
+            args=(pending, f"no answer from pianobar in {self._ack_timeout:g}s"))
+        pending.timer.daemon = True
+        # registered before the write, the answer can be quick
+        with self._pending_lock:
+            self._pending.append(pending)
+        pending.timer.start()
+        if parked:
+            # before the write too, the song may be read before it returns
+            TRACER.park(self._sender)
+        try:
+            send(argument)
+        except OSError as e:
+            self._settle(pending, f"could not write to {self._fifo_path}: {e}")
+            if parked:
+                TRACER.unpark(self._sender)
+        else:
+            if acknowledged:
+                self._settle(pending)
+        return pending.future
+
+    def _run_volume(self):
+        """
+        Write the volume adjustments, on a thread of its own. Those made
+        within '_volume_interval' of the first are folded into one write,
+        so a scroll or a held key does not write to the FIFO per step.
+        """
+        while True:
+            self._volume_wanted.wait()
+            if self._exited.wait(self._volume_interval):
+                return
+            self._volume_wanted.clear()
+            with self._lock:
+                reset, steps = self._volume_reset, self._volume_pending
+                if not reset and not steps:
+                    continue
+                self._volume_reset, self._volume_pending = False, 0
+                self._volume = (0 if reset else self._volume) + steps
+                level = self._volume
+            command = (CMD_VOLUME_RESET if reset else "") + (
+                (CMD_VOLUME_UP if steps > 0 else CMD_VOLUME_DOWN) * abs(steps))
+            try:
+                self._send_command(command)
+            except OSError as e:
+                _logger.error("%s: could not change the volume: %s", PIANOBAR, e)
+                continue
+            self._volume_writes.inc()
+            _logger.debug("%s: volume %s dB after %r", PIANOBAR, level, command)
+            self.mediator.notify(self._sender, event=VOLUME, event2=level)
+
+    def _schedule_song_info(self, song, delay):
+        """
+        Have the details of 'song' asked for in 'delay' seconds, in place of
+        those of a song which ended before its turn. Called with self._lock
+        held.
+        """
+        self._info_song = song
+        self._info_due = time.monotonic() + delay
+        self._background_wanted.set()
+
     def _send_command(self, command):
         """
         Generic func to send commands to pianobar.
@@ -271,35 +976,172 @@ class Pianobar(BaseComponent):
         Args:
             command (str): a command known by pianobar
         """
-        logging.debug(f"{PIANOBAR}: writing cmd to pianobar: {command}")
-        with open(self._fifo_path, "w") as fifo:
-            fifo.write(command)
+        _logger.debug("%s: writing cmd to pianobar: %s", PIANOBAR, command)
+        # the GUI, tray, key listener and remote clients all write here
+        with self._fifo_lock, TRACER.span("fifo_write"):
+            started = time.perf_counter()
+            with open(self._fifo_path, "w") as fifo:
+                fifo.write(command)
+            self._fifo_write_seconds.observe(time.perf_counter() - started)
+
+    def _send_events(self, events):
+        """
+        Args:
+            events (List[Tuple[str, object]]): (event, event2) from
+            _handle_line, sent with self._lock released
+        """
+        for event, event2 in events:
+            if event == NEW_SONG:
+                # continues the trace of a next / station change
+                with TRACER.resume(self._sender):
+                    self.mediator.notify(self._sender, event=NEW_SONG, event2=event2)
+                self._ready.set()
+            elif event == PIANOBAR_ERROR:
+                self._report_error(event2)
+            elif event == PLAYBACK_STALL:
+                self._report_stall(event2)
+            else:
+                self.mediator.notify(self._sender, event=event, event2=event2)
+
+    def _send_quit(self):
+        """
+        Write 'q' without waiting for a reader: opening a FIFO blocks until
+        one comes, and pianobar may exit at any moment.
+
+        Returns:
+            (bool) True if pianobar was reading the FIFO
+        """
+        # 'q' written inside a prompt sequence would be read as its answer,
+        # but do not wait on a writer stuck on a pianobar that is gone
+        locked = self._fifo_lock.acquire(timeout=self._quit_timeout)
+        try:
+            fd = os.open(self._fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError as e:
+            _logger.debug("%s: could not send quit: %s", PIANOBAR, e)
+            return False
+        else:
+            try:
+                os.write(fd, b"q")
+            finally:
+                os.close(fd)
+            return True
+        finally:
+            if locked:
+                self._fifo_lock.release()
+
+    def _settle(self, pending, error=None):
+        """
+        Resolve a pending command once, whichever of its answer, an error
+        or the timeout comes first.
+
+        Args:
+            pending (_PendingCommand): the command
+            error (str): why it failed, None if it succeeded
+        """
+        with self._pending_lock:
+            if pending not in self._pending:
+                return
+            self._pending.remove(pending)
+        pending.timer.cancel()
+        elapsed = time.perf_counter() - pending.started
+        _COMMAND_SECONDS.labels(pending.event, "error" if error else "ok").observe(elapsed)
+        if error:
+            _logger.warning("%s: %s failed after %.2fs: %s", PIANOBAR, pending.event, elapsed, error)
+            pending.future.set_exception(PianobarCommandError(f"{pending.event}: {error}"))
+        else:
+            _logger.debug("%s: %s confirmed in %.3fs", PIANOBAR, pending.event, elapsed)
+            pending.future.set_result(elapsed)
+
+    def _shift_upcoming(self, song, events):
+        """
+        Drop the cached songs up to the one now playing. A song which was
+        not queued means another playlist, so ask pianobar again.
+
+        Args:
+            song (Song): the song which just started
+            events (list): gets UPCOMING with what is left
+        """
+        for index, queued in enumerate(self._upcoming):
+            if queued.artist == song.artist and queued.title == song.title:
+                self._upcoming = self._upcoming[index + 1:]
+                events.append((UPCOMING, list(self._upcoming)))
+                break
+        else:
+            self._upcoming_stale = True
+        if self._upcoming_stale:
+            self._background_wanted.set()
 
     def _start(self):
         """
         Starts a sub process running the pianobar application and sets up
         a way to read its output.
         """
-        logging.debug(f"{PIANOBAR} Starting up!")
+        _logger.debug("%s: Starting up session %s!", PIANOBAR, self._session_id)
+        if self._reader_thread is not None and self._process.poll() is not None:
+            # the reader of the pianobar before sets the events once done
+            self._reader_thread.join()
+        self._current_song = None
+        self._exited.clear()
+        # set by the pianobar this starts, not by the one before
+        self._ready.clear()
+        self._stall_detector.stop()
+        # a new pianobar starts at the volume of its config again
+        with self._lock:
+            self._volume_max = self._read_config("max_gain", Pianobar._volume_max)
+            self._volume = self._clamp_volume(self._read_config("volume", 0))
+            self._volume_pending = 0
+            self._volume_reset = False
+        env = None
+        if self._config_home is not None:
+            env = dict(os.environ, XDG_CONFIG_HOME=self._config_home)
         # Start pianobar and capture its output
         self._process = subprocess.Popen(
-            ['/usr/bin/pianobar'],
+            [self._binary],
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
             bufsize=1,
-            text=True
+            text=True,
+            env=env
         )
         self._reader_thread = threading.Thread(target=self._read_output)
         self._reader_thread.daemon = True
         self._reader_thread.start()
-        # Wait for pianobar to connect
-        time.sleep(5)
+        self._background_thread = threading.Thread(target=self._run_background, daemon=True)
+        self._background_thread.start()
+        self._watch_thread = threading.Thread(target=self._watch_playback, daemon=True)
+        self._watch_thread.start()
+        self._volume_thread = threading.Thread(target=self._run_volume, daemon=True)
+        self._volume_thread.start()
+        # Wait for pianobar to connect, a login failure ends this at once
+        if not self._ready.wait(self._start_timeout):
+            _logger.error("%s: session %s played nothing in %gs",
+                          PIANOBAR, self._session_id, self._start_timeout)
 
     def _stop(self):
         """
-        Stop pianobar and exit the subprocess that contained it.
+        Stop pianobar and exit the subprocess that contained it. Later and
+        concurrent calls wait for the first one and do nothing.
         """
-        if self._process:
-            logging.info(f"{PIANOBAR} Quitting!")
-            self._send_command("q")  # quit
+        with self._stop_lock:
+            with self._pending_lock:
+                pending_commands = list(self._pending)
+            for pending in pending_commands:
+                self._settle(pending, "pianobar quit")
+            if self._process is None or self._process.poll() is not None:
+                return
+            _logger.info("%s: Quitting session %s!", PIANOBAR, self._session_id)
+            if not self._send_quit():
+                # not reading its FIFO, it would never see the 'q'
+                self._process.terminate()
             self._process.wait()  # exit gracefully
+
+    def _watch_playback(self):
+        """
+        Check for stalls and gaps while pianobar runs; the time updates,
+        which are missing then, cannot tell.
+        """
+        while not self._exited.wait(self._watch_interval):
+            with self._lock:
+                stall = self._stall_detector.check(time.monotonic())
+            if stall is not None:
+                self._report_stall(stall)
@@ -0,0 +1,145 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+Sorts the errors pianobar prints, "/!\\ ..." lines and "(i) ... Error"
+answers, into kinds which each have a policy: bad credentials abort the
+session, network errors are retried with a bounded backoff and playlist
+errors skip to the next song.
+"""
+from constants.constants import (
+    ERROR_AUTH,
+    ERROR_NETWORK,
+    ERROR_PLAYLIST,
+    ERROR_UNKNOWN,
+    POLICY_ABORT,
+    POLICY_RETRY,
+    POLICY_SKIP
+)
+
+# checked in this order, "Receiving new playlist... Error: Timeout." is
+# a network error
+_PATTERNS = (
+    (ERROR_AUTH, ("access denied", "invalid login", "invalid partner", "invalid username",
+                  "not authorized", "password", "wrong email")),
+    (ERROR_NETWORK, ("auth token", "connection closed", "connection refused", "could not resolve",
+                     "handshake", "maintenance", "network error", "read error", "timed out",
+                     "timeout", "unreachable", "write error")),
+    (ERROR_PLAYLIST, ("audio file", "invalid station", "playlist", "station does not exist")),
+)
+
+_POLICIES = {
+    ERROR_AUTH: POLICY_ABORT,
+    ERROR_NETWORK: POLICY_RETRY,
+    ERROR_PLAYLIST: POLICY_SKIP,
+}
+
+# a failed love or ban is answered by its command future, only these
+# leave pianobar without a song to play
+_PLAYBACK_OPERATIONS = ("Get stations", "Login", "Receiving new playlist")
+
+
+class PianobarError:
+    """
+    An error line from pianobar, the event2 of PIANOBAR_ERROR.
+    """
+
+    __slots__ = ("kind", "message", "operation", "policy")
+
+    def __init__(self, kind, message, operation=None, policy=None):
+        """
+        Args:
+            kind (str): ERROR_AUTH, ERROR_NETWORK, ERROR_PLAYLIST or
+            ERROR_UNKNOWN
+            message (str): the line pianobar printed
+            operation (str): what pianobar was doing, e.g. "Login", None
+            for "/!\\" lines
+            policy (str): POLICY_ABORT, POLICY_RETRY, POLICY_SKIP, or None
+            to only report it
+        """
+        self.kind = kind
+        self.message = message
+        self.operation = operation
+        self.policy = policy
+
+    def __repr__(self):
+        return f"PianobarError({self.kind}, {self.policy}, {self.message!r})"
+
+
+class RetryBackoff:
+    """
+    A bounded exponential backoff, reset once a song plays again.
+    """
+
+    __slots__ = ("_attempt", "_attempts", "_initial", "_max")
+
+    def __init__(self, attempts=5, initial=1.0, maximum=30.0):
+        """
+        Args:
+            attempts (int): retries before giving up
+            initial (float): seconds before the first retry
+            maximum (float): the longest wait in seconds
+        """
+        self._attempt = 0
+        self._attempts = attempts
+        self._initial = initial
+        self._max = maximum
+
+    def next_delay(self):
+        """
+        Returns:
+            delay (float): seconds to wait before the next retry, or None
+            when the retries are used up
+        """
+        if self._attempt >= self._attempts:
+            return None
+        delay = min(self._initial * 2 ** self._attempt, self._max)
+        self._attempt += 1
+        return delay
+
+    def reset(self):
+        self._attempt = 0
+
+
+def classify(line):
+    """
+    Args:
+        line (str): an output line, without ANSI escapes
+
+    Returns:
+        error (PianobarError): the error it reports, or None if it is not
+        an error line
+    """
+    line = line.strip()
+    if line.startswith("/!\\"):
+        operation = None
+        text = line[3:].strip()
+    elif line.startswith("(i) ") and "Error" in line:
+        operation, _, text = line[4:].partition("...")
+        operation = operation.strip()
+        text = text.strip()
+    else:
+        return None
+    lowered = text.lower()
+    kind = next((kind for kind, needles in _PATTERNS
+                 if any(needle in lowered for needle in needles)), ERROR_UNKNOWN)
+    policy = _POLICIES.get(kind)
+    if kind != ERROR_AUTH and operation is not None and not operation.startswith(_PLAYBACK_OPERATIONS):
+        policy = None
+    return PianobarError(kind, line, operation, policy)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+A stand in for pianobar which prints the same kind of output, station,
+song and time update lines, as fast as asked, and answers the s, u, i,
+p, + and q commands on $XDG_CONFIG_HOME/pianobar/ctl. Used by the soak test.
+
+    FAKE_PIANOBAR_SONGS_PER_SECOND  songs per second, default 200
+    FAKE_PIANOBAR_TIME_UPDATES      time update lines per song, default 5
+"""
+import itertools
+import os
+import sys
+import threading
+import time
+
+_STATIONS = ["Ambient Radio", "Blues Radio", "Café del Mar Radio", "Jazz Radio", "Zydeco Radio"]
+
+_lock = threading.Lock()
+_quit = threading.Event()
+_song = 0  # the song playing
+
+
+def _out(line):
+    with _lock:
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+
+def _song_line(song):
+    station = _STATIONS[song // 50 % len(_STATIONS)]
+    loved = " <3" if song % 7 == 0 else ""
+    return f'\x1b[2K|>  "Song {song}" by "Artist {song % 97}" on "Album {song % 31}"{loved} @ {station}'
+
+
+def _read_commands(fifo_path):
+    """
+    Answer the commands the wrapper writes to the FIFO.
+    """
+    while not _quit.is_set():
+        with open(fifo_path) as fifo:
+            data = fifo.read()
+        for command in data:
+            if command == "q":
+                _quit.set()
+            elif command == "s":
+                for number, name in enumerate(_STATIONS):
+                    _out(f"\x1b[2K\t {number}) q   {name}")
+                _out("\x1b[2K[?] Select station: ")
+            elif command == "p":
+                # like pianobar after a pause, the song again
+                _out(_song_line(_song))
+            elif command == "+":
+                _out("\x1b[2K(i) Loving song... Ok.")
+            elif command == "i":
+                song, station = _song, _STATIONS[_song // 50 % len(_STATIONS)]
+                _out(f'\x1b[2K|>  Station "{station}" (1234567890)')
+                _out(_song_line(song))
+                _out(f"\x1b[2K\tbitrate:\t{128 if song % 2 else 192}")
+                _out(f"\x1b[2K\tdetailUrl:\thttps://www.pandora.com/artist/song-{song}")
+                _out(f"\x1b[2K\tseeds:\tArtist {song % 97}")
+            elif command == "u":
+                # the rest of a playlist of four songs
+                for number, song in enumerate(range(_song + 1, (_song // 4 + 1) * 4)):
+                    _out(f"\x1b[2K\t{number:2}) Artist {song % 97} - Song {song} (04:00)")
+                if _song % 4 == 3:
+                    _out("\x1b[2K(i) No songs in queue.")
+
+
+def main():
+    global _song
+    config_home = os.getenv("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    fifo_dir = os.path.join(config_home, "pianobar")
+    fifo_path = os.path.join(fifo_dir, "ctl")
+    os.makedirs(fifo_dir, exist_ok=True)
+    if not os.path.exists(fifo_path):
+        os.mkfifo(fifo_path)
+    threading.Thread(target=_read_commands, args=(fifo_path,), daemon=True).start()
+
+    songs_per_second = float(os.getenv("FAKE_PIANOBAR_SONGS_PER_SECOND", "200"))
+    time_updates = int(os.getenv("FAKE_PIANOBAR_TIME_UPDATES", "5"))
+    delay = 1 / (songs_per_second * (time_updates + 1))
+
+    _out("Welcome to pianobar (fake)!")
+    _out(f'\x1b[2K|>  Station "{_STATIONS[0]}" (1234567890)')
+    for count in itertools.count():
+        if _quit.is_set():
+            break
+        _song = count
+        if count % 4 == 0:
+            _out("\x1b[2K(i) Receiving new playlist... Ok.")
+        station = _STATIONS[count // 50 % len(_STATIONS)]
+        if count and count % 50 == 0:
+            _out(f'\x1b[2K|>  Station "{station}" (1234567890)')
+        _out(_song_line(count))
+        for second in range(time_updates):
+            time.sleep(delay)
+            _out(f"\x1b[2K#  -03:{59 - second:02d}/04:00")
+        time.sleep(delay)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+Memory soak test. Runs the mediator, pianobar reader, control API and now
+playing file (and the MainWindow with --gui) against fake_pianobar.py at
+an accelerated song rate, samples RSS and tracemalloc as the events go
+by, and fails when memory keeps growing once the caches are full:
+
+    python3 -m soak.soak --events 2000000 --max-slope 64
+"""
+from constants.constants import (
+    CONCRETE_MEDIATOR,
+    KEY_LISTENER,
+    MEDIA_NEXT,
+    QUIT,
+    VOLUME_DOWN,
+    VOLUME_UP
+)
+from memory_report.memory_report import format_top, read_rss_kb
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+FAKE_PIANOBAR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_pianobar.py")
+
+# the harness's own bookkeeping is not what we are measuring
+_EXCLUDE = (
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "*/memory_report/memory_report.py"),
+)
+
+
+def _slope(points):
+    """
+    Args:
+        points (List[Tuple[float, float]]): (x, y) samples
+
+    Returns:
+        (float) the least squares slope of y over x
+    """
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if not var_x:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+
+
+def _cache_sizes(mediator):
+    """
+    Returns:
+        (List[Tuple[int, int]]): (entries, capacity) of each bounded cache
+        which fills as the soak runs
+    """
+    from tracing.tracing import TRACER
+
+    sizes = [(len(TRACER._finished), TRACER._finished.maxlen)]
+    for pianobar in mediator._sessions.values():
+        sizes.append((len(pianobar._output_buffer), pianobar._output_buffer.maxlen))
+        sizes.append((len(pianobar._info_cache), pianobar._info_cache._max_songs))
+    return sizes
+
+
+def _soak_mediator_class():
+    # imported late, the mediator pulls in Tk, PIL and pystray
+    from mediator.concrete_mediator import ConcreteMediator
+
+    class SoakMediator(ConcreteMediator):
+        """
+        The ConcreteMediator without the tray and key listener, counting
+        every event it routes.
+        """
+
+        events = 0
+
+        def __init__(self, gui, **kwargs):
+            super().__init__(**kwargs)
+            self._gui = gui
+
+        def notify(self, sender, event, event2):
+            self.events += 1
+            return super().notify(sender, event, event2)
+
+        def start(self):
+            self._start_sessions()
+            self._start_control_api()
+            self._start_now_playing()
+
+        def stop(self):
+            self._notify_observers(QUIT, None)
+            self._stop_sessions()
+
+        def _handle_events_main_window(self, event, event2):
+            if event == QUIT:
+                return  # the soak decides when to stop
+            super()._handle_events_main_window(event, event2)
+
+    return SoakMediator
+
+
+class Soak:
+    """
+    Drives the stack and samples its memory.
+    """
+
+    def __init__(self, args):
+        self._args = args
+        self._done = threading.Event()
+        self._final = None
+        self._samples = []  # (events, rss kB, traced bytes, after warm up)
+        self._warm = None
+
+    def run(self):
+        """
+        Returns:
+            (int) the exit code, 1 if memory grew faster than allowed
+        """
+        args = self._args
+        work_dir = tempfile.mkdtemp(prefix="pianobar-soak-")
+        # keep the socket, now playing file and FIFO away from a real instance
+        os.environ["XDG_RUNTIME_DIR"] = work_dir
+        os.environ["FAKE_PIANOBAR_SONGS_PER_SECOND"] = str(args.songs_per_second)
+        os.environ["FAKE_PIANOBAR_TIME_UPDATES"] = str(args.time_updates)
+        # the soak runs no tray, and pystray opens the X display on import
+        os.environ.setdefault("PYSTRAY_BACKEND", "dummy")
+        tracemalloc.start(args.frames)
+
+        mediator = _soak_mediator_class()(
+            gui=args.gui, app_icon="smile.png", app_name="Pianobar Soak", theme="darkly",
+            sessions={"soak": os.path.join(work_dir, "config")},
+            pianobar_binary=FAKE_PIANOBAR)
+        mediator.start()
+        threading.Thread(target=self._drive, args=(mediator,), daemon=True).start()
+        if args.gui:
+            # the Tk main loop must own the main thread, sample from another
+            threading.Thread(target=self._sample, args=(mediator,), daemon=True).start()
+            mediator._start_main_window()
+        else:
+            self._sample(mediator)
+        mediator.stop()
+        return self._verdict()
+
+    def _drive(self, mediator):
+        """
+        Press Next and turn the volume now and then, so commands, traces
+        and the batched volume writes are soaked too.
+        """
+        up = True
+        while not self._done.wait(self._args.next_every):
+            mediator.notify(KEY_LISTENER, MEDIA_NEXT, event2=None)
+            # a few notches of the scroll wheel, up then down next time
+            for _ in range(3):
+                mediator.notify(KEY_LISTENER, VOLUME_UP if up else VOLUME_DOWN, event2=None)
+            up = not up
+
+    def _sample(self, mediator):
+        """
+        Sample memory until enough events went by.
+        """
+        args = self._args
+        warm = None
+        sizes = None
+        while mediator.events < args.events:
+            time.sleep(args.interval)
+            events = mediator.events
+            rss = read_rss_kb()
+            snapshot = tracemalloc.take_snapshot().filter_traces(_EXCLUDE)
+            traced = sum(stat.size for stat in snapshot.statistics("filename"))
+            # warm once every cache is full, or holds all it is going to
+            previous, sizes = sizes, _cache_sizes(mediator)
+            filled = previous is not None and all(
+                size == capacity or size == old for (size, capacity), (old, _) in zip(sizes, previous))
+            if warm is None and filled and events >= args.events * args.warmup:
+                warm = snapshot
+                print(f"warmed up after {events} events", flush=True)
+            self._samples.append((events, rss, traced, warm is not None))
+            print(f"events {events:>10}  rss {rss:>8} kB  traced {traced // 1024:>8} kB", flush=True)
+        self._final = tracemalloc.take_snapshot().filter_traces(_EXCLUDE)
+        self._warm = warm
+        self._done.set()
+        if args.gui:
+            # ends the main loop, SoakMediator ignores the QUIT it sends
+            mediator._main_window.notify(CONCRETE_MEDIATOR, QUIT, event2=None)
+
+    def _verdict(self):
+        args = self._args
+        measured = [(events, rss, traced) for events, rss, traced, warm in self._samples if warm]
+        if len(measured) < 3:
+            print("soak: too few samples after the warm up, raise --events", file=sys.stderr)
+            return 1
+        # bytes per 1000 events
+        traced_slope = _slope([(e / 1000, t) for e, _, t in measured])
+        rss_slope = _slope([(e / 1000, r * 1024) for e, r, _ in measured if r is not None])
+        print(f"\nslope: traced {traced_slope:.1f} B/kevent, rss {rss_slope:.1f} B/kevent "
+              f"(limit {args.max_slope} B/kevent)")
+        if self._warm is not None:
+            print("\ntop growth since the warm up:")
+            for line in format_top(self._final, self._warm, args.top):
+                print(f"  {line}")
+        if traced_slope > args.max_slope:
+            print("soak: FAIL, traced memory keeps growing", file=sys.stderr)
+            return 1
+        if args.max_rss_slope is not None and rss_slope > args.max_rss_slope:
+            print("soak: FAIL, rss keeps growing", file=sys.stderr)
+            return 1
+        print("soak: ok")
+        return 0
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Soak the wrapper against a fake pianobar and fail when "
+                    "memory keeps growing.")
+    parser.add_argument("--events", type=int, default=1000000,
+                        help="mediator events to run for (default: %(default)s)")
+    parser.add_argument("--songs-per-second", type=float, default=200,
+                        help="fake pianobar song rate (default: %(default)s)")
+    parser.add_argument("--time-updates", type=int, default=5,
+                        help="time update lines per song (default: %(default)s)")
+    parser.add_argument("--next-every", type=float, default=0.5,
+                        help="seconds between Next presses (default: %(default)s)")
+    parser.add_argument("--interval", type=float, default=2.0,
+                        help="seconds between samples (default: %(default)s)")
+    parser.add_argument("--warmup", type=float, default=0.0,
+                        help="share of the events ignored for the slope at least, on top of "
+                             "those until the caches are full (default: %(default)s)")
+    parser.add_argument("--max-slope", type=float, default=64.0,
+                        help="allowed traced growth in bytes per 1000 events (default: %(default)s)")
+    parser.add_argument("--max-rss-slope", type=float, default=None,
+                        help="allowed RSS growth in bytes per 1000 events, off by default "
+                             "as the allocator holds on to freed pages")
+    parser.add_argument("--frames", type=int, default=10,
+                        help="tracemalloc frames per allocation (default: %(default)s)")
+    parser.add_argument("--top", type=int, default=15,
+                        help="allocation sites to list (default: %(default)s)")
+    parser.add_argument("--gui", action="store_true",
+                        help="run the MainWindow too, needs a display")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(Soak(_parse_args(sys.argv[1:])).run())
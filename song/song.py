@@ -18,20 +18,64 @@ python-pianobar-wrapper:
     You should have received a copy of the GNU General Public License
     along with this program.  If not, see <https://www.gnu.org/licenses/>
 """
+import sys
 
 
 class Song:
-    album = None
-    artist = None
-    favorite = False
-    title = None
+    """
+    A song pianobar played, immutable so it can be shared between threads
+    and components. Songs compare and hash by value; 'identity' leaves out
+    the favorite flag, to tell a song line pianobar printed again from the
+    next song. Artist and album are interned, the same few repeat all day.
+    """
+
+    __slots__ = ("album", "artist", "favorite", "title", "_hash")
 
     def __init__(self,
                  album,
                  artist,
                  favorite,
                  title):
-        self.album = album
-        self.artist = artist
-        self.favorite = favorite
-        self.title = title
+        setattr_ = object.__setattr__
+        setattr_(self, "album", sys.intern(album) if isinstance(album, str) else album)
+        setattr_(self, "artist", sys.intern(artist) if isinstance(artist, str) else artist)
+        setattr_(self, "favorite", favorite)
+        setattr_(self, "title", title)
+        setattr_(self, "_hash", hash((album, artist, favorite, title)))
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Song is immutable, cannot delete '{name}'")
+
+    def __eq__(self, other):
+        if not isinstance(other, Song):
+            return NotImplemented
+        return (self._hash == other._hash and self.title == other.title and self.artist == other.artist
+                and self.album == other.album and self.favorite == other.favorite)
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return (f"Song(album={self.album!r}, artist={self.artist!r}, "
+                f"favorite={self.favorite!r}, title={self.title!r})")
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Song is immutable, cannot set '{name}'")
+
+    @property
+    def identity(self):
+        """
+        Returns:
+            (Tuple[str, str, str]) title, artist and album
+        """
+        return self.title, self.artist, self.album
+
+    def replace(self, **changes):
+        """
+        Returns:
+            song (Song): a copy with the given fields changed, e.g.
+            song.replace(favorite=True)
+        """
+        fields = {"album": self.album, "artist": self.artist, "favorite": self.favorite, "title": self.title}
+        fields.update(changes)
+        return Song(**fields)
@@ -0,0 +1,174 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+The details pianobar prints for a song on its 'i' command, such as the
+station, its seeds, the bitrate and the detail URL, and a bounded least
+recently used cache of them keyed by song, so a details view does not
+wait on pianobar.
+"""
+from collections import OrderedDict
+from loved_songs.loved_songs import song_key
+from metrics.metrics import REGISTRY
+import re
+import threading
+
+_LOOKUPS = REGISTRY.counter(
+    "pianobar_wrapper_song_info_cache_lookups_total",
+    "Song info cache lookups, by result", ("session", "result"))
+
+
+class SongInfo:
+    """
+    What pianobar printed about one song.
+    """
+
+    __slots__ = ("album", "artist", "detail_url", "fields", "loved", "station", "station_id", "title")
+
+    _field_pattern = re.compile(r'^([A-Za-z][\w ]*?):\s*(\S.*)$')
+    _station_pattern = re.compile(r'^\|>  Station "(.+)" \((\d+)\)$')
+    _url_pattern = re.compile(r'^https?://\S+$')
+
+    def __init__(self, song):
+        """
+        Args:
+            song (Song): the song asked about
+        """
+        self.album = song.album
+        self.artist = song.artist
+        self.detail_url = None
+        self.fields = {}  # e.g. "bitrate" => "128", in the order printed
+        self.loved = song.favorite
+        self.station = None
+        self.station_id = None
+        self.title = song.title
+
+    @property
+    def is_empty(self):
+        return self.station is None and self.detail_url is None and not self.fields
+
+    def add_line(self, line):
+        """
+        Args:
+            line (str): an output line, without ANSI escapes and tabs
+
+        Returns:
+            (bool) True if the line was part of the details
+        """
+        text = line.strip()
+        match = self._station_pattern.match(text)
+        if match is not None:
+            # the station comes first, a later one is a station change
+            if not self.is_empty:
+                return False
+            self.station, self.station_id = match.group(1), match.group(2)
+            return True
+        if self._url_pattern.match(text):
+            self.detail_url = text
+            return True
+        match = self._field_pattern.match(text)
+        if match is None:
+            return False
+        name, value = match.group(1).strip(), match.group(2).strip()
+        if name.casefold() in ("detailurl", "detail url"):
+            self.detail_url = value
+        else:
+            self.fields[name] = value
+        return True
+
+    def to_dict(self):
+        return {"album": self.album, "artist": self.artist, "detail_url": self.detail_url,
+                "fields": dict(self.fields), "loved": self.loved, "station": self.station,
+                "station_id": self.station_id, "title": self.title}
+
+
+def info_key(song):
+    """
+    Returns:
+        key (int): the cache key of a song, see song_key
+    """
+    return song_key(song.artist, song.title, song.album)
+
+
+class SongInfoCache:
+    """
+    The details of the most recently used songs, the least recently used
+    is dropped once 'max_songs' are kept.
+    """
+
+    _entries = None
+    _hits = None
+    _lock = None
+    _max_songs = None
+    _misses = None
+
+    def __init__(self, max_songs=256, session_id=""):
+        """
+        Args:
+            max_songs (int): how many songs to keep the details of
+            session_id (str): labels the hit and miss counters
+        """
+        self._entries = OrderedDict()
+        self._hits = _LOOKUPS.labels(session_id, "hit")
+        self._lock = threading.Lock()
+        self._max_songs = max_songs
+        self._misses = _LOOKUPS.labels(session_id, "miss")
+
+    def __contains__(self, key):
+        return self.peek(key) is not None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Args:
+            key (int): see info_key
+
+        Returns:
+            info (SongInfo): the details, or None if they are not cached
+        """
+        with self._lock:
+            info = self._entries.get(key)
+            if info is not None:
+                self._entries.move_to_end(key)
+        if info is None:
+            self._misses.inc()
+        else:
+            self._hits.inc()
+        return info
+
+    def peek(self, key):
+        """
+        Like get, without counting a lookup or making the song recent.
+        """
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key, info):
+        """
+        Args:
+            key (int): see info_key
+            info (SongInfo): the details of the song
+        """
+        with self._lock:
+            self._entries[key] = info
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_songs:
+                self._entries.popitem(last=False)
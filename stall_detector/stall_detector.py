@@ -0,0 +1,182 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+Watches pianobar's "#  -mm:ss/mm:ss" time updates against the wall clock.
+A counter which stops moving while the lines keep coming is a stall, no
+lines at all for a while is a gap, and a counter which moves much further
+or backwards than the time that passed is a jump. Pauses are not stalls.
+"""
+from constants.constants import STALL_FROZEN, STALL_GAP, STALL_JUMP
+from metrics.metrics import REGISTRY
+
+_STALLS = REGISTRY.counter(
+    "pianobar_wrapper_playback_stalls_total",
+    "Playback stalls, gaps and jumps seen in pianobar's time updates", ("session", "kind"))
+_STALL_SECONDS = REGISTRY.histogram(
+    "pianobar_wrapper_playback_stall_seconds",
+    "How long playback stalled before the time updates moved again", ("session",),
+    buckets=(5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0))
+
+
+class Stall:
+    """
+    One stall, gap or jump.
+    """
+
+    __slots__ = ("kind", "position", "prolonged", "seconds")
+
+    def __init__(self, kind, seconds, position, prolonged=False):
+        """
+        Args:
+            kind (str): STALL_FROZEN, STALL_GAP or STALL_JUMP
+            seconds (float): how long it stalled so far, or how far the
+            counter jumped beyond the time that passed
+            position (int): the song position in seconds when it happened,
+            None before the first time update of the song
+            prolonged (bool): True once a stall outlasted 'prolonged_after'
+        """
+        self.kind = kind
+        self.position = position
+        self.prolonged = prolonged
+        self.seconds = seconds
+
+    def to_dict(self):
+        return {"kind": self.kind, "position": self.position,
+                "prolonged": self.prolonged, "seconds": round(self.seconds, 1)}
+
+
+class StallDetector:
+    """
+    Fed by the reader thread with every time update and checked about once
+    a second; both must be called with the same lock held.
+    """
+
+    _active = False
+    _gap_after = None
+    _jump_after = None
+    _last_line = None  # time.monotonic() of the last time update
+    _last_progress = None  # time.monotonic() the position last moved
+    _paused = False
+    _position = None
+    _prolonged = False
+    _prolonged_after = None
+    _reported = None  # the kind of the stall going on, once reported
+    _stall_after = None
+    _stall_seconds = None
+    _stalls = None
+
+    def __init__(self, session_id="", stall_after=5.0, gap_after=5.0, jump_after=3.0,
+                 prolonged_after=30.0):
+        """
+        Args:
+            session_id (str): labels the counters
+            stall_after (float): seconds the counter may stand still
+            gap_after (float): seconds without any time update
+            jump_after (float): seconds the counter may run ahead of the clock
+            prolonged_after (float): seconds after which a stall is reported
+            again as prolonged, for a soft recovery
+        """
+        self._gap_after = gap_after
+        self._jump_after = jump_after
+        self._prolonged_after = prolonged_after
+        self._stall_after = stall_after
+        self._stall_seconds = _STALL_SECONDS.labels(session_id)
+        self._stalls = {kind: _STALLS.labels(session_id, kind)
+                        for kind in (STALL_FROZEN, STALL_GAP, STALL_JUMP)}
+
+    def check(self, now):
+        """
+        Args:
+            now (float): time.monotonic()
+
+        Returns:
+            stall (Stall): a stall or gap which just passed a threshold,
+            or None
+        """
+        if not self._active or self._paused:
+            return None
+        silent = now - self._last_line
+        frozen = now - self._last_progress
+        if silent >= self._gap_after:
+            kind, seconds = STALL_GAP, silent
+        elif self._position is not None and frozen >= self._stall_after:
+            kind, seconds = STALL_FROZEN, frozen
+        else:
+            return None
+        if self._reported is None:
+            self._reported = kind
+            self._stalls[kind].inc()
+            return Stall(kind, seconds, self._position)
+        if not self._prolonged and frozen >= self._prolonged_after:
+            self._prolonged = True
+            return Stall(kind, frozen, self._position, prolonged=True)
+        return None
+
+    def pause(self, paused, now):
+        """
+        Args:
+            paused (bool): True when playback was paused, False on resume
+            now (float): time.monotonic()
+        """
+        self._paused = paused
+        if not paused:
+            # the time paused is no stall
+            self._last_line = self._last_progress = now
+
+    def reset(self, now):
+        """
+        A new song started, watch it from 'now'.
+        """
+        self._active = True
+        self._last_line = self._last_progress = now
+        self._paused = False
+        self._position = None
+        self._prolonged = False
+        self._reported = None
+
+    def stop(self):
+        self._active = False
+
+    def tick(self, position, now):
+        """
+        Args:
+            position (int): the song position in seconds pianobar printed
+            now (float): time.monotonic()
+
+        Returns:
+            stall (Stall): a jump, or None
+        """
+        self._last_line = now
+        if self._position is None:
+            self._position, self._last_progress = position, now
+            return None
+        if position == self._position:
+            return None
+        advanced = position - self._position
+        elapsed = now - self._last_progress
+        if self._reported is not None:
+            self._stall_seconds.observe(elapsed)
+            self._prolonged = False
+            self._reported = None
+        self._position, self._last_progress = position, now
+        if advanced < 0 or advanced - elapsed > self._jump_after:
+            self._stalls[STALL_JUMP].inc()
+            return Stall(STALL_JUMP, advanced - elapsed, position)
+        return None
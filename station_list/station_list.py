@@ -0,0 +1,197 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+"""
+from constants.constants import STATION_LIST
+from typing import Dict, List, Optional, Set, Tuple
+import bisect
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class StationList:
+    """
+    A model of the stations shown in a Listbox, keyed by station name.
+
+    pianobar numbers its stations by their position in the list, so the
+    numbers shift whenever a station is added or removed; the name is the
+    stable identity. Refreshes only insert, remove or move the rows that
+    actually changed, and the selection follows its station.
+    """
+
+    _all_keys: List[str] = None
+    _filter = None
+    _keys: List[str] = None
+    _listbox = None
+    _numbers: Dict[str, int] = None
+
+    def __init__(self, listbox):
+        """
+        Args:
+            listbox (tkinter.Listbox): the listbox to keep in sync
+        """
+        self._all_keys = []
+        self._keys = []
+        self._listbox = listbox
+        self._numbers = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    @property
+    def keys(self) -> List[str]:
+        """
+        Returns:
+            keys (List[str]): every station key in pianobar's order,
+            including those hidden by the filter
+        """
+        return list(self._all_keys)
+
+    def get_number(self, index) -> Optional[int]:
+        """
+        Args:
+            index (int): a row in the listbox
+
+        Returns:
+            number (int): the pianobar station number of that row, or None
+        """
+        if 0 <= index < len(self._keys):
+            return self._numbers[self._keys[index]]
+        return None
+
+    def get_selected_number(self) -> Optional[int]:
+        """
+        Returns:
+            number (int): the pianobar station number of the selected row,
+            or None when nothing is selected
+        """
+        selected_indices = self._listbox.curselection()
+        if not selected_indices:
+            return None
+        return self.get_number(selected_indices[0])
+
+    def set_filter(self, keys: Optional[List[str]]):
+        """
+        Show only the given stations, in the given order.
+
+        Args:
+            keys (List[str]): station keys to show, or None to show all
+        """
+        self._filter = keys
+        self._sync()
+
+    def update(self, stations: List[Tuple[int, str]]):
+        """
+        Bring the listbox in line with the stations, touching only the rows
+        that changed.
+
+        Args:
+            stations (List[Tuple[int, str]]): (number, name) from pianobar
+        """
+        self._all_keys = self._make_keys(stations)
+        self._numbers = {key: number for key, (number, _) in zip(self._all_keys, stations)}
+        self._sync()
+
+    def _get_selected_key(self) -> Optional[str]:
+        selected_indices = self._listbox.curselection()
+        if not selected_indices or selected_indices[0] >= len(self._keys):
+            return None
+        return self._keys[selected_indices[0]]
+
+    def _sync(self):
+        """
+        Diff the rows shown against the rows wanted and apply only the
+        changes, keeping the selection on its station.
+        """
+        if self._filter is None:
+            new_keys = self._all_keys
+        else:
+            new_keys = [key for key in self._filter if key in self._numbers]
+        selected_key = self._get_selected_key()
+
+        inserted = removed = 0
+        wanted = set(new_keys)
+        # the longest run of rows already in the new order stays put, every
+        # other row is dropped and inserted again where it belongs
+        position = {key: index for index, key in enumerate(self._keys)}
+        kept = self._longest_increasing([position[key] for key in new_keys if key in position])
+        # bottom up so indices hold
+        for index in range(len(self._keys) - 1, -1, -1):
+            if index not in kept:
+                self._listbox.delete(index)
+                del self._keys[index]
+                removed += 1
+
+        for index, key in enumerate(new_keys):
+            if index < len(self._keys) and self._keys[index] == key:
+                continue
+            self._listbox.insert(index, key)
+            self._keys.insert(index, key)
+            inserted += 1
+
+        if selected_key is not None and selected_key in wanted:
+            index = self._keys.index(selected_key)
+            self._listbox.select_clear(0, "end")
+            self._listbox.select_set(index)
+            self._listbox.activate(index)
+        _logger.debug(f"{STATION_LIST}: showing {len(self._keys)} stations, "
+                      f"{inserted} rows inserted, {removed} rows removed")
+
+    @staticmethod
+    def _longest_increasing(values: List[int]) -> Set[int]:
+        """
+        Returns:
+            (Set[int]) the values of a longest strictly increasing
+            subsequence of values
+        """
+        tail_values = []  # the smallest last value of a run of each length
+        tails = []  # and its index in values
+        previous = [None] * len(values)
+        for index, value in enumerate(values):
+            length = bisect.bisect_left(tail_values, value)
+            if length:
+                previous[index] = tails[length - 1]
+            if length == len(tails):
+                tail_values.append(value)
+                tails.append(index)
+            else:
+                tail_values[length] = value
+                tails[length] = index
+        run = set()
+        index = tails[-1] if tails else None
+        while index is not None:
+            run.add(values[index])
+            index = previous[index]
+        return run
+
+    @staticmethod
+    def _make_keys(stations: List[Tuple[int, str]]) -> List[str]:
+        """
+        Returns:
+            keys (List[str]): one unique key per station, the station name
+            with a counter appended should an account repeat a name
+        """
+        keys = []
+        seen = {}
+        for _, name in stations:
+            count = seen.get(name, 0)
+            seen[name] = count + 1
+            keys.append(name if count == 0 else f"{name} ({count + 1})")
+        return keys
@@ -0,0 +1,125 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+Benchmark of the type-ahead station search at a given number of
+stations: times rebuilding the index and every keystroke of a few
+queries, against a plain scan of the folded names:
+
+    python3 -m station_search.bench --stations 1000 10000
+"""
+from station_search.station_search import StationSearchIndex
+import argparse
+import random
+import re
+import sys
+import time
+
+_WORDS = ("blue", "night", "river", "fire", "love", "train", "moon", "heart", "road", "rain",
+          "gold", "city", "dream", "stone", "summer", "ghost", "wild", "sweet", "dance", "home",
+          "café", "señor", "über", "jazz", "rock", "radio", "classic", "hits", "chill", "country")
+_QUERIES = ("summer hits", "cafe", "ROCK radio", "wild dream 42", "zzz")
+_word_split = re.compile(r"[^\w]+")
+
+
+def _timed(label, function, repeat):
+    """
+    Returns:
+        result: what the last call returned
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print(f"  {label:<40} median {timings[len(timings) // 2] * 1000:8.3f} ms  "
+          f"max {timings[-1] * 1000:8.3f} ms")
+    return result
+
+
+def _type(index, query):
+    """
+    Search every prefix of query, as the Entry does while it is typed.
+
+    Returns:
+        keys (List[str]): the matches for the whole query
+    """
+    index.search("")
+    matches = None
+    for end in range(1, len(query) + 1):
+        matches = index.search(query[:end])
+    return matches
+
+
+def _scan(names, query):
+    """
+    The search without an index: every name's words checked for every
+    keystroke.
+
+    Returns:
+        keys (List[str]): the matches for the whole query
+    """
+    matches = None
+    for end in range(1, len(query) + 1):
+        words = [w for w in _word_split.split(StationSearchIndex.normalize(query[:end])) if w]
+        matches = [key for key, tokens in names
+                   if all(any(t.startswith(w) for t in tokens) for w in words)]
+    return matches
+
+
+def run(args):
+    """
+    Returns:
+        (int) the exit code
+    """
+    rng = random.Random(args.seed)
+    for count in args.stations:
+        keys = [f"{' '.join(rng.sample(_WORDS, rng.randint(1, 3))).title()} {number} Radio"
+                for number in range(count)]
+        print(f"{count} stations:")
+        index = StationSearchIndex()
+        _timed("rebuild the index", lambda: index.rebuild(keys), args.repeat)
+        names = [(key, [t for t in _word_split.split(StationSearchIndex.normalize(key)) if t])
+                 for key in keys]
+        for query in _QUERIES:
+            matches = _timed(f"type {query!r}, {len(query)} keys", lambda: _type(index, query),
+                             args.repeat)
+            scanned = _timed(f"scan {query!r}, {len(query)} keys", lambda: _scan(names, query),
+                             args.repeat)
+            if set(matches) != set(scanned):
+                print(f"station_search.bench: {query!r} matched {len(matches)} stations, "
+                      f"the scan {len(scanned)}", file=sys.stderr)
+                return 1
+    return 0
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the type-ahead station search.")
+    parser.add_argument("--stations", type=int, nargs="+", default=[1000, 10000],
+                        help="station counts to try (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="runs of each measurement (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=1,
+                        help="seed of the generated names (default: %(default)s)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(run(_parse_args(sys.argv[1:])))
@@ -0,0 +1,133 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+"""
+from bisect import bisect_left
+from constants.constants import STATION_SEARCH
+from typing import Dict, List, Tuple
+import logging
+import re
+import unicodedata
+
+_logger = logging.getLogger(__name__)
+
+
+class StationSearchIndex:
+    """
+    A type-ahead index over station names.
+
+    Names are split into case and accent folded tokens kept in a sorted
+    list, so a query word is a prefix lookup with bisect. While the user
+    keeps typing, each keystroke only re-checks the stations that matched
+    the previous keystroke.
+    """
+
+    _keys: List[str] = None
+    _last_matches: List[str] = None
+    _last_query = None
+    _names: Dict[str, str] = None
+    _order: Dict[str, int] = None
+    _tokens: List[Tuple[str, int]] = None
+    _tokens_by_key: Dict[str, Tuple[str, ...]] = None
+    _word_split = re.compile(r"[^\w]+")
+
+    def __init__(self):
+        self.rebuild([])
+
+    def rebuild(self, keys: List[str]):
+        """
+        Args:
+            keys (List[str]): the station keys, in the order to show them
+        """
+        self._keys = list(keys)
+        self._last_matches = None
+        self._last_query = None
+        self._names = {}
+        self._order = {}
+        self._tokens = []
+        self._tokens_by_key = {}
+        for index, key in enumerate(self._keys):
+            name = self.normalize(key)
+            tokens = tuple(t for t in self._word_split.split(name) if t)
+            self._names[key] = name
+            self._order[key] = index
+            self._tokens_by_key[key] = tokens
+            self._tokens.extend((token, index) for token in set(tokens))
+        self._tokens.sort()
+        _logger.debug(f"{STATION_SEARCH}: indexed {len(self._keys)} stations, "
+                      f"{len(self._tokens)} tokens")
+
+    def search(self, query) -> List[str]:
+        """
+        Args:
+            query (str): what the user typed so far
+
+        Returns:
+            keys (List[str]): matching station keys, names starting with
+            the query first, then in station order
+        """
+        query = self.normalize(query)
+        words = [w for w in self._word_split.split(query) if w]
+        if not words:
+            self._last_matches = None
+            self._last_query = None
+            return list(self._keys)
+
+        if self._last_query is not None and query.startswith(self._last_query):
+            # typing on only ever narrows the result, skip the index
+            candidates = self._last_matches
+        else:
+            candidates = self._lookup(words[0])
+
+        matches = [key for key in candidates if self._matches(key, words)]
+        self._last_matches = matches
+        self._last_query = query
+        return sorted(matches,
+                      key=lambda k: (not self._names[k].startswith(query), self._order[k]))
+
+    @staticmethod
+    def normalize(text) -> str:
+        """
+        Returns:
+            text (str): lower cased text with the accents removed
+        """
+        decomposed = unicodedata.normalize("NFKD", text)
+        stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+        return stripped.casefold()
+
+    def _lookup(self, prefix) -> List[str]:
+        """
+        Returns:
+            keys (List[str]): stations with a token starting with prefix,
+            in station order
+        """
+        indices = set()
+        position = bisect_left(self._tokens, (prefix, -1))
+        while position < len(self._tokens) and self._tokens[position][0].startswith(prefix):
+            indices.add(self._tokens[position][1])
+            position += 1
+        return [self._keys[i] for i in sorted(indices)]
+
+    def _matches(self, key, words) -> bool:
+        """
+        Returns:
+            (bool) True if every query word is a prefix of a name token
+        """
+        tokens = self._tokens_by_key[key]
+        return all(any(t.startswith(w) for t in tokens) for w in words)
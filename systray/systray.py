@@ -19,20 +19,33 @@ python-pianobar-wrapper:
     along with this program.  If not, see <https://www.gnu.org/licenses/>
 """
 
-from PIL import Image
 from constants.constants import (
     CONCRETE_MEDIATOR,
+    ICON_PLAYING,
     QUIT,
+    SESSIONS,
+    SESSION_CHANGE_REQUESTED,
     SHOW,
     START,
-    SYSTRAY
+    SYSTRAY,
+    SYSTRAY_BACKOFF,
+    SYSTRAY_RUNNING,
+    SYSTRAY_STOPPED,
+    SYSTRAY_STOPPING,
+    TRAY_ICON,
+    VOLUME_DOWN,
+    VOLUME_RESET,
+    VOLUME_UP
 )
 from mediator.base_component import BaseComponent
 from pystray import MenuItem as item
 import logging
 import threading
+import time
 import pystray
 
+_logger = logging.getLogger(__name__)
+
 
 class Systray(BaseComponent):
     """
@@ -44,48 +57,103 @@ class Systray(BaseComponent):
     - Call in to this class using 'notify' method.
     """
 
+    _active_session = None
     _app_icon = None
     _app_name = None
-    _image = None
+    _assets = None
+    _backoff_initial = 1.0  # seconds
+    _backoff_max = 60.0  # seconds
+    _heart_icon = "heart.png"
+    _icon_size = None  # keep the app icon's own size
+    _icon_state = ICON_PLAYING
     _menu = None
+    _restart_count = 0
+    _state = SYSTRAY_STOPPED
+    _state_lock = None
+    _stop_event = None
     _systray = None
+    _thread = None
+    _tray_icons = None
     mediator = None
+    session_list = []
 
-    def __init__(self, app_icon, app_name):
+    def __init__(self, app_icon, app_name, assets):
         """
         Args:
         app_icon (str): the icon you want to see in your desktop OS
         app_name (str): the name of the app you want to see in OS notification's
+        assets (AssetCache): shared cache of decoded images
         """
         super().__init__()
         # by default, PIL is chatty.
         logging.getLogger('PIL').setLevel(logging.WARNING)
         self._app_icon = app_icon
         self._app_name = app_name
+        self._assets = assets
+        self._tray_icons = self._assets.get_tray_icons(self._app_icon,
+                                                       self._heart_icon,
+                                                       self._icon_size)
+        self._state_lock = threading.Lock()
+        self._stop_event = threading.Event()
         self._create_tray()
 
+    @property
+    def restart_count(self):
+        """
+        Returns: (int) how many times the tray backend has been restarted
+        """
+        return self._restart_count
+
+    @property
+    def state(self):
+        """
+        Returns: (str) one of the SYSTRAY_* lifecycle states
+        """
+        with self._state_lock:
+            return self._state
+
     def notify(self, sender, event, event2):
         """
         Consumers of this class should only communicate through here
         using the mediator design pattern.
         """
-        logging.debug(f"{SYSTRAY}: notify received event: {event}")
+        _logger.debug(f"{SYSTRAY}: notify received event: {event}")
         if sender == CONCRETE_MEDIATOR:
             if event == START:
                 # start the systray thread and put the icon in user's OS tray
                 self._start_systray()
+            elif event == SESSIONS:
+                self._active_session = event2
+                self._systray.update_menu()
+            elif event == TRAY_ICON:
+                self._set_icon(event2)
+
+    def _change_volume(self, event):
+        """
+        Tell ConcreteMediator to turn the volume up, down or reset it
+
+        Args:
+            event (str): VOLUME_UP, VOLUME_DOWN or VOLUME_RESET
+        """
+        _logger.debug(f"{SYSTRAY}: telling mediator {event}")
+        self.mediator.notify(SYSTRAY, event=event, event2=None)
 
     def _create_tray(self):
         """
         Build the Systray
         """
-        logging.debug(f"{SYSTRAY}: creating tray")
-        self._image = Image.open(self._app_icon)
+        _logger.debug(f"{SYSTRAY}: creating tray")
         self._menu = (
             item('Quit', self._quit_main_window),
-            item('Show', self._show_main_window))
+            item('Show', self._show_main_window),
+            item('Session', pystray.Menu(self._session_items),
+                 visible=lambda menu_item: len(self.session_list) > 1),
+            item('Volume', pystray.Menu(
+                item('Up', lambda: self._change_volume(VOLUME_UP)),
+                item('Down', lambda: self._change_volume(VOLUME_DOWN)),
+                item('Reset', lambda: self._change_volume(VOLUME_RESET)))))
         self._systray = pystray.Icon("name",
-                                     self._image,
+                                     self._tray_icons[self._icon_state],
                                      self._app_name,
                                      self._menu)
 
@@ -94,35 +162,104 @@ class Systray(BaseComponent):
         Tell's ConcreteMediator that we need to quit the MainWindow.
         Stop's the Systray from running.
         """
-        logging.debug(f"{SYSTRAY}: telling mediator to Quit!")
+        _logger.debug(f"{SYSTRAY}: telling mediator to Quit!")
+        # flag the stop first so the supervisor does not restart the icon
+        self._stop_event.set()
+        self._set_state(SYSTRAY_STOPPING)
         self.mediator.notify(SYSTRAY, event=QUIT, event2=None)
         self._systray.visible = False
         self._systray.stop()
-        logging.info("Goodbye from Systray!")
+        _logger.info("Goodbye from Systray!")
 
     def _run_systray(self):
         """
-        Runs the Systray continuously.
+        Runs the Systray until a Quit is requested, restarting the backend
+        with an exponential backoff whenever it returns or errors early.
+        """
+        _logger.debug(f"{SYSTRAY}: running the systray!")
+        backoff = self._backoff_initial
+        while not self._stop_event.is_set():
+            self._set_state(SYSTRAY_RUNNING)
+            started = time.monotonic()
+            try:
+                self._systray.run()
+            except Exception as e:
+                _logger.error(f"{SYSTRAY}: tray backend failed: {e}")
+            if self._stop_event.is_set():
+                break
+
+            # a backend that stayed up for a while earns a fresh backoff
+            if time.monotonic() - started >= self._backoff_max:
+                backoff = self._backoff_initial
+            self._restart_count += 1
+            self._set_state(SYSTRAY_BACKOFF)
+            _logger.warning(f"{SYSTRAY}: tray exited unexpectedly, restart "
+                            f"#{self._restart_count} in {backoff:.1f}s")
+            if self._stop_event.wait(backoff):
+                break
+            backoff = min(backoff * 2, self._backoff_max)
+            # an Icon can not be run twice, so build a fresh one
+            self._create_tray()
+        self._set_state(SYSTRAY_STOPPED)
+        _logger.debug(f"{SYSTRAY}: systray thread exiting")
+
+    def _session_items(self):
+        """
+        Returns: (Generator[MenuItem]) one radio item per pianobar session
+        """
+        for session_id in self.session_list:
+            yield item(session_id,
+                       lambda icon, menu_item: self._show_session(menu_item.text),
+                       checked=lambda menu_item: menu_item.text == self._active_session,
+                       radio=True)
+
+    def _set_icon(self, icon_state):
+        """
+        Swaps the tray icon to one of the pre-rendered variants.
+
+        Args:
+            icon_state (str): one of the ICON_* states
+        """
+        if icon_state == self._icon_state or icon_state not in self._tray_icons:
+            return
+        _logger.debug(f"{SYSTRAY}: setting tray icon to {icon_state}")
+        self._icon_state = icon_state
+        self._systray.icon = self._tray_icons[icon_state]
+
+    def _set_state(self, state):
+        """
+        Args:
+            state (str): one of the SYSTRAY_* lifecycle states
         """
-        logging.debug(f"{SYSTRAY}: running the systray!")
-        while True:
-            self._systray.run()
+        with self._state_lock:
+            self._state = state
 
     def _show_main_window(self):
         """
         Tell ConcreteMediator to show the MainWindow
         """
-        logging.debug(f"{SYSTRAY}: telling mediator to show MainWindow")
+        _logger.debug(f"{SYSTRAY}: telling mediator to show MainWindow")
         self.mediator.notify(SYSTRAY, event=SHOW, event2=None)
 
+    def _show_session(self, session_id):
+        """
+        Tell ConcreteMediator to switch to another pianobar session
+        """
+        _logger.debug(f"{SYSTRAY}: telling mediator to switch to session {session_id}")
+        self.mediator.notify(SYSTRAY, event=SESSION_CHANGE_REQUESTED, event2=session_id)
+
     def _start_systray(self):
         """
         Create a thread to run the Systray in
         """
-        logging.debug(f"{SYSTRAY}: starting systray thread")
-        thread = threading.Thread(
+        _logger.debug(f"{SYSTRAY}: starting systray thread")
+        if self._thread is not None and self._thread.is_alive():
+            _logger.debug(f"{SYSTRAY}: systray thread already running")
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
             daemon=True,
             target=lambda: self._run_systray()
         )
-        thread.start()
-        logging.debug(f"{SYSTRAY}: after call to start systray thread")
+        self._thread.start()
+        _logger.debug(f"{SYSTRAY}: after call to start systray thread")
@@ -0,0 +1,148 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+Check that the tray supervisor restarts a failing backend with a growing
+backoff and that a Quit stops it for good. Run it with pystray's dummy
+backend, or under a headless X server:
+
+    PYSTRAY_BACKEND=dummy python3 -m systray.verify
+    xvfb-run python3 -m systray.verify --failures 5
+"""
+from assets.assets import AssetCache
+from constants.constants import QUIT, SYSTRAY, SYSTRAY_BACKOFF, SYSTRAY_RUNNING, SYSTRAY_STOPPED
+from systray.systray import Systray
+import argparse
+import sys
+import time
+
+
+class _Mediator:
+    """
+    Stands in for ConcreteMediator and records what the tray sends it
+    """
+
+    def __init__(self):
+        self.events = []
+
+    def notify(self, sender, event, event2):
+        self.events.append((sender, event))
+
+
+class _FailingSystray(Systray):
+    """
+    A Systray whose backend fails the first few times it is run
+    """
+
+    _failures = 0
+    _run_starts = None
+
+    def __init__(self, failures, backoff_initial, backoff_max):
+        self._failures = failures
+        self._run_starts = []
+        self._backoff_initial = backoff_initial
+        self._backoff_max = backoff_max
+        super().__init__("smile.png", "python-pianobar-wrapper", AssetCache())
+
+    def _create_tray(self):
+        super()._create_tray()
+        run = self._systray.run
+
+        def failing_run(*args, **kwargs):
+            self._run_starts.append(time.monotonic())
+            if len(self._run_starts) <= self._failures:
+                raise RuntimeError("backend failure injected by systray.verify")
+            return run(*args, **kwargs)
+
+        self._systray.run = failing_run
+
+
+def _wait_for(predicate, timeout):
+    """
+    Returns: (bool) whether predicate() became true within timeout seconds
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def verify(args):
+    """
+    Returns:
+        (int) the exit code, 1 if the supervisor misbehaved
+    """
+    problems = []
+    tray = _FailingSystray(args.failures, args.backoff, args.backoff * 4)
+    tray.mediator = _Mediator()
+    seen = set()
+    tray._start_systray()
+    settle = args.backoff * 4 * (args.failures + 1) + 5
+    deadline = time.monotonic() + settle
+    while time.monotonic() < deadline:
+        seen.add(tray.state)
+        if tray.restart_count == args.failures and tray.state == SYSTRAY_RUNNING:
+            break
+        time.sleep(0.005)
+    if tray.restart_count != args.failures:
+        problems.append(f"{tray.restart_count} restarts after {args.failures} failures")
+    if SYSTRAY_BACKOFF not in seen:
+        problems.append("never in SYSTRAY_BACKOFF")
+
+    gaps = [b - a for a, b in zip(tray._run_starts, tray._run_starts[1:])]
+    for number, gap in enumerate(gaps):
+        expected = min(args.backoff * 2 ** number, args.backoff * 4)
+        if gap < expected * 0.9:
+            problems.append(f"restart #{number + 1} after {gap:.3f}s, wanted {expected:.3f}s")
+
+    # let the healthy backend run before quitting it
+    time.sleep(args.backoff * 2)
+    tray._quit_main_window()
+    if not _wait_for(lambda: tray.state == SYSTRAY_STOPPED, 5):
+        problems.append(f"state {tray.state} after Quit")
+    tray._thread.join(5)
+    if tray._thread.is_alive():
+        problems.append("systray thread still running after Quit")
+    restarts = tray.restart_count
+    time.sleep(args.backoff * 4)
+    if tray.restart_count != restarts:
+        problems.append("restarted after Quit")
+    if (SYSTRAY, QUIT) not in tray.mediator.events:
+        problems.append("Quit was not sent to the mediator")
+
+    for problem in problems:
+        print(f"verify: {problem}", file=sys.stderr)
+    if problems:
+        print("verify: FAIL", file=sys.stderr)
+        return 1
+    print(f"verify: ok, {tray.restart_count} restarts, gaps "
+          f"{', '.join(f'{gap:.3f}s' for gap in gaps)}, stopped on Quit")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check the tray supervisor's restarts, backoff and Quit.")
+    parser.add_argument("--failures", type=int, default=3,
+                        help="how many times the backend fails (default: %(default)s)")
+    parser.add_argument("--backoff", type=float, default=0.05,
+                        help="the first backoff in seconds (default: %(default)s)")
+    sys.exit(verify(parser.parse_args()))
@@ -0,0 +1,125 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+Benchmark of building the main window's widgets with and without the
+theme cache. Every launch runs in a fresh process, as Tk and
+ttkbootstrap's Style live for the whole process; it needs a display:
+
+    python3 -m theme_cache.bench --launches 10
+    xvfb-run python3 -m theme_cache.bench
+"""
+from theme_cache.theme_cache import ThemeCache
+from ttkbootstrap.constants import DARK, OUTLINE
+import argparse
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tkinter
+import ttkbootstrap as ttk
+
+
+def _build_window(theme, cache_dir):
+    """
+    Create the window and the widgets MainWindow uses, with the same styles.
+
+    Returns:
+        (float) the seconds it took
+    """
+    started = time.perf_counter()
+    cache = ThemeCache(theme, cache_dir) if cache_dir else None
+    window = cache.create_window() if cache else ttk.Window(themename=theme)
+    ttk.Style().configure("TButton", relief="flat", background="#222222")
+    frame = ttk.Frame(window)
+    frame.pack()
+    ttk.Label(frame, text="Song", wraplength=300).pack()
+    for text in ("Album", "Artist", "Station", "Up next", "Vol"):
+        ttk.Label(window, text=text, wraplength=400).pack()
+    ttk.Combobox(window, state="readonly", values=["default"]).pack()
+    ttk.Entry(window).pack()
+    listbox_frame = ttk.Frame(window)
+    listbox_frame.pack()
+    ttk.Scrollbar(listbox_frame, orient="vertical").pack(side="right")
+    tkinter.Listbox(listbox_frame).pack(side="left")
+    for text in ("Change", "Next", "Play/Pause"):
+        ttk.Button(window, text=text, bootstyle=(DARK, OUTLINE)).pack()
+    window.update_idletasks()
+    elapsed = time.perf_counter() - started
+    if cache:
+        cache.save()
+    window.destroy()
+    return elapsed
+
+
+def _launch(theme, cache_dir):
+    """
+    Returns:
+        (float) the seconds a fresh process took to build the window
+    """
+    command = [sys.executable, "-m", "theme_cache.bench", "--theme", theme, "--child"]
+    if cache_dir:
+        command += ["--cache-dir", cache_dir]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return float(output.split()[-1])
+
+
+def _report(label, timings):
+    timings = sorted(timings)
+    print(f"  {label:<30} median {timings[len(timings) // 2] * 1000:8.1f} ms  "
+          f"max {timings[-1] * 1000:8.1f} ms  ({len(timings)} launches)")
+
+
+def run(args):
+    """
+    Returns:
+        (int) the exit code
+    """
+    if args.child:
+        print(f"{_build_window(args.theme, args.cache_dir):.6f}")
+        return 0
+
+    print(f"building the {args.theme} window in fresh processes:")
+    _report("no theme cache", [_launch(args.theme, None) for _ in range(args.launches)])
+    cold = []
+    warm = []
+    for _ in range(args.launches):
+        cache_dir = tempfile.mkdtemp(prefix="pianobar-themes-")
+        cold.append(_launch(args.theme, cache_dir))
+        warm.append(_launch(args.theme, cache_dir))
+        shutil.rmtree(cache_dir)
+    _report("cold theme cache", cold)
+    _report("warm theme cache", warm)
+    return 0
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the ttkbootstrap theme cache.")
+    parser.add_argument("--theme", default="darkly",
+                        help="the ttkbootstrap theme (default: %(default)s)")
+    parser.add_argument("--launches", type=int, default=10,
+                        help="launches of each kind (default: %(default)s)")
+    parser.add_argument("--cache-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(run(_parse_args(sys.argv[1:])))
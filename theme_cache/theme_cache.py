@@ -0,0 +1,246 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+"""
+from constants.constants import THEME_CACHE
+from importlib import metadata
+from theme_cache import ttkbootstrap_internals
+from theme_cache.ttkbootstrap_internals import RecordingStyle
+from tkinter import ttk as tk_ttk
+from ttkbootstrap.style import Style
+import json
+import logging
+import os
+import tkinter
+import ttkbootstrap as ttk
+
+_logger = logging.getLogger(__name__)
+
+
+class ThemeCache:
+    """
+    Caches the ttk styles and element images ttkbootstrap generates for a
+    theme on disk, keyed by theme, ttkbootstrap version and Tk scaling.
+    The cache relies on ttkbootstrap internals, so it is only used with the
+    ttkbootstrap version they were written against, other versions build
+    the theme uncached; see ttkbootstrap_internals.
+
+    Users of this class should only:
+    - Instantiate
+    - Create the window with 'create_window'
+    - Call 'save' once the UI has been built
+    """
+
+    _cache_dir = None
+    _cache_path = None
+    _images = None
+    _is_warm = False
+    _recording = None
+    _style = None
+    _theme = None
+
+    def __init__(self, theme, cache_dir=None):
+        """
+        Args:
+            theme (str): the ttkbootstrap theme for the application
+            cache_dir (str): directory for the cache files, defaults to
+            $XDG_CACHE_HOME/python-pianobar-wrapper/themes
+        """
+        if cache_dir is None:
+            cache_home = os.getenv("XDG_CACHE_HOME") or os.path.join(
+                os.path.expanduser("~"), ".cache")
+            cache_dir = os.path.join(cache_home, "python-pianobar-wrapper", "themes")
+        self._cache_dir = cache_dir
+        self._images = []
+        self._theme = theme
+
+    @property
+    def is_warm(self):
+        """
+        Returns: (bool) True if the theme was loaded from the cache
+        """
+        return self._is_warm
+
+    def create_window(self):
+        """
+        Create the ttkbootstrap Window, loading the theme from the cache
+        when one exists, else recording the theme as it is built.
+
+        Returns:
+            window (ttk.Window): the application root window
+        """
+        if not ttkbootstrap_internals.is_supported():
+            _logger.debug(f"{THEME_CACHE}: not caching, ttkbootstrap is not version "
+                          f"{ttkbootstrap_internals.TTKBOOTSTRAP_VERSION}")
+            return ttk.Window(themename=self._theme)
+        with ttkbootstrap_internals.style_factory(self._create_style):
+            return ttk.Window(themename=self._theme)
+
+    def save(self):
+        """
+        Write the recorded theme to disk, does nothing on a warm start.
+        """
+        if self._recording is None:
+            return
+        recording, self._recording = self._recording, None
+        RecordingStyle.recording = None
+        try:
+            data = self._serialize(recording)
+            os.makedirs(self._cache_dir, exist_ok=True)
+            tmp_path = self._cache_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self._cache_path)
+            _logger.debug(f"{THEME_CACHE}: saved {len(data['ops'])} ops and "
+                          f"{len(data['images'])} images to {self._cache_path}")
+        except (OSError, tkinter.TclError, TypeError, ValueError) as e:
+            _logger.warning(f"{THEME_CACHE}: could not save theme cache: {e}")
+
+    def _create_style(self, root, themename):
+        """
+        Stands in for ttkbootstrap's Style while the Window is created, the
+        Tk root exists at this point but the theme has not been built.
+        """
+        self._cache_path = os.path.join(self._cache_dir, self._cache_key(root) + ".json")
+        data = self._load()
+        if data is not None:
+            try:
+                self._replay(root, data)
+            except (tkinter.TclError, KeyError, IndexError, TypeError, ValueError) as e:
+                _logger.warning(f"{THEME_CACHE}: discarding bad theme cache: {e}")
+                self._remove()
+            else:
+                style = Style(themename)
+                registered = [args[0] for op, args, kw in data["ops"] if op == "register"]
+                ttkbootstrap_internals.mark_styles_built(style, themename, registered)
+                self._is_warm = True
+                self._style = style
+                _logger.debug(f"{THEME_CACHE}: loaded {themename} from {self._cache_path}")
+                return style
+
+        _logger.debug(f"{THEME_CACHE}: building and recording {themename}")
+        self._recording = []
+        RecordingStyle.recording = self._recording
+        self._style = RecordingStyle(themename)
+        return self._style
+
+    def _cache_key(self, root):
+        """
+        Returns: (str) a file name unique to the theme, ttkbootstrap version
+        and scaling, as the element images are rendered for that scaling
+        """
+        try:
+            version = metadata.version("ttkbootstrap")
+        except metadata.PackageNotFoundError:
+            version = "unknown"
+        scaling = float(root.tk.call("tk", "scaling"))
+        return f"{self._theme}-{version}-{scaling:.3f}"
+
+    def _load(self):
+        """
+        Returns: (dict) the cached theme, or None if there is no usable cache
+        """
+        try:
+            with open(self._cache_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            _logger.warning(f"{THEME_CACHE}: could not read theme cache: {e}")
+            self._remove()
+            return None
+        if not isinstance(data, dict) or "ops" not in data or "images" not in data:
+            self._remove()
+            return None
+        return data
+
+    def _remove(self):
+        try:
+            os.remove(self._cache_path)
+        except OSError:
+            pass
+
+    def _replay(self, root, data):
+        """
+        Recreate the images and re-run the recorded style calls.
+        """
+        for index, png in enumerate(data["images"]):
+            self._images.append(tkinter.PhotoImage(master=root,
+                                                   name=f"theme_cache_{self._theme}_{index}",
+                                                   data=png,
+                                                   format="png"))
+        style = tk_ttk.Style(root)
+        for op, args, kw in data["ops"]:
+            args = [self._decode(a) for a in args]
+            kw = {k: self._decode(v) for k, v in kw.items()}
+            if op == "theme_create":
+                style.theme_create(*args)
+                style.theme_use(args[0])
+            elif op == "configure":
+                style.configure(*args, **kw)
+            elif op == "element_create":
+                style.element_create(*args, **kw)
+            elif op == "layout":
+                style.layout(*args)
+            elif op == "map":
+                style.map(*args, **kw)
+
+    def _decode(self, value):
+        """
+        Turn a cached JSON value back into what ttk expects, with image
+        references pointing at the replayed images.
+        """
+        if isinstance(value, dict):
+            if "__image__" in value:
+                return self._images[value["__image__"]]
+            return {k: self._decode(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return tuple(self._decode(v) for v in value)
+        return value
+
+    def _serialize(self, recording):
+        """
+        Returns: (dict) the recording in a JSON friendly form, with every
+        image referenced by the styles exported as PNG data
+        """
+        root = self._style.master
+        image_names = set(root.tk.splitlist(root.tk.call("image", "names")))
+        image_index = {}
+        images = []
+
+        def encode(value):
+            if isinstance(value, (list, tuple)):
+                return [encode(v) for v in value]
+            if isinstance(value, dict):
+                return {k: encode(v) for k, v in value.items()}
+            if isinstance(value, (bool, int, float)) or value is None:
+                return value
+            name = str(value)
+            if name in image_names:
+                if name not in image_index:
+                    image_index[name] = len(images)
+                    png = root.tk.call(name, "data", "-format", "png")
+                    if isinstance(png, bytes):
+                        png = png.decode("ascii")
+                    images.append(png)
+                return {"__image__": image_index[name]}
+            return name
+
+        ops = [(op, encode(args), encode(kw)) for op, args, kw in recording]
+        return {"images": images, "ops": ops}
@@ -0,0 +1,130 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+The parts of ThemeCache that reach into ttkbootstrap's private Style
+state. They were written against ttkbootstrap TTKBOOTSTRAP_VERSION; with
+any other version ThemeCache leaves ttkbootstrap alone and builds the
+theme the normal way, uncached.
+"""
+from contextlib import contextmanager
+from importlib import metadata
+from ttkbootstrap.style import Style, StyleBuilderTTK
+import tkinter
+import ttkbootstrap.window as ttk_window
+
+TTKBOOTSTRAP_VERSION = "1.10.1"
+
+
+class RecordingStyle(Style):
+    """
+    A ttkbootstrap Style which records every call the style builders make
+    so they can be replayed on a later launch without rebuilding.
+    """
+
+    recording = None
+
+    def _build_configure(self, style, **kw):
+        self._record("configure", [style], kw)
+        super()._build_configure(style, **kw)
+
+    def _register_ttkstyle(self, ttkstyle):
+        self._record("register", [ttkstyle], {})
+        super()._register_ttkstyle(ttkstyle)
+
+    def configure(self, style, query_opt=None, **kw):
+        if query_opt is None and kw:
+            self._record("configure", [style], kw)
+        return super().configure(style, query_opt=query_opt, **kw)
+
+    def element_create(self, elementname, etype, *args, **kw):
+        self._record("element_create", [elementname, etype, *args], kw)
+        super().element_create(elementname, etype, *args, **kw)
+
+    def layout(self, style, layoutspec=None):
+        if layoutspec is not None:
+            self._record("layout", [style, layoutspec], {})
+        return super().layout(style, layoutspec)
+
+    def map(self, style, query_opt=None, **kw):
+        if query_opt is None and kw:
+            self._record("map", [style], kw)
+        return super().map(style, query_opt=query_opt, **kw)
+
+    def theme_create(self, themename, parent=None, settings=None):
+        self._record("theme_create", [themename, parent], {})
+        super().theme_create(themename, parent, settings)
+
+    def _record(self, op, args, kw):
+        if self.recording is not None:
+            self.recording.append((op, args, kw))
+
+
+class _CachedThemeBuilder(StyleBuilderTTK):
+    """
+    A style builder for a theme that was replayed from the cache, it only
+    builds the widget styles that were not cached.
+    """
+
+    def create_theme(self):
+        pass
+
+
+def is_supported():
+    """
+    Returns: (bool) True if the installed ttkbootstrap is TTKBOOTSTRAP_VERSION
+    """
+    try:
+        return metadata.version("ttkbootstrap") == TTKBOOTSTRAP_VERSION
+    except metadata.PackageNotFoundError:
+        return False
+
+
+def mark_styles_built(style, themename, ttkstyles):
+    """
+    Tell a Style that the theme and the given widget styles already exist
+    in Tk, so its builders skip them.
+
+    Args:
+        style (Style): the application's Style
+        themename (str): the theme that was replayed
+        ttkstyles (List[str]): the widget styles that were replayed
+    """
+    style._style_registry.update(ttkstyles)
+    style._theme_styles[themename].update(ttkstyles)
+    style._theme_objects[themename] = _CachedThemeBuilder()
+
+
+@contextmanager
+def style_factory(factory):
+    """
+    Have ttkbootstrap's Window get its Style from factory(root, themename)
+    while the context is active, Window creates its Style right after the
+    Tk root.
+
+    Args:
+        factory (Callable[[tkinter.Tk, str], Style]): returns the Style for
+        a theme
+    """
+    real_style = ttk_window.Style
+    ttk_window.Style = lambda themename: factory(tkinter._get_default_root(), themename)
+    try:
+        yield
+    finally:
+        ttk_window.Style = real_style
@@ -0,0 +1,343 @@
+"""
+python-pianobar-wrapper:
+    A program to wrap pianobar in python GUI with systray
+    using the Mediator design pattern.
+
+    Copyright (C) 2023 serverlinkdev@gmail.com
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>
+
+A user action (a media key, a button, a remote command) starts a trace.
+Every hop it passes through on the same thread records a span, the trace
+travels in a context variable so the mediator's notify signature stays as
+it is. When a command is written to pianobar the trace is parked until
+pianobar answers; the reader thread resumes it around the NEW_SONG it
+produced, so the GUI update lands in the same trace. A trace is finished
+once the action and every resume of it have returned and nothing is
+parked any more.
+"""
+from collections import deque
+from constants.constants import TRACING
+from contextlib import contextmanager
+from contextvars import ContextVar
+from metrics.metrics import REGISTRY
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+_ACTION_SECONDS = REGISTRY.histogram(
+    "pianobar_wrapper_trace_action_seconds",
+    "Time from a user action until its last traced hop", ("action",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+_HOP_SECONDS = REGISTRY.histogram(
+    "pianobar_wrapper_trace_hop_seconds",
+    "Time spent in each traced hop", ("hop",))
+
+_current = ContextVar("trace", default=None)
+
+
+def default_trace_path():
+    """
+    Returns:
+        path (str): where exported traces go, in the per user runtime dir
+    """
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR") or f"/tmp/pianobar-wrapper-{os.getuid()}"
+    return os.path.join(runtime_dir, "pianobar-wrapper", "trace.json")
+
+
+class Trace:
+    """
+    One user action and the spans of the hops it went through.
+    """
+
+    __slots__ = ("action", "finished_ns", "open", "parked", "source", "spans", "started_ns",
+                 "trace_id")
+
+    def __init__(self, trace_id, action, source):
+        self.action = action
+        self.finished_ns = None
+        # the action and resumes still running in it, and the answers it
+        # waits for, changed under the Tracer's lock
+        self.open = 1
+        self.parked = 0
+        self.source = source
+        # (hop, start ns, end ns, thread name), appended by one hop at a time
+        self.spans = []
+        self.started_ns = time.monotonic_ns()
+        self.trace_id = trace_id
+
+    def add_span(self, hop, start_ns, end_ns):
+        self.spans.append((hop, start_ns, end_ns, threading.current_thread().name))
+        _HOP_SECONDS.labels(hop).observe((end_ns - start_ns) / 1e9)
+
+
+class Tracer:
+    """
+    Starts, parks, resumes and keeps the recent traces.
+    """
+
+    def __init__(self, max_traces=500, ack_timeout=30.0):
+        """
+        Args:
+            max_traces (int): finished traces kept for export
+            ack_timeout (float): seconds a parked trace waits for pianobar
+        """
+        self._ack_timeout_ns = int(ack_timeout * 1e9)
+        self._finished = deque(maxlen=max_traces)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._parked = {}  # ack key => deque of (trace, parked at ns)
+        self._sweep_timer = None
+
+    @contextmanager
+    def action(self, action, source):
+        """
+        Trace a user action, or just add a span if one is being traced.
+
+        Args:
+            action (str): the event, e.g. MEDIA_NEXT
+            source (str): the component it came from, e.g. KEY_LISTENER
+        """
+        if _current.get() is not None:
+            with self.span(source):
+                yield
+            return
+        trace = Trace(f"{os.getpid():x}-{next(self._ids)}", action, source)
+        token = _current.set(trace)
+        try:
+            with self.span(source):
+                yield
+        finally:
+            _current.reset(token)
+            self._release(trace)
+
+    def export_chrome_trace(self, path=None):
+        """
+        Write the recent traces as Chrome trace JSON, for chrome://tracing
+        or https://ui.perfetto.dev
+
+        Args:
+            path (str): the file to write, defaults to the runtime dir
+
+        Returns:
+            path (str): the file written
+        """
+        path = path or default_trace_path()
+        with self._lock:
+            traces = list(self._finished)
+        pid = os.getpid()
+        threads = {}
+        events = []
+        for trace in traces:
+            args = {"action": trace.action, "source": trace.source, "trace_id": trace.trace_id}
+            for hop, start_ns, end_ns, thread_name in trace.spans:
+                tid = threads.setdefault(thread_name, len(threads) + 1)
+                events.append({"args": args, "cat": trace.action, "dur": (end_ns - start_ns) / 1000,
+                               "name": hop, "ph": "X", "pid": pid, "tid": tid,
+                               "ts": start_ns / 1000})
+            # the whole action on a row of its own, above the threads' hops
+            if trace.spans:
+                events.append({"args": args, "cat": trace.action, "dur": (trace.finished_ns - trace.started_ns) / 1000,
+                               "name": f"{trace.action} {trace.trace_id}", "ph": "X", "pid": pid,
+                               "tid": 0, "ts": trace.started_ns / 1000})
+        for thread_name, tid in threads.items():
+            events.append({"args": {"name": thread_name}, "name": "thread_name",
+                           "ph": "M", "pid": pid, "tid": tid})
+        events.append({"args": {"name": "actions"}, "name": "thread_name",
+                       "ph": "M", "pid": pid, "tid": 0})
+
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"displayTimeUnit": "ms", "traceEvents": events}, f)
+        os.replace(tmp_path, path)
+        _logger.info(f"{TRACING}: wrote {len(traces)} traces to {path}")
+        return path
+
+    def park(self, ack_key):
+        """
+        Keep the current trace open until 'resume' is called with the same
+        key, i.e. until pianobar acknowledges the command.
+
+        Args:
+            ack_key (str): what will acknowledge it, e.g. the pianobar sender
+        """
+        trace = _current.get()
+        if trace is None:
+            return
+        now = time.monotonic_ns()
+        with self._lock:
+            trace.parked += 1
+            self._parked.setdefault(ack_key, deque()).append((trace, now))
+            if self._sweep_timer is None:
+                self._schedule_sweep(self._ack_timeout_ns)
+
+    @contextmanager
+    def resume(self, ack_key):
+        """
+        Continue the oldest trace parked on 'ack_key', the time it waited is
+        recorded as the 'pianobar' hop. Without a parked trace this does
+        nothing, e.g. when a song simply ended.
+        """
+        trace, parked_ns = self._pop_parked(ack_key)
+        if trace is None:
+            yield
+            return
+        trace.add_span("pianobar", parked_ns, time.monotonic_ns())
+        token = _current.set(trace)
+        try:
+            yield
+        finally:
+            _current.reset(token)
+            self._release(trace)
+
+    @contextmanager
+    def span(self, hop):
+        """
+        Record a hop of the current trace, a no-op when nothing is traced.
+
+        Args:
+            hop (str): the name of the hop, e.g. fifo_write
+        """
+        trace = _current.get()
+        if trace is None:
+            yield
+            return
+        start_ns = time.monotonic_ns()
+        try:
+            yield
+        finally:
+            trace.add_span(hop, start_ns, time.monotonic_ns())
+
+    def unpark(self, ack_key):
+        """
+        Take back the current trace parked on 'ack_key', e.g. when the
+        command it waits on could not be written.
+
+        Args:
+            ack_key (str): the key it was parked on
+        """
+        trace = _current.get()
+        if trace is None:
+            return
+        with self._lock:
+            waiting = self._parked.get(ack_key, ())
+            for entry in waiting:
+                if entry[0] is trace:
+                    waiting.remove(entry)
+                    trace.parked -= 1
+                    break
+            if not waiting:
+                self._parked.pop(ack_key, None)
+
+    def _finish(self, trace):
+        trace.finished_ns = max([trace.started_ns] + [end for _, _, end, _ in trace.spans])
+        _ACTION_SECONDS.labels(trace.action).observe((trace.finished_ns - trace.started_ns) / 1e9)
+        with self._lock:
+            self._finished.append(trace)
+
+    def _pop_parked(self, ack_key):
+        """
+        Returns:
+            (Trace, int): the oldest parked trace for the key and when it was
+            parked, or (None, None). Traces older than the timeout are
+            given up on.
+        """
+        expired = []
+        found = (None, None)
+        now = time.monotonic_ns()
+        with self._lock:
+            waiting = self._parked.get(ack_key)
+            while waiting:
+                trace, parked_ns = waiting.popleft()
+                trace.parked -= 1
+                if now - parked_ns > self._ack_timeout_ns:
+                    expired.append(trace)
+                    continue
+                # held by the resume until it returns
+                trace.open += 1
+                found = (trace, parked_ns)
+                break
+            if not waiting:
+                self._parked.pop(ack_key, None)
+        self._give_up(expired)
+        return found
+
+    def _give_up(self, expired):
+        """
+        Finish the traces whose answer never came, unless their action or
+        another resume is still running in them.
+
+        Args:
+            expired (List[Trace]): traces just taken off the parked queues
+        """
+        for trace in expired:
+            _logger.debug(f"{TRACING}: {trace.action} {trace.trace_id} was never acknowledged")
+            with self._lock:
+                done = trace.open == 0 and trace.parked == 0
+            if done:
+                self._finish(trace)
+
+    def _release(self, trace):
+        """
+        The action or a resume left the trace, finish it if it was the last
+        one in and no answer is awaited.
+        """
+        with self._lock:
+            trace.open -= 1
+            done = trace.open == 0 and trace.parked == 0
+        if done:
+            self._finish(trace)
+
+    def _schedule_sweep(self, delay_ns):
+        """
+        Sweep the parked traces in 'delay_ns'. Called with self._lock held.
+        """
+        self._sweep_timer = threading.Timer(delay_ns / 1e9, self._sweep)
+        self._sweep_timer.daemon = True
+        self._sweep_timer.start()
+
+    def _sweep(self):
+        """
+        Give up on the traces parked longer than the timeout, on every key,
+        and sweep again when the oldest of the rest expires.
+        """
+        expired = []
+        now = time.monotonic_ns()
+        with self._lock:
+            self._sweep_timer = None
+            oldest = None
+            for ack_key in list(self._parked):
+                waiting = self._parked[ack_key]
+                while waiting and now - waiting[0][1] > self._ack_timeout_ns:
+                    trace, _ = waiting.popleft()
+                    trace.parked -= 1
+                    expired.append(trace)
+                if waiting:
+                    oldest = waiting[0][1] if oldest is None else min(oldest, waiting[0][1])
+                else:
+                    del self._parked[ack_key]
+            if oldest is not None:
+                # a little past the deadline, so it has expired by then
+                self._schedule_sweep(oldest + self._ack_timeout_ns - now + 1000000)
+        self._give_up(expired)
+
+
+# the tracer the components record into
+TRACER = Tracer()